@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys
+import time
+from uuid import uuid4
+
+import sqlalchemy as sa
+from colorama import Fore, Style
+
+from holmes.cli import BaseCLI
+from holmes.models import Fact, Violation, JsonTypeCompressed
+
+
+class ValuesBackfill(BaseCLI):
+    '''Re-encodes fact and violation values still stored by the old gzip codec.
+
+    Values are never written with the old codec again, so a single pass over
+    each table is enough: unlike the other workers this one runs once and
+    exits (--workers and --sleep are ignored).'''
+
+    def initialize(self):
+        self.uuid = uuid4().hex
+
+        self.error_handlers = [handler(self.config) for handler in self.load_error_handlers()]
+
+        self.connect_sqlalchemy()
+
+    def get_description(self):
+        uuid = str(getattr(self, 'uuid', ''))
+
+        return "%s%sholmes-backfill-values-%s%s" % (
+            Fore.BLUE,
+            Style.BRIGHT,
+            uuid,
+            Style.RESET_ALL,
+        )
+
+    def do_work(self):
+        self.backfill(Fact)
+        self.backfill(Violation)
+
+    def run_once(self):
+        self.initialize()
+        self.do_work()
+
+    def backfill(self, model):
+        start_time = time.time()
+        batch_size = self.config.COLUMN_CODEC_BACKFILL_BATCH_SIZE
+
+        table = model.__table__
+        min_id, max_id = self.db.query(sa.func.min(model.id), sa.func.max(model.id)).one()
+
+        totals = {'table': table.name, 'batches': 0, 'rows': 0}
+
+        if min_id is None:
+            return totals
+
+        for start_id in xrange(min_id, max_id + 1, batch_size):
+            totals['rows'] += self.backfill_batch(table, start_id, start_id + batch_size)
+            self.db.commit()
+
+            totals['batches'] += 1
+
+        self.info(
+            'Re-encoded %(rows)d %(table)s values in %(batches)d batches' % totals +
+            ' (%.2fs).' % (time.time() - start_time)
+        )
+
+        return totals
+
+    def backfill_batch(self, table, min_id, max_id):
+        codec = JsonTypeCompressed.codec
+
+        rows = self.db.execute(
+            sa.select([table.c.id, sa.type_coerce(table.c.value, sa.LargeBinary)])
+            .where(table.c.id >= min_id)
+            .where(table.c.id < max_id)
+        ).fetchall()
+
+        data = [
+            {'_id': row_id, '_value': codec.encode(codec.decode(value))}
+            for row_id, value in rows
+            if value and codec.is_legacy(value)
+        ]
+
+        if not data:
+            return 0
+
+        self.db.execute(
+            table.update()
+            .where(table.c.id == sa.bindparam('_id'))
+            .values(value=sa.bindparam('_value', type_=sa.LargeBinary)),
+            data
+        )
+
+        return len(data)
+
+
+def main():
+    worker = ValuesBackfill(sys.argv[1:])
+    worker.run_once()
+
+if __name__ == '__main__':
+    main()
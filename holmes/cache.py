@@ -2,9 +2,14 @@
 # -*- coding: utf-8 -*-
 
 import time
+import hashlib
+import zlib
+from math import ceil
+from collections import deque
 from gzip import GzipFile
 from cStringIO import StringIO
 from datetime import datetime, timedelta
+from uuid import uuid4
 import logging
 
 import msgpack
@@ -18,6 +23,242 @@ from redis import WatchError
 from holmes.models import (
     Domain, Page, Limiter, Violation, DomainsViolationsPrefs
 )
+from holmes.stats import RequestStats
+
+
+# Puts the leases that expired without being released back in the job
+# bucket, with the score their jobs had when they were leased.
+REQUEUE_EXPIRED_LEASES_SCRIPT = '''
+local bucket, leases, scores = KEYS[1], KEYS[2], KEYS[3]
+local now = tonumber(ARGV[1])
+
+local expired = redis.call('ZRANGEBYSCORE', leases, '-inf', now)
+for _, item in ipairs(expired) do
+    redis.call('ZREM', leases, item)
+    redis.call('ZADD', bucket, redis.call('HGET', scores, item) or 0, item)
+    redis.call('HDEL', scores, item)
+end
+
+return #expired
+'''
+
+# Leases the jobs in ARGV[4..] (whose urls are KEYS[4..]) if they are still
+# in the job bucket. Each leased url gets a lock compatible with retools'
+# Lock: the key is the url, its value the lease token and it expires along
+# with the lease. Jobs whose url is already locked are dropped, just like
+# when a worker fails to acquire the lock.
+LEASE_NEXT_JOBS_SCRIPT = '''
+local bucket, leases, scores = KEYS[1], KEYS[2], KEYS[3]
+local lease_expires_at = ARGV[1]
+local lock_expiration = ARGV[2]
+local token = ARGV[3]
+
+local jobs = {}
+for index = 4, #KEYS do
+    local url, item = KEYS[index], ARGV[index]
+    local score = redis.call('ZSCORE', bucket, item)
+
+    if score then
+        redis.call('ZREM', bucket, item)
+
+        if redis.call('SETNX', url, token) == 1 then
+            redis.call('EXPIRE', url, lock_expiration)
+            redis.call('ZADD', leases, lease_expires_at, item)
+            redis.call('HSET', scores, item, score)
+            table.insert(jobs, item)
+        end
+    end
+end
+
+return {jobs, redis.call('ZCARD', bucket)}
+'''
+
+# Extends a lease (and the lock of its url) if it still holds the lock.
+RENEW_JOB_LEASE_SCRIPT = '''
+local leases, url = KEYS[1], KEYS[2]
+local item, token, lease_expires_at, lock_expiration = ARGV[1], ARGV[2], ARGV[3], ARGV[4]
+
+if redis.call('GET', url) ~= token then
+    return 0
+end
+
+redis.call('EXPIRE', url, lock_expiration)
+redis.call('ZADD', leases, lease_expires_at, item)
+
+return 1
+'''
+
+# Releases a lease (and the lock of its url) if it still holds the lock, so
+# a lease that expired and went to another worker is left alone.
+RELEASE_JOB_LEASE_SCRIPT = '''
+local leases, scores, url = KEYS[1], KEYS[2], KEYS[3]
+local item, token = ARGV[1], ARGV[2]
+
+if redis.call('GET', url) ~= token then
+    return 0
+end
+
+redis.call('ZREM', leases, item)
+redis.call('HDEL', scores, item)
+
+return redis.call('DEL', url)
+'''
+
+JOB_LEASE_KEYS = ['next-job-bucket', 'next-job-leases', 'next-job-lease-scores']
+
+
+def get_next_job_bucket_score(config, score=0.0, last_review_date=None, expires=None, created_date=None, now=None):
+    '''Returns the score of a job in the next-job-bucket (lowest goes first).
+
+    Jobs are queued by the time they were added, minus a head start (in
+    seconds) earned by the page score, by how long the page has gone without
+    a review and by how long ago its content expired.
+    '''
+    if now is None:
+        now = datetime.utcnow()
+
+    head_start = float(score or 0.0) * config.JOB_PRIORITY_SCORE_WEIGHT
+
+    last_seen = last_review_date or created_date
+    if last_seen is not None:
+        head_start += max((now - last_seen).total_seconds() / 3600.0, 0) * config.JOB_PRIORITY_STALENESS_WEIGHT
+
+    if expires is not None:
+        head_start += max((now - expires).total_seconds() / 3600.0, 0) * config.JOB_PRIORITY_EXPIRES_WEIGHT
+
+    return time.time() - head_start
+
+
+def get_request_stats_keys(config, domain_name, now=None):
+    '''Returns the keys of the buckets in the rolling request statistics
+    window of a domain, the current bucket first.'''
+    if now is None:
+        now = time.time()
+
+    bucket_size = int(config.REQUEST_STATS_BUCKET_SIZE_IN_SECONDS)
+    current = int(now) // bucket_size * bucket_size
+    buckets = max(1, int(ceil(float(config.REQUEST_STATS_WINDOW_IN_SECONDS) / bucket_size)))
+
+    return [
+        'request-stats-%s-%d' % (domain_name, current - bucket_size * index)
+        for index in range(buckets)
+    ]
+
+
+def load_request_stats_fields(fields):
+    # hgetall replies come as a flat list of fields and values from toredis
+    if isinstance(fields, (list, tuple)):
+        fields = dict(zip(fields[::2], fields[1::2]))
+
+    return RequestStats.from_fields(fields or {})
+
+
+def get_review_processing_key(processor):
+    return 'review-persistence-processing-%s' % processor
+
+
+def get_review_payload_hash(payload):
+    return hashlib.sha1(payload).hexdigest()
+
+
+class JobLease(object):
+    def __init__(self, cache, item, url, token):
+        self.cache = cache
+        self.item = item
+        self.url = url
+        self.token = token
+
+    def renew(self, lease_expiration):
+        '''Returns False if the lease expired and its url was locked again.'''
+        return self.cache.renew_job_lease(self.item, self.url, self.token, lease_expiration)
+
+    def release(self):
+        self.cache.release_job_lease(self.item, self.url, self.token)
+
+
+class BodySizeCounter(object):
+    '''Streaming callback that counts the size of a body, and of the body
+    gzipped, as its chunks arrive so the body itself can be dropped.'''
+
+    def __init__(self):
+        self.size = 0
+        self.gzipped_size = 0
+        # gzip framing, so the sizes match what servers send gzipped
+        self.compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def __call__(self, chunk):
+        self.size += len(chunk)
+        self.gzipped_size += len(self.compressor.compress(chunk))
+
+    def finish(self):
+        if self.compressor is None:
+            return
+
+        self.gzipped_size += len(self.compressor.flush())
+        self.compressor = None
+
+
+class ResourceSummary(object):
+    '''What reviews need to know about a sub-resource (CSS, JS, images and
+    links) without keeping its body around.'''
+
+    def __init__(self, url, status_code, size=0, gzipped_size=0, effective_url=None, request_time=None):
+        self.url = url
+        self.status_code = status_code
+        self.size = size
+        self.gzipped_size = gzipped_size
+        self.effective_url = effective_url or url
+        self.request_time = request_time
+        self.from_cache = False
+
+    @classmethod
+    def from_response(cls, url, response, counter=None):
+        text = response.text
+
+        if text:
+            # bodies that were buffered (i.e.: cached responses) are measured
+            # just like the streamed ones
+            if isinstance(text, unicode):
+                text = text.encode('utf-8')
+            counter = BodySizeCounter()
+            counter(text)
+
+        if counter is not None and counter.size:
+            counter.finish()
+            size = counter.size
+            gzipped_size = counter.gzipped_size
+        else:
+            # HEAD responses only tell the size of the body
+            size = cls.get_content_length(response)
+            gzipped_size = 0
+
+        return cls(
+            url=url,
+            status_code=response.status_code,
+            size=size,
+            gzipped_size=gzipped_size,
+            effective_url=getattr(response, 'effective_url', None),
+            request_time=getattr(response, 'request_time', None)
+        )
+
+    @classmethod
+    def get_content_length(cls, response):
+        headers = getattr(response, 'headers', None) or {}
+
+        try:
+            return int(headers.get('Content-Length', 0))
+        except (TypeError, ValueError):
+            return 0
+
+    def to_dict(self):
+        return {
+            'url': self.url,
+            'status_code': self.status_code,
+            'size': self.size,
+            'gzipped_size': self.gzipped_size,
+            'effective_url': self.effective_url,
+            'request_time': self.request_time
+        }
 
 
 class Cache(object):
@@ -226,8 +467,48 @@ class Cache(object):
         self.redis.delete('violations-prefs-%s' % domain_name, callback=callback)
 
     @return_future
-    def add_next_job_bucket(self, uuid, url, callback):
-        data = {dumps({'page': str(uuid), 'url': url}): time.clock()}
+    def get_review_json(self, review_uuid, language, callback=None):
+        self.redis.hget('review-json-%s' % review_uuid, language, callback=callback)
+
+    @return_future
+    def set_review_json(self, review_uuid, language, data, callback=None):
+        key = 'review-json-%s' % review_uuid
+
+        self.redis.hset(
+            key, language, data,
+            callback=self.handle_set_review_json(key, callback)
+        )
+
+    def handle_set_review_json(self, key, callback):
+        def handle(*args, **kw):
+            self.redis.expire(
+                key,
+                int(self.config.REVIEW_JSON_EXPIRATION_IN_SECONDS),
+                callback=callback
+            )
+
+        return handle
+
+    @return_future
+    def get_request_stats(self, domain_name, callback=None):
+        keys = get_request_stats_keys(self.config, domain_name)
+
+        self.handle_get_request_stats(keys, RequestStats(), callback)
+
+    def handle_get_request_stats(self, keys, stats, callback):
+        if not keys:
+            callback(stats)
+            return
+
+        def handle(fields):
+            stats.merge(load_request_stats_fields(fields))
+            self.handle_get_request_stats(keys[1:], stats, callback)
+
+        self.redis.hgetall(keys[0], callback=handle)
+
+    @return_future
+    def add_next_job_bucket(self, uuid, url, score=0.0, callback=None):
+        data = {dumps({'page': str(uuid), 'url': url}): get_next_job_bucket_score(self.config, score)}
         self.redis.zadd('next-job-bucket', data, callback=callback)
 
     @return_future
@@ -245,6 +526,8 @@ class SyncCache(object):
         self.db = db
         self.redis = redis
         self.config = config
+        self._job_lease_scripts = {}
+        self.local_violations_prefs = {}
 
     def has_key(self, key):
         return self.redis.exists(key)
@@ -345,7 +628,8 @@ class SyncCache(object):
         return url, response
 
     def set_request(self, url, status_code, headers, cookies, text, effective_url, error, request_time, expiration):
-        if status_code > 399 or status_code < 100:
+        # 304 responses come from conditional requests and carry no body
+        if status_code > 399 or status_code < 100 or status_code == 304:
             return
 
         cache_key = "urls-%s" % url
@@ -372,6 +656,107 @@ class SyncCache(object):
             value,
         )
 
+    def push_review_to_persist(self, payload):
+        # the queue is consumed from its right end, oldest reviews first
+        self.redis.lpush('review-persistence-queue', payload)
+
+    def claim_reviews_to_persist(self, processor, count, expiration):
+        '''Moves up to `count` reviews from the persistence queue to the
+        processing list of `processor`. They stay there until saved (or given
+        up on), so a persister that dies mid-batch loses none of them.'''
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.setex('review-persister-%s' % processor, expiration, 1)
+        pipe.sadd('review-persistence-processors', processor)
+        for index in range(count):
+            pipe.rpoplpush('review-persistence-queue', get_review_processing_key(processor))
+        results = pipe.execute()
+
+        return [payload for payload in results[2:] if payload is not None]
+
+    def complete_reviews_to_persist(self, processor, payloads):
+        if not payloads:
+            return
+
+        pipe = self.redis.pipeline()
+        for payload in payloads:
+            pipe.lrem(get_review_processing_key(processor), 1, payload)
+        pipe.hdel('review-persistence-failures', *[get_review_payload_hash(payload) for payload in payloads])
+        pipe.execute()
+
+    def fail_review_to_persist(self, processor, payload, max_attempts):
+        '''Puts a review that could not be saved back in the queue, or in the
+        dead-letter list once it failed `max_attempts` times.
+
+        Returns True if the review was given up on.'''
+        payload_hash = get_review_payload_hash(payload)
+        attempts = self.redis.hincrby('review-persistence-failures', payload_hash, 1)
+        given_up = attempts >= max_attempts
+
+        pipe = self.redis.pipeline()
+        pipe.lrem(get_review_processing_key(processor), 1, payload)
+        if given_up:
+            pipe.lpush('review-persistence-dead-letter', payload)
+            pipe.hdel('review-persistence-failures', payload_hash)
+        else:
+            pipe.lpush('review-persistence-queue', payload)
+        pipe.execute()
+
+        return given_up
+
+    def recover_reviews_to_persist(self):
+        '''Puts back in the queue the reviews claimed by persisters that
+        stopped claiming new ones, returning how many were recovered.'''
+        recovered = 0
+
+        for processor in self.redis.smembers('review-persistence-processors'):
+            if self.redis.exists('review-persister-%s' % processor):
+                continue
+
+            processing = get_review_processing_key(processor)
+            while self.redis.rpoplpush(processing, 'review-persistence-queue') is not None:
+                recovered += 1
+
+            self.redis.srem('review-persistence-processors', processor)
+
+        return recovered
+
+    def get_review_retention_cursor(self):
+        cursor = self.redis.get('review-retention-cursor')
+
+        if cursor is None:
+            return None
+
+        return int(cursor)
+
+    def set_review_retention_cursor(self, review_id):
+        if review_id is None:
+            self.redis.delete('review-retention-cursor')
+        else:
+            self.redis.set('review-retention-cursor', review_id)
+
+    def get_resource_summary(self, url):
+        contents = self.redis.get('resource-summary-%s' % url)
+
+        if not contents:
+            return None
+
+        summary = ResourceSummary(**msgpack.unpackb(contents))
+        summary.from_cache = True
+
+        return summary
+
+    def set_resource_summary(self, url, summary, expiration):
+        # timeouts and server errors are usually transient, so they are
+        # fetched again by the next review
+        if summary.status_code > 499 or summary.status_code < 100:
+            return
+
+        self.redis.setex(
+            'resource-summary-%s' % url,
+            expiration,
+            msgpack.packb(summary.to_dict())
+        )
+
     def lock_next_job(self, url, expiration):
         return self.redis.lock('%s-next-job-lock' % url, expiration)
 
@@ -416,60 +801,111 @@ class SyncCache(object):
 
     def get_limiter_buckets(self, active_domains, avg_links_per_page=10.0):
         available = []
-        all_limiters = reversed(sorted(Limiter.get_limiters_for_domains(self.db, active_domains), key=lambda item: item.url))
+        all_limiters = list(reversed(sorted(Limiter.get_limiters_for_domains(self.db, active_domains), key=lambda item: item.url)))
 
+        pipe = self.redis.pipeline(transaction=False)
         for limiter in all_limiters:
-            capacity = float(limiter.value - self.get_limit_usage(limiter.url))
+            pipe.zcard('limit-for-%s' % limiter.url)
+        usages = pipe.execute()
+
+        for limiter, usage in zip(all_limiters, usages):
+            capacity = float(limiter.value - usage)
             available.append((limiter, capacity))
 
         return available
 
+    def get_job_bucket_cursors(self):
+        cursors = self.redis.hgetall('next-job-bucket-cursors') or {}
+        return dict((int(domain_id), int(page_id)) for domain_id, page_id in cursors.items())
+
+    def get_job_bucket_skipped_pages(self):
+        skipped = self.redis.hgetall('next-job-bucket-skipped') or {}
+        return dict((int(domain_id), loads(page_ids)) for domain_id, page_ids in skipped.items())
+
     def fill_job_bucket(self, expiration, look_ahead_pages=1000, avg_links_per_page=10.0):
         try:
             with Lock('next-job-fill-bucket-lock', redis=self.redis):
                 logging.info('Refilling job bucket. Lock acquired...')
                 expired_time = datetime.utcnow() - timedelta(seconds=expiration)
 
+                item_count = int(self.redis.zcard('next-job-bucket'))
+                missing = look_ahead_pages - item_count
+
+                if missing <= 0:
+                    return
+
                 active_domains = Domain.get_active_domains(self.db)
 
                 if not active_domains:
                     return
 
-                active_domains_ids = [item.id for item in active_domains]
-
                 limiter_buckets = self.get_limiter_buckets(active_domains, avg_links_per_page)
 
-                all_domains_pages_in_need_of_review = []
-
-                for domain_id in active_domains_ids:
-                    pages = self.db \
-                        .query(
-                            Page.uuid,
-                            Page.url,
-                            Page.score,
-                            Page.last_review_date
-                        ) \
-                        .filter(Page.domain_id == domain_id) \
-                        .filter(or_(
-                            Page.last_review_date == None,
-                            Page.last_review_date <= expired_time
-                        ))[:look_ahead_pages]
+                # each domain resumes from the last page it handed out, so a
+                # refill only reads about as many rows as it is going to add
+                cursors = self.get_job_bucket_cursors()
+                pages_by_domain = dict((domain.id, []) for domain in active_domains)
+                exhausted_domains = set()
+
+                # pages held back by limiters on earlier refills go first,
+                # the cursors of their domains are already past them
+                skipped_pages = self.get_job_bucket_skipped_pages()
+                retried_by_domain = dict(
+                    (domain.id, Page.get_pages_in_need_of_review_by_ids(
+                        self.db, skipped_pages.get(domain.id, []), expired_time
+                    ))
+                    for domain in active_domains
+                )
+                retried_count = sum([len(pages) for pages in retried_by_domain.values()])
+                retried_ids = set([page.id for pages in retried_by_domain.values() for page in pages])
+                after_ids = dict(cursors)
 
-                    if pages:
-                        all_domains_pages_in_need_of_review.append(pages)
+                # domains that run out of pages leave their share to the others
+                wanted = missing - retried_count
+                while wanted > 0:
+                    domain_ids = [domain.id for domain in active_domains if domain.id not in exhausted_domains]
 
-                logging.debug('Total of %d pages found to add to redis.' % (sum([len(item) for item in all_domains_pages_in_need_of_review])))
+                    if not domain_ids:
+                        break
 
-                item_count = int(self.redis.zcard('next-job-bucket'))
-                current_domain = 0
-                while item_count < look_ahead_pages and len(all_domains_pages_in_need_of_review) > 0:
-                    if current_domain >= len(all_domains_pages_in_need_of_review):
-                        current_domain = 0
+                    pages_per_domain = int(ceil(float(wanted) / len(domain_ids)))
+
+                    for domain_id in domain_ids:
+                        pages = Page.get_next_pages_in_need_of_review(
+                            self.db, domain_id, expired_time, after_ids.get(domain_id, 0), pages_per_domain
+                        )
+
+                        if len(pages) < pages_per_domain:
+                            exhausted_domains.add(domain_id)
+
+                        if pages:
+                            after_ids[domain_id] = pages[-1].id
 
-                    item = all_domains_pages_in_need_of_review[current_domain].pop(0)
+                        # cursors that started over meet the held back pages again
+                        pages_by_domain[domain_id].extend([page for page in pages if page.id not in retried_ids])
+
+                    wanted = missing - retried_count - sum([len(pages) for pages in pages_by_domain.values()])
+
+                all_domains_pages_in_need_of_review = deque([
+                    (domain.id, deque(retried_by_domain[domain.id] + pages_by_domain[domain.id]))
+                    for domain in active_domains if retried_by_domain[domain.id] or pages_by_domain[domain.id]
+                ])
+
+                logging.debug('Total of %d pages found to add to redis.' % (sum([len(pages) for domain_id, pages in all_domains_pages_in_need_of_review])))
+
+                now = datetime.utcnow()
+                pipe = self.redis.pipeline(transaction=False)
+                new_cursors = {}
+                new_skipped_pages = dict((domain.id, []) for domain in active_domains)
+                held_back_domains = set()
+                max_skipped_pages = self.config.WORKERS_MAX_SKIPPED_PAGES_PER_DOMAIN
+                added = 0
+                while added < missing and all_domains_pages_in_need_of_review:
+                    domain_id, pages = all_domains_pages_in_need_of_review.popleft()
+
+                    item = pages.popleft()
 
                     has_limit = True
-                    logging.debug('Available Limit Buckets: %s' % limiter_buckets)
                     for index, (limit, available) in enumerate(limiter_buckets):
                         if limit.matches(item.url):
                             if available <= 0:
@@ -477,25 +913,71 @@ class SyncCache(object):
                                 break
                             limiter_buckets[index] = (limit, available - 1)
 
-                    if has_limit:
-                        self.add_next_job_bucket(item.uuid, item.url)
-                        item_count += 1
+                    if not has_limit:
+                        if len(new_skipped_pages[domain_id]) >= max_skipped_pages:
+                            # too many pages held back: the domain resumes from
+                            # this page on the next refill instead
+                            held_back_domains.add(domain_id)
+                            new_skipped_pages[domain_id].extend(
+                                [page.id for page in pages if page.id in retried_ids]
+                            )
+                            continue
+
+                        # the page is queued on a later refill, when its
+                        # limiter may have room for it
+                        new_skipped_pages[domain_id].append(item.id)
+                    else:
+                        job_score = get_next_job_bucket_score(
+                            self.config, item.score, item.last_review_date,
+                            item.expires, item.created_date, now
+                        )
+                        self.add_next_job_bucket(item.uuid, item.url, job_score, pipe=pipe)
+                        added += 1
+
+                    if item.id not in retried_ids:
+                        new_cursors[domain_id] = item.id
+
+                    # domains with pages left go to the back of the line
+                    if pages:
+                        all_domains_pages_in_need_of_review.append((domain_id, pages))
+
+                # domains that handed out all of their pages start over on the next refill
+                domains_with_pages_left = set()
+                for domain_id, pages in all_domains_pages_in_need_of_review:
+                    domains_with_pages_left.add(domain_id)
+
+                    # held back pages not reached this time are kept for the next refill
+                    new_skipped_pages[domain_id].extend([page.id for page in pages if page.id in retried_ids])
+
+                for domain_id in exhausted_domains - domains_with_pages_left - held_back_domains:
+                    new_cursors[domain_id] = 0
+
+                for domain_id, page_id in new_cursors.items():
+                    pipe.hset('next-job-bucket-cursors', domain_id, page_id)
 
-                    # if there are not any more pages in this domain remove it from dictionary
-                    if not all_domains_pages_in_need_of_review[current_domain]:
-                        del all_domains_pages_in_need_of_review[current_domain]
+                for domain_id, page_ids in new_skipped_pages.items():
+                    if page_ids:
+                        pipe.hset('next-job-bucket-skipped', domain_id, dumps(sorted(page_ids)))
+                    else:
+                        pipe.hdel('next-job-bucket-skipped', domain_id)
 
-                    current_domain += 1
+                pipe.execute()
 
-                logging.debug('ADDED A TOTAL of %d ITEMS TO REDIS...' % item_count)
+                logging.debug('ADDED A TOTAL of %d ITEMS TO REDIS...' % added)
 
         except LockTimeout:
             logging.info("Can't acquire lock. Moving on...")
 
-    def add_next_job_bucket(self, uuid, url):
-        self.redis.zadd(
+    def add_next_job_bucket(self, uuid, url, score=None, pipe=None):
+        if score is None:
+            score = time.time()
+
+        if pipe is None:
+            pipe = self.redis
+
+        pipe.zadd(
             'next-job-bucket',
-            time.time(),
+            score,
             dumps({'page': str(uuid), 'url': url})
         )
 
@@ -533,6 +1015,64 @@ class SyncCache(object):
 
         return item
 
+    def get_job_lease_script(self, script):
+        if script not in self._job_lease_scripts:
+            self._job_lease_scripts[script] = self.redis.register_script(script)
+
+        return self._job_lease_scripts[script]
+
+    def lease_next_jobs(self, count, lease_expiration):
+        now = time.time()
+        token = uuid4().hex
+
+        pipe = self.redis.pipeline(transaction=False)
+        self.get_job_lease_script(REQUEUE_EXPIRED_LEASES_SCRIPT)(
+            keys=JOB_LEASE_KEYS, args=[now], client=pipe
+        )
+        pipe.zrange('next-job-bucket', 0, count - 1)
+        requeued, candidates = pipe.execute()
+
+        # the urls to lock go in KEYS, the script only leases the candidates
+        # still in the bucket by then
+        items, job_bucket_count = self.get_job_lease_script(LEASE_NEXT_JOBS_SCRIPT)(
+            keys=JOB_LEASE_KEYS + [loads(item)['url'] for item in candidates],
+            args=[now + lease_expiration, int(ceil(lease_expiration)), token] + candidates
+        )
+
+        jobs = []
+        for item in items:
+            job = loads(item)
+            job['lock'] = JobLease(self, item, job['url'], token)
+            jobs.append(job)
+
+        return jobs, int(job_bucket_count)
+
+    def renew_job_lease(self, item, url, token, lease_expiration):
+        renewed = self.get_job_lease_script(RENEW_JOB_LEASE_SCRIPT)(
+            keys=['next-job-leases', url],
+            args=[item, token, time.time() + lease_expiration, int(ceil(lease_expiration))]
+        )
+
+        return bool(renewed)
+
+    def release_job_lease(self, item, url, token):
+        self.get_job_lease_script(RELEASE_JOB_LEASE_SCRIPT)(
+            keys=['next-job-leases', 'next-job-lease-scores', url],
+            args=[item, token]
+        )
+
+    def get_next_jobs(self, count, expiration, lease_expiration, look_ahead_pages=1000):
+        logging.info('Leasing up to %d jobs from the bucket...' % count)
+        jobs, job_bucket_count = self.lease_next_jobs(count, lease_expiration)
+
+        if job_bucket_count < look_ahead_pages * 0.1:
+            logging.info('Bucket near empty (%d items). Must refill...' % job_bucket_count)
+            self.fill_job_bucket(expiration, look_ahead_pages)
+
+        logging.debug('Leased %d jobs: %s' % (len(jobs), ', '.join([job['url'] for job in jobs])))
+
+        return jobs
+
     def get_data(self, key, expiration, get_data_method):
         data = self.redis.get(key)
 
@@ -554,3 +1094,61 @@ class SyncCache(object):
 
     def delete_domain_violations_prefs(self, domain_name):
         self.redis.delete('violations-prefs-%s' % domain_name)
+        self.expire_local_domain_violations_prefs(domain_name)
+
+    def add_request_stats(self, domain_name, stats):
+        key = get_request_stats_keys(self.config, domain_name)[0]
+
+        pipe = self.redis.pipeline()
+
+        for name, value in stats.to_fields().items():
+            if isinstance(value, float):
+                pipe.hincrbyfloat(key, name, value)
+            else:
+                pipe.hincrby(key, name, value)
+
+        pipe.expire(
+            key,
+            int(self.config.REQUEST_STATS_WINDOW_IN_SECONDS + self.config.REQUEST_STATS_BUCKET_SIZE_IN_SECONDS)
+        )
+        pipe.execute()
+
+    def get_request_stats(self, domain_name):
+        keys = get_request_stats_keys(self.config, domain_name)
+
+        pipe = self.redis.pipeline()
+        for key in keys:
+            pipe.hgetall(key)
+
+        stats = RequestStats()
+        for fields in pipe.execute():
+            stats.merge(load_request_stats_fields(fields))
+
+        return stats
+
+    def delete_reviews_json(self, review_uuids):
+        if review_uuids:
+            self.redis.delete(*['review-json-%s' % uuid for uuid in review_uuids])
+
+    def get_local_domain_violations_prefs(self, domain_name):
+        now = time.time()
+
+        expires_at, prefs = self.local_violations_prefs.get(domain_name, (0, None))
+
+        if expires_at > now:
+            return prefs
+
+        prefs = dict(
+            (item['key'], item['value'])
+            for item in self.get_domain_violations_prefs(domain_name) or []
+        )
+
+        self.local_violations_prefs[domain_name] = (
+            now + self.config.LOCAL_DOMAINS_VIOLATIONS_PREFS_EXPIRATION_IN_SECONDS,
+            prefs
+        )
+
+        return prefs
+
+    def expire_local_domain_violations_prefs(self, domain_name):
+        self.local_violations_prefs.pop(domain_name, None)
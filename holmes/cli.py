@@ -11,6 +11,8 @@ from materialgirl import Materializer
 from materialgirl.storage.redis import RedisStorage
 
 from holmes.cache import SyncCache
+from holmes.codec import ColumnCodec
+from holmes.models import JsonTypeCompressed
 from holmes.utils import load_classes
 from holmes.config import Config
 
@@ -74,6 +76,8 @@ class BaseCLI(Shepherd):
         self.sqlalchemy_db_maker = sessionmaker(bind=engine, autoflush=autoflush)
         self.db = scoped_session(self.sqlalchemy_db_maker)
 
+        JsonTypeCompressed.set_codec(ColumnCodec.from_config(self.config))
+
     def connect_to_redis(self):
         host = self.config.get('REDISHOST')
         port = self.config.get('REDISPORT')
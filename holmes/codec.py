@@ -0,0 +1,124 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import zlib
+import calendar
+from datetime import date, datetime
+from gzip import GzipFile
+from cStringIO import StringIO
+
+import msgpack
+from ujson import dumps, loads
+
+
+GZIP_MAGIC = '\x1f\x8b'
+
+JSON = '\x01'
+JSON_DEFLATED = '\x02'
+MSGPACK = '\x03'
+MSGPACK_DEFLATED = '\x04'
+
+
+def encode_msgpack_default(value):
+    # turns into plain values what ujson does: dates as epoch seconds
+    if isinstance(value, datetime):
+        return calendar.timegm(value.utctimetuple())
+
+    if isinstance(value, date):
+        return calendar.timegm(value.timetuple())
+
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+
+    raise TypeError('Cannot serialize %r to msgpack' % value)
+
+
+def dump_msgpack(value):
+    return msgpack.packb(value, encoding='utf-8', default=encode_msgpack_default)
+
+
+def load_msgpack(data):
+    return msgpack.unpackb(data, encoding='utf-8')
+
+
+SERIALIZERS = {
+    'json': (JSON, JSON_DEFLATED, dumps),
+    'msgpack': (MSGPACK, MSGPACK_DEFLATED, dump_msgpack),
+}
+
+LOADERS = {
+    JSON: (loads, False),
+    JSON_DEFLATED: (loads, True),
+    MSGPACK: (load_msgpack, False),
+    MSGPACK_DEFLATED: (load_msgpack, True),
+}
+
+
+def deflate(data, level):
+    # negative window bits: raw deflate stream, no gzip/zlib headers
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def inflate(data):
+    return zlib.decompress(data, -zlib.MAX_WBITS)
+
+
+class ColumnCodec(object):
+    '''Encodes column values as a version byte followed by the payload.
+
+    Values serialized to less than `threshold` bytes are stored as is,
+    bigger ones are raw deflated. Rows written by the old gzip codec
+    (which start with the gzip magic number) are still decoded.
+    '''
+
+    def __init__(self, serializer='json', threshold=128, level=6):
+        if serializer not in SERIALIZERS:
+            raise ValueError('Unknown column serializer: %s' % serializer)
+
+        self.serializer = serializer
+        self.threshold = threshold
+        self.level = level
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            serializer=config.COLUMN_CODEC_SERIALIZER,
+            threshold=config.COLUMN_CODEC_COMPRESSION_THRESHOLD,
+            level=config.COLUMN_CODEC_COMPRESSION_LEVEL
+        )
+
+    def encode(self, value):
+        plain, deflated, dump = SERIALIZERS[self.serializer]
+
+        data = dump(value)
+        if isinstance(data, unicode):
+            data = data.encode('utf-8')
+
+        if len(data) < self.threshold:
+            return plain + data
+
+        return deflated + deflate(data, self.level)
+
+    def decode(self, data):
+        if self.is_legacy(data):
+            return loads(GzipFile(mode='r', fileobj=StringIO(data)).read())
+
+        version, payload = data[:1], data[1:]
+
+        if version not in LOADERS:
+            raise ValueError('Unknown column codec version: %r' % version)
+
+        load, is_deflated = LOADERS[version]
+
+        if is_deflated:
+            payload = inflate(payload)
+
+        return load(payload)
+
+    def is_legacy(self, data):
+        return data[:2] == GZIP_MAGIC
+
+    def is_current(self, data):
+        plain, deflated, dump = SERIALIZERS[self.serializer]
+        return data[:1] in (plain, deflated)
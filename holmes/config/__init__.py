@@ -10,10 +10,18 @@ HOUR = MINUTE * 60
 DAY = 24 * HOUR
 
 Config.define('WORKER_SLEEP_TIME', 10, _('Main loop sleep time'), 'Worker')
+Config.define('USE_REVIEW_PERSISTENCE_QUEUE', False, _('Push finished reviews to a Redis queue drained by holmes-persister instead of saving them in the worker'), 'Worker')
+Config.define('REVIEW_PERSISTENCE_BATCH_SIZE', 50, _('Number of queued reviews holmes-persister saves in a single transaction'), 'Worker')
+Config.define('REVIEW_PERSISTENCE_MAX_ATTEMPTS', 3, _('Number of times holmes-persister tries to save a queued review before moving it to the dead-letter list'), 'Worker')
 Config.define('ZOMBIE_WORKER_TIME', 200,
               _('Time to remove a Worker from API List (must be greater than WORKER_SLEEP_TIME + Validation time)'), 'API')
 
 Config.define('WORKERS_LOOK_AHEAD_PAGES', 10000, _('Number of pages that will be retrieved when looking for the next job'), 'Worker')
+Config.define('JOB_PRIORITY_SCORE_WEIGHT', HOUR, _('Seconds a job jumps ahead in the job bucket for each point of page score'), 'Worker')
+Config.define('JOB_PRIORITY_STALENESS_WEIGHT', MINUTE, _('Seconds a job jumps ahead in the job bucket for each hour since its page was last reviewed'), 'Worker')
+Config.define('JOB_PRIORITY_EXPIRES_WEIGHT', MINUTE, _('Seconds a job jumps ahead in the job bucket for each hour since its page content expired'), 'Worker')
+Config.define('WORKERS_MAX_SKIPPED_PAGES_PER_DOMAIN', 1000, _('Number of pages of a domain held back by its limiters that are remembered to be queued on later refills of the job bucket'), 'Worker')
+Config.define('WORKERS_LEASE_BATCH_SIZE', 5, _('Number of jobs a worker leases from the job bucket in a single call'), 'Worker')
 
 Config.define('CONNECT_TIMEOUT_IN_SECONDS', 10, _('Number of seconds a connection can take.'), 'Worker')
 Config.define('REQUEST_TIMEOUT_IN_SECONDS', 10, _('Number of seconds a request can take.'), 'Worker')
@@ -31,8 +39,24 @@ Config.define('FACTERS', [], _('List of classes to get facts about a website'),
 Config.define('VALIDATORS', [], _('List of classes to validate a website'), 'Review')
 Config.define('REVIEW_EXPIRATION_IN_SECONDS', 6 * 60 * 60, _('Number of seconds that a review expires in.'), 'Review')
 Config.define('NUMBER_OF_REVIEWS_TO_KEEP', 4, _('Maximum number of reviews to keep'), 'Review')
+Config.define('REVIEW_RETENTION_BATCH_SIZE', 1000, _('Size of the review id ranges holmes-retention prunes in each transaction'), 'Review')
+Config.define('REVIEW_RETENTION_BATCHES_PER_RUN', 100, _('Number of review id ranges holmes-retention prunes in each run, the next run resumes where it stopped'), 'Review')
+Config.define('USE_CONDITIONAL_REQUESTS', True,
+              _('Send If-Modified-Since/If-None-Match when reviewing a page again and keep the last review if it did not change'), 'Review')
+Config.define('MAX_REQUESTS_PER_REVIEW', 1000, _('Maximum number of requests (besides the page itself) made by a single review (0 for no limit)'), 'Review')
+Config.define('MAX_BYTES_PER_REVIEW', 100 * 1024 * 1024, _('Maximum number of bytes downloaded by the requests of a single review (0 for no limit)'), 'Review')
+Config.define('MAX_REVIEW_DURATION_IN_SECONDS', 5 * MINUTE, _('Seconds after which a review stops making new requests (0 for no limit)'), 'Review')
+Config.define('MAX_REQUESTS_IN_FLIGHT_PER_REVIEW', 10, _('Maximum number of requests a single review waits for at once, the others are made as responses arrive (0 for no limit)'), 'Review')
+Config.define('PARSE_EXECUTOR_WORKERS', 0, _('Number of processes (and threads) parsing big pages and sitemaps away from the IOLoop of a worker (0 parses on the IOLoop)'), 'Review')
+Config.define('PARSE_EXECUTOR_MIN_SIZE_IN_BYTES', 256 * 1024, _('Documents smaller than this are parsed on the IOLoop even when parse workers are enabled'), 'Review')
+Config.define('SITEMAP_DISCOVERY_BATCH_SIZE', 1000, _('Number of pages listed in sitemaps added to the domain per insert'), 'Review')
+Config.define('PROBE_LINKS_WITH_HEAD_REQUESTS', True,
+              _('Check links with HEAD requests (falling back to GET when the server does not support HEAD)'), 'Review')
+Config.define('PROBE_IMAGES_WITH_HEAD_REQUESTS', True,
+              _('Get image sizes from the Content-Length of HEAD requests (falling back to GET when it is missing)'), 'Review')
 
 Config.define('DAYS_TO_KEEP_REQUESTS', 12, _('Number of days to keep requests'), 'Requests')
+Config.define('REQUEST_RETENTION_BATCH_SIZE', 10000, _('Size of the request id ranges holmes-retention deletes in each transaction'), 'Requests')
 Config.define('MAX_REQUESTS_FOR_FAILED_RESPONSES', 1000, _('Number of requests for failed responses'), 'Requests')
 Config.define('HOLMES_USER_AGENT', 'Mozilla/5.0 (compatible; Holmes)', _('User agent'), 'Requests')
 
@@ -116,6 +140,7 @@ Config.define('TOP_CATEGORY_VIOLATIONS_EXPIRATION_IN_SECONDS', 6 * 60, _('Expira
 Config.define('URL_LOCK_EXPIRATION_IN_SECONDS', 30, _('Expiration for the URL lock for each URL'), 'Cache')
 Config.define('NEXT_JOB_URL_LOCK_EXPIRATION_IN_SECONDS', 3 * 60, _('Expiration for the URL lock for next jobs'), 'Cache')
 Config.define('NEXT_JOBS_COUNT_EXPIRATION_IN_SECONDS', HOUR, _('Expiration for the cache key for next jobs count'), 'Cache')
+Config.define('NEXT_JOB_LEASE_EXPIRATION_IN_SECONDS', 10 * MINUTE, _('Expiration for leased jobs (and their locks) before they go back to the job bucket'), 'Cache')
 
 materials_expiration_in_seconds = {
     'domains_details': 0.5 * MINUTE + 1,
@@ -154,6 +179,9 @@ Config.define('DEFAULT_PAGE_SCORE', 1, _('Page Score for pages that the user inc
 Config.define('PAGE_SCORE_TAX_RATE', 0.1, _('Default tax rate for scoring pages.'), 'General')
 
 Config.define('REQUEST_CACHE_EXPIRATION_IN_SECONDS', HOUR, _('Expiration in seconds for cache storage of responses.'), 'Cache')
+Config.define('REQUEST_STATS_BUCKET_SIZE_IN_SECONDS', 5 * MINUTE, _('Size in seconds of each bucket of the rolling request statistics of a domain.'), 'Cache')
+Config.define('REQUEST_STATS_WINDOW_IN_SECONDS', HOUR, _('Window in seconds covered by the rolling request statistics of a domain.'), 'Cache')
+Config.define('RESOURCE_SUMMARY_EXPIRATION_IN_SECONDS', HOUR, _('Expiration in seconds for the summaries (status, sizes and effective url) of CSS, JS, images and links shared by all reviews.'), 'Cache')
 
 Config.define('MAX_URL_LEVELS', 20, _('Maximum levels of URL'))
 
@@ -176,7 +204,15 @@ Config.define('EVENT_BUS_THROTTLING_MESSAGE_TYPE', throttling_message_type, _('T
 
 Config.define('SQLALCHEMY_AUTO_FLUSH', True, _('Defines whether auto-flush should be used in sqlalchemy'))
 
+Config.define('COLUMN_CODEC_SERIALIZER', 'json', _('Serializer used for fact and violation values (json or msgpack).'), 'DB')
+Config.define('COLUMN_CODEC_COMPRESSION_THRESHOLD', 128, _('Fact and violation values smaller than this many bytes are stored uncompressed.'), 'DB')
+Config.define('COLUMN_CODEC_COMPRESSION_LEVEL', 6, _('Deflate level used for fact and violation values.'), 'DB')
+Config.define('COLUMN_CODEC_BACKFILL_BATCH_SIZE', 1000, _('Number of rows re-encoded per transaction by holmes-backfill-values.'), 'DB')
+
 Config.define('DOMAINS_VIOLATIONS_PREFS_EXPIRATION_IN_SECONDS', HOUR, _('Expiration in seconds for domains violations prefs.'), 'Cache')
+Config.define('REVIEW_JSON_EXPIRATION_IN_SECONDS', DAY, _('Expiration in seconds for the rendered facts and violations of a review (per language).'), 'Cache')
+Config.define('LOCAL_DOMAINS_VIOLATIONS_PREFS_EXPIRATION_IN_SECONDS', MINUTE, _('Expiration in seconds for the domains violations prefs each worker keeps in memory.'), 'Cache')
+Config.define('DOMAINS_VIOLATIONS_PREFS_EVENTS_INTERVAL_IN_SECONDS', 1, _('Interval in seconds between checks for domains violations prefs changes while a worker reviews pages.'), 'Cache')
 
 Config.define('SECRET_KEY', 'set-a-secret-key', _('Secret key to use in JSON Web Token generation'), 'Sessions')
 Config.define('SESSION_EXPIRATION', HOUR, _('Time for Session expiration in seconds'), 'Sessions')
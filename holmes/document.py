@@ -0,0 +1,91 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+
+HEADINGS = ('h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+
+
+class Document(object):
+    '''Elements of a page that facters and validators look for, collected
+    in a single walk over the lxml tree, in document order.
+
+    Each attribute matches what the selector in its comment used to return.
+    '''
+
+    def __init__(self, html):
+        self.html = html
+
+        self.heads = []         # head
+        self.bodies = []        # body
+        self.titles = []        # title
+        self.metas = []         # meta
+        self.links = []         # :not(script) a[href]
+        self.images = []        # :not(script) img[src]
+        self.all_images = []    # img[src]
+        self.stylesheets = []   # link[href]
+        self.scripts = []       # script
+        self.js_scripts = []    # script[src]
+        self.headings = []      # body h1,h2,h3,h4,h5,h6
+
+        self.extract(html)
+
+    def extract(self, html):
+        if html is None:
+            return
+
+        for element in html.iter():
+            tag = element.tag
+
+            # comments and processing instructions have callables as tags
+            if not isinstance(tag, basestring):
+                continue
+
+            attrib = element.attrib
+            has_parent = element.getparent() is not None
+
+            if tag == 'a':
+                if has_parent and 'href' in attrib:
+                    self.links.append(element)
+
+            elif tag == 'img':
+                if 'src' in attrib:
+                    self.all_images.append(element)
+                    if has_parent:
+                        self.images.append(element)
+
+            elif tag == 'link':
+                if 'href' in attrib:
+                    self.stylesheets.append(element)
+
+            elif tag == 'script':
+                self.scripts.append(element)
+                if 'src' in attrib:
+                    self.js_scripts.append(element)
+
+            elif tag == 'meta':
+                self.metas.append(element)
+
+            elif tag == 'title':
+                self.titles.append(element)
+
+            elif tag == 'head':
+                self.heads.append(element)
+
+            elif tag == 'body':
+                self.bodies.append(element)
+
+            elif tag in HEADINGS:
+                # the selector reads as (body h1), h2, ..., h6
+                if tag != 'h1' or self.is_in_body(element):
+                    self.headings.append(element)
+
+    def is_in_body(self, element):
+        for ancestor in element.iterancestors():
+            if ancestor.tag == 'body':
+                return True
+
+            # just like the selector, what is above the walked tree does not count
+            if ancestor is self.html:
+                break
+
+        return False
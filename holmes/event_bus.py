@@ -7,6 +7,10 @@ from time import time
 from ujson import loads
 
 
+# workers listen to this channel only, so the events of the api do not pile up on them
+DOMAINS_VIOLATIONS_PREFS_CHANNEL = 'domains-violations-prefs'
+
+
 class NoOpEventBus(object):
     def __init__(self, application):
         self.application = application
@@ -17,7 +21,7 @@ class NoOpEventBus(object):
     def unsubscribe(self, channel, uuid):
         pass
 
-    def publish(self, message):
+    def publish(self, message, channel='events'):
         pass
 
     def flush(self):
@@ -44,8 +48,8 @@ class EventBus(object):
 
         del self.handlers[channel][uuid]
 
-    def publish(self, message):
-        self.publish_items.append(('events', message))
+    def publish(self, message, channel='events'):
+        self.publish_items.append((channel, message))
 
     def flush(self):
         for channel, message in self.publish_items:
@@ -8,6 +8,7 @@ except ImportError:
     from urlparse import urlparse, urljoin
 
 from holmes.utils import is_valid
+from holmes.cache import BodySizeCounter
 
 
 class Baser(object):
@@ -54,11 +55,58 @@ class Baser(object):
     def async_get(self, url, handler, method='GET', **kw):
         self.reviewer._async_get(url, handler, method, **kw)
 
+    def parse(self, parse_func, text, callback, in_process=True):
+        self.reviewer.parse(parse_func, text, callback, in_process)
+
+    def async_get_summary(self, url, handler, probe=False, require_length=False):
+        summary = self.reviewer.get_resource_summary(url)
+
+        if summary is not None:
+            handler(url, summary)
+            return
+
+        if probe:
+            self.async_probe(url, handler, require_length)
+        else:
+            self.async_get_streamed(url, handler)
+
+    def async_probe(self, url, handler, require_length=False):
+        def handle_probe(url, response):
+            # servers that do not implement HEAD (or do not tell the length
+            # when we need it) are asked again with a plain GET
+            if response.status_code in (405, 501):
+                self.async_get_streamed(url, handler)
+                return
+
+            if require_length and response.status_code < 400 and \
+               'Content-Length' not in (response.headers or {}):
+                self.async_get_streamed(url, handler)
+                return
+
+            handler(url, response)
+
+        self.async_get(url, handle_probe, 'HEAD')
+
+    def async_get_streamed(self, url, handler):
+        counter = BodySizeCounter()
+
+        def handle(url, response):
+            handler(url, self.summarize(url, response, counter))
+
+        self.async_get(url, handle, streaming_callback=counter)
+
+    def summarize(self, url, response, counter=None):
+        return self.reviewer.summarize_resource(url, response, counter)
+
 
 class Facter(Baser):
 
     unit = 'value'
 
+    # review.data keys this facter fills; validators that consume any of
+    # them wait for its requests. None means unknown (waited for by all).
+    produces = None
+
     @classmethod
     def get_fact_definitions(cls):
         raise NotImplementedError
@@ -8,6 +8,8 @@ from holmes.utils import _
 
 
 class CSSFacter(Facter):
+    produces = ('page.css', 'total.size.css', 'total.size.css.gzipped')
+
     @classmethod
     def get_fact_definitions(cls):
         return {
@@ -79,21 +81,19 @@ class CSSFacter(Facter):
         )
 
         for url in css_to_get:
-            self.async_get(url, self.handle_url_loaded)
+            self.async_get_summary(url, self.handle_url_loaded)
 
     def handle_url_loaded(self, url, response):
         logging.debug('Got response (%s) from %s!' % (response.status_code,
                                                       url))
 
+        summary = self.summarize(url, response)
+
         self.review.facts['page.css']['value'].add(url)
-        self.review.data['page.css'].add((url, response))
+        self.review.data['page.css'].add((url, summary))
 
-        if response.text:
-            size_css = len(response.text) / 1024.0
-            size_gzip = len(self.to_gzip(response.text)) / 1024.0
-        else:
-            size_css = 0
-            size_gzip = 0
+        size_css = summary.size / 1024.0
+        size_gzip = summary.gzipped_size / 1024.0
 
         self.review.facts['total.size.css']['value'] += size_css
         self.review.data['total.size.css'] += size_css
@@ -102,4 +102,4 @@ class CSSFacter(Facter):
         self.review.data['total.size.css.gzipped'] += size_gzip
 
     def get_css(self):
-        return self.reviewer.current_html.cssselect('link[href]')
+        return self.reviewer.current_document.stylesheets
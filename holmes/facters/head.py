@@ -5,12 +5,14 @@ from holmes.facters import Facter
 
 
 class HeadFacter(Facter):
+    produces = ('page.head',)
+
     @classmethod
     def get_fact_definitions(cls):
         return {}
 
     def get_facts(self):
-        head = self.reviewer.current_html.cssselect('head')
+        head = self.reviewer.current_document.heads
 
         if not head:
             return
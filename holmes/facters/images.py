@@ -8,6 +8,8 @@ from holmes.utils import _
 
 
 class ImageFacter(Facter):
+    produces = ('page.all_images', 'page.images', 'total.size.img')
+
     @classmethod
     def get_fact_definitions(cls):
         return {
@@ -72,7 +74,11 @@ class ImageFacter(Facter):
         self.review.data['page.all_images'] = images_without_base64
 
         for src in images_to_get:
-            self.async_get(src, self.handle_url_loaded)
+            self.async_get_summary(
+                src, self.handle_url_loaded,
+                probe=self.config.PROBE_IMAGES_WITH_HEAD_REQUESTS,
+                require_length=True
+            )
 
         self.add_fact(
             key='total.requests.img',
@@ -83,15 +89,15 @@ class ImageFacter(Facter):
         logging.debug('Got response (%s) from %s!' % (response.status_code,
                                                       url))
 
-        size_img = 0
-        if response.text:
-            size_img = len(response.text) / 1024.0
+        summary = self.summarize(url, response)
+
+        size_img = summary.size / 1024.0
 
         self.review.facts['page.images']['value'].add(url)
-        self.review.data['page.images'].add((url, response))
+        self.review.data['page.images'].add((url, summary))
 
         self.review.facts['total.size.img']['value'] += size_img
         self.review.data['total.size.img'] += size_img
 
     def get_images(self):
-        return self.reviewer.current_html.cssselect(':not(script) img[src]')
+        return self.reviewer.current_document.images
@@ -8,6 +8,8 @@ from holmes.utils import _
 
 
 class JSFacter(Facter):
+    produces = ('page.js', 'total.size.js', 'total.size.js.gzipped')
+
     @classmethod
     def get_fact_definitions(cls):
         return {
@@ -77,21 +79,19 @@ class JSFacter(Facter):
         )
 
         for url in js_to_get:
-            self.async_get(url, self.handle_url_loaded)
+            self.async_get_summary(url, self.handle_url_loaded)
 
     def handle_url_loaded(self, url, response):
         logging.debug('Got response (%s) from %s!' % (response.status_code,
                                                       url))
 
+        summary = self.summarize(url, response)
+
         self.review.facts['page.js']['value'].add(url)
-        self.review.data['page.js'].add((url, response))
+        self.review.data['page.js'].add((url, summary))
 
-        if response.text:
-            size_js = len(response.text) / 1024.0
-            size_gzip = len(self.to_gzip(response.text)) / 1024.0
-        else:
-            size_js = 0
-            size_gzip = 0
+        size_js = summary.size / 1024.0
+        size_gzip = summary.gzipped_size / 1024.0
 
         self.review.facts['total.size.js']['value'] += size_js
         self.review.data['total.size.js'] += size_js
@@ -100,4 +100,4 @@ class JSFacter(Facter):
         self.review.data['total.size.js.gzipped'] += size_gzip
 
     def get_js_requests(self):
-        return self.reviewer.current_html.cssselect('script[src]')
+        return self.reviewer.current_document.js_scripts
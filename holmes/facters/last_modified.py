@@ -10,6 +10,8 @@ from holmes.utils import _
 
 class LastModifiedFacter(Facter):
 
+    produces = ('page.last_modified',)
+
     @classmethod
     def get_fact_definitions(cls):
         return {
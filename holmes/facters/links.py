@@ -18,6 +18,8 @@ URL_RE = re.compile(
 
 
 class LinkFacter(Facter):
+    produces = ('page.all_links', 'page.links')
+
     @classmethod
     def get_fact_definitions(cls):
         return {
@@ -101,7 +103,10 @@ class LinkFacter(Facter):
                 links_to_get.add(url)
 
         for url in links_to_get:
-            self.async_get(url, self.handle_url_loaded)
+            self.async_get_summary(
+                url, self.handle_url_loaded,
+                probe=self.config.PROBE_LINKS_WITH_HEAD_REQUESTS
+            )
 
         self.add_fact(
             key='total.number.links',
@@ -120,8 +125,10 @@ class LinkFacter(Facter):
 
     def handle_url_loaded(self, url, response):
         logging.debug('Got response (%s) from %s!' % (response.status_code, url))
+        summary = self.summarize(url, response)
+
         self.review.facts['page.links']['value'].add(url)
-        self.review.data['page.links'].add((url, response))
+        self.review.data['page.links'].add((url, summary))
 
     def get_links(self):
-        return self.reviewer.current_html.cssselect(':not(script) a[href]')
+        return self.reviewer.current_document.links
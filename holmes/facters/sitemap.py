@@ -3,11 +3,9 @@
 
 import logging
 import re
-import lxml.etree
-from cStringIO import StringIO
-from gzip import GzipFile
 
 from holmes.facters import Facter
+from holmes.parsing import parse_sitemap
 from holmes.utils import _
 
 
@@ -16,6 +14,17 @@ ROBOTS_SITEMAP = re.compile('Sitemap:\s+(.*)')
 
 class SitemapFacter(Facter):
 
+    produces = (
+        'sitemap.data',
+        'sitemap.files',
+        'sitemap.files.size',
+        'sitemap.files.empty',
+        'sitemap.files.urls',
+        'sitemap.urls.not_encoded',
+        'total.size.sitemap',
+        'total.size.sitemap.gzipped',
+    )
+
     @classmethod
     def get_fact_definitions(cls):
         return {
@@ -46,8 +55,9 @@ class SitemapFacter(Facter):
             return
 
         self.review.data['sitemap.data'] = {}
-        self.review.data['sitemap.urls'] = {}
+        self.review.data['sitemap.urls.not_encoded'] = {}
         self.review.data['sitemap.files'] = set()
+        self.review.data['sitemap.files.empty'] = set()
         self.review.data['sitemap.files.size'] = {}
         self.review.data['sitemap.files.urls'] = {}
         self.review.data['total.size.sitemap'] = 0
@@ -89,50 +99,50 @@ class SitemapFacter(Facter):
         logging.debug('Got sitemap %s with status %s' % (url, response.status_code))
         self.review.data['sitemap.data'][url] = response
 
-        namespaces = [
-            ('sm', 'http://www.sitemaps.org/schemas/sitemap/0.9'),
-        ]
-
         if response.status_code > 399 or response.text is None or not response.text.strip():
             return
 
-        try:
-            gzipped = GzipFile(mode='r', fileobj=StringIO(response.text))
-            response.text = gzipped.read()
-        except IOError:
-            pass
-
         self.review.facts['total.sitemap.indexes']['value'] += 1
 
-        size_sitemap = len(response.text) / 1024.0
-        size_gzip = len(self.to_gzip(response.text)) / 1024.0
+        # gzipped sitemaps are decompressed while they are parsed
+        self.parse(parse_sitemap, response.text, self.handle_sitemap_parsed(url))
+
+    def handle_sitemap_parsed(self, url):
+        def handle(sitemap):
+            if sitemap is None:
+                logging.warning('Could not parse sitemap %s.' % url)
+                return
 
-        self.review.data['sitemap.files.urls'][url] = 0
-        self.review.data['sitemap.files.size'][url] = size_sitemap
-        self.review.data['sitemap.urls'][url] = set()
+            size_sitemap = sitemap['size'] / 1024.0
+            size_gzip = sitemap['gzipped_size'] / 1024.0
+            urls_count = len(sitemap['sitemaps']) + sitemap['urls_count']
 
-        self.review.facts['total.size.sitemap']['value'] += size_sitemap
-        self.review.data['total.size.sitemap'] += size_sitemap
+            self.review.data['sitemap.files.size'][url] = size_sitemap
+            self.review.data['sitemap.files.urls'][url] = urls_count
+            self.review.data['sitemap.urls.not_encoded'][url] = {
+                'count': sitemap['not_encoded_count'],
+                'sample': sitemap['not_encoded_sample'],
+            }
+
+            if sitemap['empty']:
+                self.review.data['sitemap.files.empty'].add(url)
 
-        self.review.facts['total.size.sitemap.gzipped']['value'] += size_gzip
-        self.review.data['total.size.sitemap.gzipped'] += size_gzip
+            self.review.facts['total.size.sitemap']['value'] += size_sitemap
+            self.review.data['total.size.sitemap'] += size_sitemap
 
-        magical_parser = lxml.etree.XMLParser(encoding='utf-8', recover=True)
-        tree = lxml.etree.parse(StringIO(response.text), magical_parser)
+            self.review.facts['total.size.sitemap.gzipped']['value'] += size_gzip
+            self.review.data['total.size.sitemap.gzipped'] += size_gzip
 
-        for sitemap in tree.xpath('//sm:sitemap | //sitemap', namespaces=namespaces):
-            for loc in sitemap.xpath('sm:loc | loc', namespaces=namespaces):
-                loc = loc.text.strip()
+            self.review.facts['total.sitemap.urls']['value'] += sitemap['urls_count']
+
+            for loc in sitemap['sitemaps']:
                 self.review.data['sitemap.files'].add(loc)
-                self.review.data['sitemap.files.urls'][url] += 1
                 self.async_get(loc, self.handle_sitemap_loaded)
 
-        for sitemap in tree.xpath('//sm:url | //url', namespaces=namespaces):
-            for loc in sitemap.xpath('sm:loc | loc', namespaces=namespaces):
-                loc = loc.text.strip()
-                self.review.data['sitemap.urls'][url].add(loc)
-                self.review.data['sitemap.files.urls'][url] += 1
-                self.review.facts['total.sitemap.urls']['value'] += 1
+            # the pages are not kept in the review, their priority becomes their score
+            self.reviewer.discover_pages(sitemap['urls'])
+
+        return handle
 
     def handle_robots_loaded(self, url, response):
         sitemaps = self.get_sitemaps(response)
@@ -24,6 +24,7 @@ class BaseHandler(RequestHandler):
 
         locale = self.get_browser_locale()
         self._ = utils.install_i18n(locale.code)
+        self.language = utils.get_language(locale.code)
         self.jwt = utils.Jwt(self.config.SECRET_KEY)
 
     def get_authenticated_user(self):
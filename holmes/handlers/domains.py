@@ -77,6 +77,9 @@ class DomainDetailsHandler(BaseHandler):
             "homepageReviewId": "",
         }
 
+        request_stats = yield self.cache.get_request_stats(domain.name)
+        domain_json["recentRequests"] = request_stats.to_dict()
+
         homepage = domain.get_homepage(self.db)
 
         if homepage:
@@ -62,7 +62,8 @@ class DomainsViolationsPrefsHandler(BaseHandler):
         post_data = loads(self.request.body)
 
         DomainsViolationsPrefs.update_by_domain(
-            self.db, self.cache, domain, post_data
+            self.db, self.cache, domain, post_data,
+            self.application.event_bus.publish
         )
 
         self.write_json({
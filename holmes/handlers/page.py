@@ -67,7 +67,7 @@ class PageHandler(BaseHandler):
             })
             return
 
-        yield self.application.cache.add_next_job_bucket(result, url)
+        yield self.application.cache.add_next_job_bucket(result, url, score)
 
         self.write(str(result))
         self.finish()
@@ -4,6 +4,9 @@
 import datetime
 from uuid import UUID
 
+from tornado import gen
+from ujson import dumps, loads
+
 from holmes.models import Review, Page
 from holmes.handlers import BaseHandler
 
@@ -15,13 +18,57 @@ class BaseReviewHandler(BaseHandler):
         except ValueError:
             return None
 
+    @gen.coroutine
+    def get_reviews_dicts(self, reviews):
+        # facts and violations of a complete review never change, so they are
+        # rendered once per language and kept until the review is deleted
+        cached = yield [self.get_cached_review_json(review) for review in reviews]
+
+        # only the reviews not rendered yet need their facts and violations
+        Review.load_details(self.db, [review for review, data in zip(reviews, cached) if data is None])
+
+        results = yield [self.get_review_dict(review, data) for review, data in zip(reviews, cached)]
+
+        raise gen.Return(results)
+
+    @gen.coroutine
+    def get_cached_review_json(self, review):
+        data = None
+        if review.is_complete:
+            data = yield self.cache.get_review_json(review.uuid, self.language)
+
+        raise gen.Return(data)
+
+    @gen.coroutine
+    def get_review_dict(self, review, data=None):
+        if data is not None:
+            result = loads(data)
+        else:
+            result = review.to_dict(self.application.fact_definitions,
+                                    self.application.violation_definitions,
+                                    self._)
+            result.update({
+                'violationPoints': review.get_violation_points(),
+                'violationCount': review.violation_count,
+            })
+
+            if review.is_complete:
+                yield self.cache.set_review_json(
+                    review.uuid, self.language, dumps(dict(result, page=None))
+                )
+
+        result['page'] = review.page and review.page.to_dict() or None
+
+        raise gen.Return(result)
+
 
 class ReviewHandler(BaseReviewHandler):
+    @gen.coroutine
     def get(self, page_uuid, review_uuid):
         review = None
         page = None
         if self._parse_uuid(review_uuid):
-            review = Review.by_uuid(review_uuid, self.db)
+            review = Review.by_uuid(review_uuid, self.db, load_page=True)
 
         if self._parse_uuid(page_uuid):
             page = Page.by_uuid(page_uuid, self.db)
@@ -34,33 +81,22 @@ class ReviewHandler(BaseReviewHandler):
             self.set_status(404, self._('Page UUID [%s] not found') % page_uuid)
             return
 
-        result = review.to_dict(self.application.fact_definitions,
-                                self.application.violation_definitions,
-                                self._)
-        result.update({
-            'violationPoints': review.get_violation_points(),
-            'violationCount': review.violation_count,
-        })
+        results = yield self.get_reviews_dicts([review])
 
-        self.write_json(result)
+        self.write_json(results[0])
 
 
 class LastReviewsHandler(BaseReviewHandler):
+    @gen.coroutine
     def get(self):
         reviews = Review.get_last_reviews(
             self.db, domain_filter=self.get_argument('domain_filter', None)
         )
 
-        reviews_json = []
-        for review in reviews:
-            review_dict = review.to_dict(self.application.fact_definitions,
-                                         self.application.violation_definitions,
-                                         self._)
-            data = {
-                'violationCount': review.violation_count,
-            }
-            review_dict.update(data)
-            reviews_json.append(review_dict)
+        reviews_json = yield self.get_reviews_dicts(reviews)
+
+        for review_dict in reviews_json:
+            del review_dict['violationPoints']
 
         self.write_json(reviews_json)
 
@@ -0,0 +1,25 @@
+"""add content hash to reviews
+
+Revision ID: 3a5c0c1f7d2b
+Revises: 561f60904a0e
+Create Date: 2026-10-18 11:02:47.318220
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '3a5c0c1f7d2b'
+down_revision = '561f60904a0e'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.add_column(
+        'reviews',
+        sa.Column('content_hash', sa.String(128), nullable=True)
+    )
+
+
+def downgrade():
+    op.drop_column('reviews', 'content_hash')
@@ -0,0 +1,56 @@
+"""create domain stats table
+
+Revision ID: 4b7e2d1a9c3f
+Revises: 3a5c0c1f7d2b
+Create Date: 2026-10-18 15:21:09.481152
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '4b7e2d1a9c3f'
+down_revision = '3a5c0c1f7d2b'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table(
+        'domain_stats',
+        sa.Column('domain_id', sa.Integer, primary_key=True, autoincrement=False),
+        sa.Column('page_count', sa.Integer, server_default='0', nullable=False),
+        sa.Column('review_count', sa.Integer, server_default='0', nullable=False),
+        sa.Column('violation_count', sa.Integer, server_default='0', nullable=False),
+        sa.Column('good_request_count', sa.Integer, server_default='0', nullable=False),
+        sa.Column('bad_request_count', sa.Integer, server_default='0', nullable=False),
+        sa.Column('response_time_sum', sa.Float, server_default='0', nullable=False)
+    )
+
+    op.create_foreign_key(
+        "fk_domain_stats_domain", "domain_stats",
+        "domains", ["domain_id"], ["id"]
+    )
+
+    op.execute(
+        'INSERT INTO domain_stats ('
+        '  domain_id, page_count, review_count, violation_count,'
+        '  good_request_count, bad_request_count, response_time_sum'
+        ') SELECT d.id,'
+        '  (SELECT COUNT(*) FROM pages p WHERE p.domain_id = d.id),'
+        '  (SELECT COUNT(DISTINCT r.page_id) FROM reviews r'
+        '   WHERE r.domain_id = d.id AND r.is_active = 1),'
+        '  (SELECT COUNT(*) FROM violations v'
+        '   WHERE v.domain_id = d.id AND v.review_is_active = 1),'
+        '  (SELECT COUNT(*) FROM requests q'
+        '   WHERE q.domain_name = d.name AND q.status_code < 400),'
+        '  (SELECT COUNT(*) FROM requests q'
+        '   WHERE q.domain_name = d.name AND q.status_code > 399),'
+        '  (SELECT COALESCE(SUM(q.response_time), 0) FROM requests q'
+        '   WHERE q.domain_name = d.name AND q.status_code < 400)'
+        ' FROM domains d'
+    )
+
+
+def downgrade():
+    op.drop_constraint('fk_domain_stats_domain', 'domain_stats', type_="foreignkey")
+    op.drop_table('domain_stats')
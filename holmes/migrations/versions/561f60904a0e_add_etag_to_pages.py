@@ -0,0 +1,25 @@
+"""add etag to pages
+
+Revision ID: 561f60904a0e
+Revises: 2e3c3d79c318
+Create Date: 2026-10-18 10:12:31.204512
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '561f60904a0e'
+down_revision = '2e3c3d79c318'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.add_column(
+        'pages',
+        sa.Column('etag', sa.String(255), nullable=True)
+    )
+
+
+def downgrade():
+    op.drop_column('pages', 'etag')
@@ -1,13 +1,12 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
-from gzip import GzipFile
-from cStringIO import StringIO
-
 import sqlalchemy.types as types
 from sqlalchemy.ext.declarative import declarative_base
 from ujson import dumps, loads
 
+from holmes.codec import ColumnCodec
+
 Base = declarative_base()
 
 
@@ -35,25 +34,27 @@ class JsonType(types.TypeDecorator):
         return value
 
 
-class JsonTypeGzipped(types.TypeDecorator):
+class JsonTypeCompressed(types.TypeDecorator):
     impl = types.BLOB
 
+    codec = ColumnCodec()
+
+    @classmethod
+    def set_codec(cls, codec):
+        cls.codec = codec
+
     def process_bind_param(self, value, dialect):
-        value = dumps(value)
-        out = StringIO()
-        with GzipFile(fileobj=out, mode="w", mtime=0) as f:
-            f.write(value)
-        return out.getvalue()
+        return self.codec.encode(value)
 
     def process_result_value(self, value, dialect):
         if value:
-            gzipped = GzipFile(mode='r', fileobj=StringIO(value))
-            out = loads(gzipped.read())
+            out = self.codec.decode(value)
         else:
             out = ''
         return out
 
 from holmes.models.domain import Domain  # NOQA
+from holmes.models.domain_stats import DomainStats  # NOQA
 from holmes.models.page import Page  # NOQA
 from holmes.models.review import Review  # NOQA
 from holmes.models.fact import Fact  # NOQA
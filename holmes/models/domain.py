@@ -154,77 +154,39 @@ class Domain(Base):
     def get_domain_names(cls, db):
         return [item.name for item in db.query(Domain.name).all()]
 
-    def get_sample_requests(self, db, status_code_filter, limit=20000):
-        from holmes.models import Request
-
-        query = db \
-            .query(
-                Request.id,
-                Request.response_time.label('response_time')
-            ) \
-            .filter(Request.domain_name == self.name)
-
-        query = status_code_filter(query)
-
-        return query \
-            .order_by(Request.id.desc()) \
-            .limit(limit) \
-            .subquery()
-
-    def get_good_request_count(self, db):
-        from holmes.models import Request
-
-        sample_query = self.get_sample_requests(
-            db,
-            lambda query: query.filter(Request.status_code < 400)
-        )
-
-        return db \
-            .query(func.count(sample_query.columns.id)) \
-            .scalar()
-
-    def get_bad_request_count(self, db):
-        from holmes.models import Request
-
-        sample_query = self.get_sample_requests(
-            db,
-            lambda query: query.filter(Request.status_code > 399)
-        )
-
-        return db \
-            .query(func.count(sample_query.columns.id)) \
-            .scalar()
-
-    def get_response_time_avg(self, db):
-        from holmes.models import Request
-
-        sample_query = self.get_sample_requests(
-            db,
-            lambda query: query.filter(Request.status_code < 400)
-        )
-
-        time_avg = db \
-            .query(func.avg(sample_query.columns.response_time)) \
-            .scalar() or 0
-
-        return round(time_avg, 3)
-
     @classmethod
     def get_domains_details(cls, db):
-        domains = db.query(Domain).order_by(Domain.name.asc()).all()
+        from holmes.models import DomainStats
+
+        domains = db \
+            .query(Domain, DomainStats) \
+            .outerjoin(DomainStats, DomainStats.domain_id == Domain.id) \
+            .order_by(Domain.name.asc()) \
+            .all()
 
         if not domains:
             return []
 
         result = []
 
-        for domain in domains:
-            page_count = domain.get_page_count(db)
-            review_count = domain.get_active_review_count(db)
-            violation_count = domain.get_violation_data(db)
-            good_request_count = domain.get_good_request_count(db)
-            bad_request_count = domain.get_bad_request_count(db)
-            response_time_avg = domain.get_response_time_avg(db)
+        for domain, stats in domains:
+            if stats is None:
+                stats = DomainStats(
+                    domain_id=domain.id, page_count=0, review_count=0,
+                    violation_count=0, good_request_count=0,
+                    bad_request_count=0, response_time_sum=0.0
+                )
+
+            page_count = stats.page_count
+            review_count = stats.review_count
+            violation_count = stats.violation_count
+            good_request_count = stats.good_request_count
+            bad_request_count = stats.bad_request_count
+
+            if good_request_count > 0:
+                response_time_avg = round(stats.response_time_sum / good_request_count, 3)
+            else:
+                response_time_avg = 0
 
             if page_count > 0:
                 review_percentage = round(float(review_count) / page_count * 100, 2)
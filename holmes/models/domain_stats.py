@@ -0,0 +1,89 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import sqlalchemy as sa
+
+from holmes.models import Base
+
+
+class DomainStats(Base):
+    '''Per domain counters kept up to date as pages, reviews and requests
+    are saved (and as old requests are pruned), so domain details do not
+    need to be aggregated.'''
+
+    __tablename__ = "domain_stats"
+
+    COUNTERS = (
+        'page_count', 'review_count', 'violation_count',
+        'good_request_count', 'bad_request_count', 'response_time_sum'
+    )
+
+    domain_id = sa.Column(
+        'domain_id', sa.Integer, sa.ForeignKey('domains.id'),
+        primary_key=True, autoincrement=False
+    )
+
+    page_count = sa.Column('page_count', sa.Integer, server_default='0', nullable=False)
+    review_count = sa.Column('review_count', sa.Integer, server_default='0', nullable=False)
+    violation_count = sa.Column('violation_count', sa.Integer, server_default='0', nullable=False)
+    good_request_count = sa.Column('good_request_count', sa.Integer, server_default='0', nullable=False)
+    bad_request_count = sa.Column('bad_request_count', sa.Integer, server_default='0', nullable=False)
+    response_time_sum = sa.Column('response_time_sum', sa.Float, server_default='0', nullable=False)
+
+    def __str__(self):
+        return '%s: %d pages' % (self.domain_id, self.page_count)
+
+    def __repr__(self):
+        return str(self)
+
+    @classmethod
+    def increment(cls, db, domain_id, **counters):
+        counters = dict(
+            (name, value) for name, value in counters.items() if value
+        )
+
+        if not counters:
+            return
+
+        for name in counters:
+            if name not in cls.COUNTERS:
+                raise ValueError('Unknown domain counter: %s' % name)
+
+        names = sorted(counters)
+
+        query_params = dict(counters, domain_id=domain_id)
+
+        db.execute(
+            'INSERT INTO domain_stats (domain_id, %s) '
+            'VALUES (:domain_id, %s) ON DUPLICATE KEY '
+            'UPDATE %s' % (
+                ', '.join(names),
+                ', '.join([':%s' % name for name in names]),
+                ', '.join(['%s = %s + :%s' % (name, name, name) for name in names])
+            ),
+            query_params
+        )
+
+    @classmethod
+    def rebuild(cls, db):
+        '''Recomputes every counter from the pages, reviews, violations and
+        requests tables (slow, meant for repairs).'''
+        db.execute('DELETE FROM domain_stats')
+        db.execute(
+            'INSERT INTO domain_stats ('
+            '  domain_id, page_count, review_count, violation_count,'
+            '  good_request_count, bad_request_count, response_time_sum'
+            ') SELECT d.id,'
+            '  (SELECT COUNT(*) FROM pages p WHERE p.domain_id = d.id),'
+            '  (SELECT COUNT(DISTINCT r.page_id) FROM reviews r'
+            '   WHERE r.domain_id = d.id AND r.is_active = 1),'
+            '  (SELECT COUNT(*) FROM violations v'
+            '   WHERE v.domain_id = d.id AND v.review_is_active = 1),'
+            '  (SELECT COUNT(*) FROM requests q'
+            '   WHERE q.domain_name = d.name AND q.status_code < 400),'
+            '  (SELECT COUNT(*) FROM requests q'
+            '   WHERE q.domain_name = d.name AND q.status_code > 399),'
+            '  (SELECT COALESCE(SUM(q.response_time), 0) FROM requests q'
+            '   WHERE q.domain_name = d.name AND q.status_code < 400)'
+            ' FROM domains d'
+        )
@@ -2,9 +2,11 @@
 # -*- coding: utf-8 -*-
 
 import sqlalchemy as sa
+from ujson import dumps
 from collections import defaultdict
 
 from holmes.models import Base, JsonType
+from holmes.event_bus import DOMAINS_VIOLATIONS_PREFS_CHANNEL
 
 
 class DomainsViolationsPrefs(Base):
@@ -106,7 +108,7 @@ class DomainsViolationsPrefs(Base):
             )
 
     @classmethod
-    def update_by_domain(cls, db, cache, domain, data):
+    def update_by_domain(cls, db, cache, domain, data, publish=None):
         from holmes.models import Key
 
         if not domain or not data:
@@ -131,3 +133,10 @@ class DomainsViolationsPrefs(Base):
         db.flush()
 
         cache.delete_domain_violations_prefs(domain.name)
+
+        # workers keep the prefs in memory and drop them on this event
+        if publish is not None:
+            publish(dumps({
+                'type': 'domain-violations-prefs-changed',
+                'domain': domain.name
+            }), DOMAINS_VIOLATIONS_PREFS_CHANNEL)
@@ -3,7 +3,7 @@
 
 import sqlalchemy as sa
 
-from holmes.models import Base, JsonTypeGzipped
+from holmes.models import Base, JsonTypeCompressed
 
 
 class Fact(Base):
@@ -11,18 +11,21 @@ class Fact(Base):
 
     id = sa.Column(sa.Integer, primary_key=True)
 
-    value = sa.Column('value', JsonTypeGzipped, nullable=False)
+    value = sa.Column('value', JsonTypeCompressed, nullable=False)
 
     review_id = sa.Column('review_id', sa.Integer, sa.ForeignKey('reviews.id'))
     # review comes from Review relationship
 
     key_id = sa.Column('key_id', sa.Integer, sa.ForeignKey('keys.id'))
 
-    def to_dict(self, fact_definitions, _):
-        definition = fact_definitions.get(self.key.name, {})
+    def to_dict(self, fact_definitions, _, key_name=None):
+        if key_name is None:
+            key_name = self.key.name
+
+        definition = fact_definitions.get(key_name, {})
         return {
             'title': _(definition.get('title', _('unknown'))),
-            'key': self.key.name,
+            'key': key_name,
             'unit': definition.get('unit', 'value'),
             'value': definition.get('description', lambda value: value)(self.value),
             'category': _(definition.get('category', _('unknown')))
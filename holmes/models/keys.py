@@ -86,6 +86,7 @@ class Key(Base):
 
             key = Key.get_or_create(db, name, category_name)
             keys[name]['key'] = key
+            keys[name]['key_id'] = key.id
 
             db.commit()
 
@@ -37,6 +37,7 @@ class Page(Base):
 
     last_modified = sa.Column('last_modified', sa.DateTime, nullable=True)
     expires = sa.Column('expires', sa.DateTime, nullable=True)
+    etag = sa.Column('etag', sa.String(255), nullable=True)
 
     violations_count = sa.Column('violations_count', sa.Integer, server_default='0', nullable=False)
 
@@ -100,6 +101,40 @@ class Page(Base):
     def by_url_hash(cls, url_hash, db):
         return db.query(Page).filter(Page.url_hash == url_hash).first()
 
+    @classmethod
+    def get_next_pages_in_need_of_review(cls, db, domain_id, expired_time, after_id=0, limit=1000):
+        return cls._query_pages_in_need_of_review(db, expired_time) \
+            .filter(Page.domain_id == domain_id) \
+            .filter(Page.id > after_id) \
+            .order_by(Page.id.asc())[:limit]
+
+    @classmethod
+    def get_pages_in_need_of_review_by_ids(cls, db, page_ids, expired_time):
+        if not page_ids:
+            return []
+
+        return cls._query_pages_in_need_of_review(db, expired_time) \
+            .filter(Page.id.in_(page_ids)) \
+            .order_by(Page.id.asc()) \
+            .all()
+
+    @classmethod
+    def _query_pages_in_need_of_review(cls, db, expired_time):
+        return db \
+            .query(
+                Page.id,
+                Page.uuid,
+                Page.url,
+                Page.score,
+                Page.last_review_date,
+                Page.expires,
+                Page.created_date
+            ) \
+            .filter(or_(
+                Page.last_review_date == None,
+                Page.last_review_date <= expired_time
+            ))
+
     @classmethod
     def get_page_count(cls, db):
         return int(db.query(sa.func.count(Page.id)).scalar())
@@ -211,10 +246,11 @@ class Page(Base):
                 'score': score
             }
 
+            # a plain insert, so pages added meanwhile by someone else end up
+            # in the except clause instead of counting as new ones
             db.execute(
                 'INSERT INTO pages (url, url_hash, uuid, domain_id, created_date, score) '
-                'VALUES (:url, :url_hash, :uuid, :domain_id, :created_date, :score) ON DUPLICATE KEY '
-                'UPDATE score = :score',
+                'VALUES (:url, :url_hash, :uuid, :domain_id, :created_date, :score)',
                 query_params
             )
 
@@ -222,8 +258,16 @@ class Page(Base):
             err = sys.exc_info()[1]
             if 'Duplicate entry' in str(err):
                 logging.debug('Duplicate entry! (Details: %s)' % str(err))
+
+                page = Page.by_url_hash(url_hash, db)
+                if page:
+                    cache.increment_page_score(page.url)
+                    return page.uuid
             else:
                 raise
+        else:
+            from holmes.models import DomainStats  # to avoid circular dependency
+            DomainStats.increment(db, domain.id, page_count=1)
 
         publish_method(dumps({
             'type': 'new-page',
@@ -232,6 +276,68 @@ class Page(Base):
 
         return page_uuid
 
+    @classmethod
+    def add_pages(cls, db, domain, pages, publish_method=None):
+        '''Adds the (url, score) pairs not known yet as pages of `domain`,
+        with one query for the known ones and one bulk insert. A single
+        new-page event is published for the whole batch.
+
+        Returns the number of pages added.'''
+        by_hash = {}
+
+        for url, score in pages:
+            if isinstance(url, unicode):
+                url = url.encode('utf-8')
+
+            by_hash.setdefault(hashlib.sha512(url).hexdigest(), (url, score))
+
+        if not by_hash:
+            return 0
+
+        known = db.query(Page.url_hash).filter(Page.url_hash.in_(by_hash.keys())).all()
+
+        for url_hash, in known:
+            del by_hash[url_hash]
+
+        if not by_hash:
+            return 0
+
+        now = datetime.utcnow()
+
+        query_params = [
+            {
+                'url': url,
+                'url_hash': url_hash,
+                'uuid': uuid4(),
+                'domain_id': domain.id,
+                'created_date': now,
+                'score': score
+            }
+            for url_hash, (url, score) in by_hash.items()
+        ]
+
+        # pages added meanwhile by someone else are kept as they are, and
+        # only the rows actually inserted are counted
+        result = db.execute(
+            'INSERT IGNORE INTO pages (url, url_hash, uuid, domain_id, created_date, score) '
+            'VALUES (:url, :url_hash, :uuid, :domain_id, :created_date, :score)',
+            query_params
+        )
+
+        added = max(result.rowcount, 0)
+
+        if added > 0:
+            from holmes.models import DomainStats  # to avoid circular dependency
+            DomainStats.increment(db, domain.id, page_count=added)
+
+            if publish_method is not None:
+                publish_method(dumps({
+                    'type': 'new-page',
+                    'pageUrl': str(query_params[0]['url'])
+                }))
+
+        return added
+
     @classmethod
     def add_domain(cls, url, db, publish_method, config, girl,
         default_violations_values, violation_definitions, cache):
@@ -9,6 +9,7 @@ from datetime import date, timedelta, datetime
 from ujson import dumps
 
 from holmes.utils import get_status_code_title
+from holmes.stats import RequestStats
 from holmes.models import Base
 
 
@@ -130,23 +131,72 @@ class Request(Base):
         return per_domains
 
     @classmethod
-    def delete_old_requests(self, db, config, limit=1000):
+    def get_old_requests_id_range(cls, db, config):
         dt = date.today() - timedelta(days=config.DAYS_TO_KEEP_REQUESTS)
 
-        older_requests = db \
-            .query(Request.id) \
+        # an index-only scan of idx_completed_date, which carries the ids
+        min_id, max_id = db \
+            .query(func.min(Request.id), func.max(Request.id)) \
             .filter(Request.completed_date <= dt) \
-            .limit(limit)
+            .one()
 
-        older_requests_ids = [r for (r, ) in older_requests]
+        if min_id is None:
+            return None, None
 
-        if not older_requests_ids:
-            return None
+        return min_id, max_id + 1
 
-        return db \
+    @classmethod
+    def delete_old_requests(cls, db, config, min_id, max_id):
+        '''Deletes the old requests with ids in [min_id, max_id), taking them
+        off the request counters of their domains, so domain_stats keeps
+        matching the requests table.'''
+        dt = date.today() - timedelta(days=config.DAYS_TO_KEEP_REQUESTS)
+
+        old_requests = db \
             .query(Request) \
-            .filter(Request.id.in_(older_requests_ids)) \
-            .delete(synchronize_session=False)
+            .filter(Request.id >= min_id) \
+            .filter(Request.id < max_id) \
+            .filter(Request.completed_date <= dt)
+
+        cls.discount_requests(db, old_requests)
+
+        return old_requests.delete(synchronize_session=False)
+
+    @classmethod
+    def discount_requests(cls, db, requests):
+        from holmes.models import Domain, DomainStats  # to avoid circular dependency
+
+        is_good = Request.status_code < 400
+
+        stats = requests \
+            .with_entities(
+                Request.domain_name,
+                func.sum(sa.case([(is_good, 1)], else_=0)),
+                func.sum(sa.case([(is_good, 0)], else_=1)),
+                func.sum(sa.case([(is_good, Request.response_time)], else_=0))
+            ) \
+            .group_by(Request.domain_name) \
+            .all()
+
+        if not stats:
+            return
+
+        domain_ids = dict(
+            db.query(Domain.name, Domain.id)
+            .filter(Domain.name.in_([domain_name for domain_name, good, bad, response_time_sum in stats]))
+            .all()
+        )
+
+        for domain_name, good, bad, response_time_sum in stats:
+            if domain_name not in domain_ids:
+                continue
+
+            DomainStats.increment(
+                db, domain_ids[domain_name],
+                good_request_count=-int(good or 0),
+                bad_request_count=-int(bad or 0),
+                response_time_sum=-float(response_time_sum or 0)
+            )
 
     @classmethod
     def get_all_status_code(self, db):
@@ -165,7 +215,7 @@ class Request(Base):
         return result
 
     @classmethod
-    def save_requests(cls, db, publish, page, requests):
+    def save_requests(cls, db, publish, page, requests, cache=None):
         if not requests:
             return
 
@@ -173,11 +223,15 @@ class Request(Base):
         page_url = page.url
 
         data = []
+        stats = RequestStats()
+
         for url, response in requests:
             request_time = response.request_time
             effective_url = response.effective_url
             status_code = response.status_code
 
+            stats.add(status_code, request_time)
+
             data.append({
                 'domain_name': domain_name,
                 'url': url,
@@ -190,6 +244,18 @@ class Request(Base):
 
         db.execute(Request.__table__.insert(), data)
 
+        from holmes.models import DomainStats  # to avoid circular dependency
+
+        DomainStats.increment(
+            db, page.domain.id,
+            good_request_count=stats.count - stats.error_count,
+            bad_request_count=stats.error_count,
+            response_time_sum=stats.response_time_sum
+        )
+
+        if cache is not None:
+            cache.add_request_stats(domain_name, stats)
+
         url = url.encode('utf-8')
 
         publish(dumps({
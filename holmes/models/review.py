@@ -3,10 +3,11 @@
 
 from uuid import uuid4
 from datetime import datetime
+from collections import defaultdict
 
 from ujson import dumps
 import sqlalchemy as sa
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, joinedload, subqueryload, object_session
 
 from holmes.models import Base
 
@@ -25,6 +26,8 @@ class Review(Base):
 
     failure_message = sa.Column('failure_message', sa.String(2000), nullable=True)
 
+    content_hash = sa.Column('content_hash', sa.String(128), nullable=True)
+
     domain_id = sa.Column('domain_id', sa.Integer, sa.ForeignKey('domains.id'))
     page_id = sa.Column('page_id', sa.Integer, sa.ForeignKey('pages.id'))
 
@@ -32,6 +35,8 @@ class Review(Base):
     violations = relationship("Violation", cascade="all,delete")
 
     def to_dict(self, fact_definitions, violation_definitions, _):
+        key_names = self.get_key_names(fact_definitions, violation_definitions)
+
         return {
             'page': self.page and self.page.to_dict() or None,
             'domain': self.domain and self.domain.name or None,
@@ -39,11 +44,38 @@ class Review(Base):
             'uuid': str(self.uuid),
             'createdAt': self.created_date,
             'completedAt': self.completed_date,
-            'facts': [fact.to_dict(fact_definitions, _) for fact in self.facts],
-            'violations': [violation.to_dict(violation_definitions, _)
+            'facts': [fact.to_dict(fact_definitions, _, key_names.get(fact.key_id))
+                      for fact in self.facts],
+            'violations': [violation.to_dict(violation_definitions, _, key_names.get(violation.key_id))
                            for violation in self.violations]
         }
 
+    def get_key_names(self, fact_definitions, violation_definitions):
+        '''Maps the key ids of facts and violations to their names.
+
+        Names come from the definitions, only keys unknown to them are
+        loaded, all in a single query.
+        '''
+        key_names = {}
+
+        for definitions in (fact_definitions, violation_definitions):
+            for name, definition in definitions.items():
+                if 'key_id' in definition:
+                    key_names[definition['key_id']] = name
+
+        missing = set(
+            item.key_id for item in list(self.facts) + list(self.violations)
+            if item.key_id is not None and item.key_id not in key_names
+        )
+
+        db = object_session(self)
+
+        if missing and db is not None:
+            from holmes.models.keys import Key  # to avoid circular dependency
+            key_names.update(db.query(Key.id, Key.name).filter(Key.id.in_(missing)))
+
+        return key_names
+
     def __str__(self):
         return str(self.uuid)
 
@@ -89,6 +121,8 @@ class Review(Base):
             if domain:
                 query = query.filter(Review.domain_id == domain.id)
 
+        query = cls.with_page(query)
+
         return query.order_by(Review.completed_date.desc())[:limit]
 
     @classmethod
@@ -125,8 +159,43 @@ class Review(Base):
         return points
 
     @classmethod
-    def by_uuid(cls, uuid, db):
-        return db.query(Review).filter(Review.uuid == uuid).first()
+    def by_uuid(cls, uuid, db, load_details=False, load_page=False):
+        query = db.query(Review).filter(Review.uuid == uuid)
+
+        if load_details:
+            query = cls.with_details(query)
+        elif load_page:
+            query = cls.with_page(query)
+
+        return query.first()
+
+    @classmethod
+    def with_page(cls, query):
+        '''Eager loads the page alone, all that is needed to serve a review
+        already rendered.'''
+        return query.options(joinedload('page'))
+
+    @classmethod
+    def with_details(cls, query):
+        '''Eager loads what to_dict needs: page and domain are joined,
+        facts and violations come in one query each.'''
+        return query.options(
+            joinedload('page'),
+            joinedload('domain'),
+            subqueryload('facts'),
+            subqueryload('violations')
+        )
+
+    @classmethod
+    def load_details(cls, db, reviews):
+        '''Eager loads what to_dict needs for reviews loaded without it,
+        in a fixed number of queries however many reviews there are.'''
+        if not reviews:
+            return
+
+        cls.with_details(
+            db.query(Review).filter(Review.id.in_([review.id for review in reviews]))
+        ).all()
 
     @property
     def violation_count(self):
@@ -201,7 +270,7 @@ class Review(Base):
             return
 
         if review_data['requests']:
-            Request.save_requests(db, publish, page, review_data['requests'])
+            Request.save_requests(db, publish, page, review_data['requests'], cache)
 
         last_review = page.last_review
 
@@ -212,27 +281,20 @@ class Review(Base):
             is_complete=False,
             completed_date=datetime.utcnow(),
             uuid=uuid4(),
+            content_hash=review_data.get('contentHash', None),
         )
 
         db.add(review)
+        db.flush()
 
-        for fact in review_data['facts']:
-            name = fact['key']
-            key = fact_definitions[name]['key']
-            review.add_fact(key, fact['value'])
-
-        for violation in review_data['violations']:
-            name = violation['key']
-            key = violation_definitions[name]['key']
-            review.add_violation(
-                key,
-                violation['value'],
-                violation['points'],
-                page.domain
-            )
+        Review.insert_facts(db, review, review_data['facts'], fact_definitions)
+        Review.insert_violations(
+            db, review, page.domain, review_data['violations'], violation_definitions
+        )
 
         page.expires = review_data['expires']
         page.last_modified = review_data['lastModified']
+        page.etag = review_data.get('etag', None)
         page.last_review_uuid = review.uuid
         page.last_review = review
         page.last_review_date = review.completed_date
@@ -240,15 +302,33 @@ class Review(Base):
 
         review.is_complete = True
 
+        from holmes.models import DomainStats  # to avoid circular dependency
+
         if not last_review:
             cache.increment_active_review_count(page.domain)
+
+            DomainStats.increment(
+                db, page.domain.id,
+                review_count=1,
+                violation_count=len(review_data['violations'])
+            )
         else:
-            for violation in last_review.violations:
-                violation.review_is_active = False
+            from holmes.models import Violation  # to avoid circular dependency
+
+            deactivated = db \
+                .query(Violation) \
+                .filter(Violation.review_id == last_review.id) \
+                .update(
+                    {'review_is_active': False},
+                    synchronize_session=False
+                )
 
             last_review.is_active = False
 
-        Review.delete_old_reviews(db, config, page)
+            DomainStats.increment(
+                db, page.domain.id,
+                violation_count=len(review_data['violations']) - deactivated
+            )
 
         search_provider.index_review(review)
 
@@ -258,16 +338,132 @@ class Review(Base):
         }))
 
     @classmethod
-    def delete_old_reviews(cls, db, config, page):
+    def insert_facts(cls, db, review, facts, fact_definitions):
+        from holmes.models import Fact  # to avoid circular dependency
+
+        data = []
+        for fact in facts:
+            key = fact_definitions[fact['key']]['key']
+
+            data.append({
+                'review_id': review.id,
+                'key_id': key.id,
+                'value': fact['value']
+            })
+
+        if data:
+            db.execute(Fact.__table__.insert(), data)
+
+        db.expire(review, ['facts'])
+
+    @classmethod
+    def insert_violations(cls, db, review, domain, violations, violation_definitions):
+        from holmes.models import Violation  # to avoid circular dependency
+
+        data = []
+        for violation in violations:
+            key = violation_definitions[violation['key']]['key']
+
+            data.append({
+                'review_id': review.id,
+                'key_id': key.id,
+                'value': violation['value'],
+                'points': int(float(violation['points'])),
+                'domain_id': domain.id,
+                'review_is_active': True
+            })
+
+        if data:
+            db.execute(Violation.__table__.insert(), data)
+
+        db.expire(review, ['violations'])
+
+    @classmethod
+    def save_unchanged_review(cls, page_uuid, review_data, db, publish, cache=None):
+        from holmes.models import Page, Request
+
+        page = Page.by_uuid(page_uuid, db)
+
+        if page is None or page.last_review is None:
+            return
+
+        if review_data['requests']:
+            Request.save_requests(db, publish, page, review_data['requests'], cache)
+
+        # the content did not change, so the facts and violations of the last
+        # review still hold and only the review date moves forward
+        if review_data['expires'] is not None:
+            page.expires = review_data['expires']
+
+        # 304 responses carry the validators the server would send with the
+        # content, so the next conditional request uses the current ones
+        if review_data.get('etag', None) is not None:
+            page.etag = review_data['etag']
+
+        if review_data.get('lastModified', None) is not None:
+            page.last_modified = review_data['lastModified']
+
+        page.last_review_date = datetime.utcnow()
+
+    @classmethod
+    def delete_old_reviews(cls, db, number_of_reviews_to_keep, min_id, max_id, cache=None):
+        from holmes.models import Fact, Violation  # to avoid circular dependency
+
+        page_ids = db \
+            .query(Review.page_id) \
+            .filter(Review.id >= min_id) \
+            .filter(Review.id < max_id) \
+            .filter(Review.is_active == False) \
+            .distinct() \
+            .all()
+
+        if not page_ids:
+            return 0, 0, 0
+
         reviews = db \
-            .query(Review) \
-            .filter(Review.is_active == 0) \
-            .filter(Review.page_id == page.id) \
-            .order_by(Review.completed_date.desc()) \
+            .query(Review.id, Review.page_id, Review.uuid) \
+            .filter(Review.page_id.in_([page_id for page_id, in page_ids])) \
+            .filter(Review.is_active == False) \
+            .order_by(Review.page_id, Review.completed_date.desc()) \
             .all()
 
-        last_reviews = reviews[config.NUMBER_OF_REVIEWS_TO_KEEP:]
+        kept = defaultdict(int)
+        review_ids = []
+        review_uuids = []
+
+        for review_id, page_id, review_uuid in reviews:
+            if kept[page_id] < number_of_reviews_to_keep:
+                kept[page_id] += 1
+                continue
+
+            # reviews outside of the range are left to their own batch
+            if min_id <= review_id < max_id:
+                review_ids.append(review_id)
+                review_uuids.append(review_uuid)
 
-        if len(last_reviews) > 0:
-            for review in last_reviews:
-                db.delete(review)
+        if not review_ids:
+            return 0, 0, 0
+
+        facts_count = db \
+            .query(Fact) \
+            .filter(Fact.review_id.in_(review_ids)) \
+            .delete(synchronize_session=False)
+
+        violations_count = db \
+            .query(Violation) \
+            .filter(Violation.review_id.in_(review_ids)) \
+            .delete(synchronize_session=False)
+
+        reviews_count = db \
+            .query(Review) \
+            .filter(Review.id.in_(review_ids)) \
+            .delete(synchronize_session=False)
+
+        if cache is not None:
+            cache.delete_reviews_json(review_uuids)
+
+        return reviews_count, facts_count, violations_count
+
+    @classmethod
+    def get_id_range(cls, db):
+        return db.query(sa.func.min(Review.id), sa.func.max(Review.id)).one()
@@ -4,7 +4,7 @@
 import sqlalchemy as sa
 from collections import defaultdict
 
-from holmes.models import Base, JsonTypeGzipped
+from holmes.models import Base, JsonTypeCompressed
 from holmes.models.keys import Key
 
 
@@ -12,7 +12,7 @@ class Violation(Base):
     __tablename__ = "violations"
 
     id = sa.Column(sa.Integer, primary_key=True)
-    value = sa.Column('value', JsonTypeGzipped, nullable=True)
+    value = sa.Column('value', JsonTypeCompressed, nullable=True)
     points = sa.Column('points', sa.Integer, nullable=False)
 
     review_id = sa.Column('review_id', sa.Integer, sa.ForeignKey('reviews.id'))
@@ -29,8 +29,11 @@ class Violation(Base):
     def __repr__(self):
         return str(self)
 
-    def to_dict(self, violation_definitions, _):
-        definition = violation_definitions.get(self.key.name, {})
+    def to_dict(self, violation_definitions, _, key_name=None):
+        if key_name is None:
+            key_name = self.key.name
+
+        definition = violation_definitions.get(key_name, {})
 
         value = definition.get('value_parser', lambda val: val)(self.value)
         description = _(definition.get('description', '%s'))
@@ -42,7 +45,7 @@ class Violation(Base):
                 pass
 
         return {
-            'key': self.key.name,
+            'key': key_name,
             'title': _(definition.get('title', _('undefined'))),
             'description': description,
             'points': self.points,
@@ -0,0 +1,304 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import re
+import zlib
+import logging
+from cStringIO import StringIO
+
+import lxml.html
+import lxml.etree
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+SITEMAP_NAMESPACE = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+
+LOC_TAGS = ('loc', SITEMAP_NAMESPACE + 'loc')
+PRIORITY_TAGS = ('priority', SITEMAP_NAMESPACE + 'priority')
+SITEMAP_TAGS = ('sitemap', SITEMAP_NAMESPACE + 'sitemap')
+URL_TAGS = ('url', SITEMAP_NAMESPACE + 'url')
+
+GZIP_MAGIC = '\x1f\x8b'
+
+# raised while reading truncated or corrupt gzipped bodies
+READ_ERRORS = (IOError, EOFError, zlib.error)
+
+# priority of the urls that do not tell theirs, as in the sitemap protocol
+DEFAULT_SITEMAP_PRIORITY = 0.5
+
+# urls not encoded kept per sitemap, to be shown along with their count
+MAX_NOT_ENCODED_URLS_SAMPLE = 10
+
+URL_RE = re.compile(
+    r'^(?:http|ftp)s?://'  # http:// or https://
+    r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+(?:[A-Z]{2,6}\.?|[A-Z0-9-]{2,}\.?)|'  # domain...
+    r'localhost|'  # localhost...
+    r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'  # ...or ip
+    r'(?::\d+)?'  # optional port
+    r'(?P<relative>(?:/?|[/?]\S+))$', re.IGNORECASE)
+
+HTML_ENTITIES = re.compile(r'(&amp;|&apos;|&quot;|&gt;|&lt;)')
+INVALID_CHARS = re.compile(r'(&|\'|"|>|<)')
+
+
+def parse_html(text):
+    try:
+        return lxml.html.fromstring(text)
+    except (lxml.etree.XMLSyntaxError, lxml.etree.ParserError):
+        return None
+
+
+def is_url_encoded(relative):
+    try:
+        str(relative).encode('utf-8')
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        return False
+
+    return not INVALID_CHARS.findall(HTML_ENTITIES.sub('', relative))
+
+
+class SitemapReader(object):
+    '''File-like view of a (possibly gzipped) sitemap body that measures
+    the decompressed content while the parser reads it, chunk by chunk.
+
+    Gzipped bodies are inflated as they are read, so a truncated one still
+    yields everything before the point where it was cut.'''
+
+    def __init__(self, text):
+        self.source = StringIO(text)
+
+        if text[:2] == GZIP_MAGIC:
+            self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        else:
+            self.decompressor = None
+
+        self.compressor = zlib.compressobj()
+        self.size = 0
+        self.gzipped_size = 0
+        self.empty = True
+
+    def read(self, size=-1):
+        if self.decompressor is None:
+            data = self.source.read(size)
+        else:
+            data = self.inflate(size)
+
+        self.size += len(data)
+
+        if not data:
+            self.finish()
+        elif self.compressor is not None:
+            self.gzipped_size += len(self.compressor.compress(data))
+
+        if self.empty and data.strip():
+            self.empty = False
+
+        return data
+
+    def inflate(self, size):
+        data = ''
+
+        # headers and empty blocks inflate to nothing, so keep going until
+        # there is some data or the body is over
+        while not data:
+            compressed = self.decompressor.unconsumed_tail or self.source.read(64 * 1024)
+
+            if not compressed:
+                return self.decompressor.flush()
+
+            data = self.decompressor.decompress(compressed, max(size, 0))
+
+        return data
+
+    def drain(self):
+        '''Reads what the parser left behind, so the sizes cover the whole body.'''
+        try:
+            while self.read(64 * 1024):
+                pass
+        except READ_ERRORS:
+            logging.warning('Sitemap body is corrupt, measuring it up to where it could be read.')
+            self.finish()
+
+    def finish(self):
+        if self.compressor is not None:
+            self.gzipped_size += len(self.compressor.flush())
+            self.compressor = None
+
+
+def parse_priority(text):
+    try:
+        priority = float(text)
+    except (TypeError, ValueError):
+        return DEFAULT_SITEMAP_PRIORITY
+
+    return min(max(priority, 0.0), 1.0)
+
+
+def parse_sitemap(text):
+    '''Streams a sitemap, keeping only its counters, the sitemaps it lists,
+    the (url, priority) pairs of the pages to discover and a sample of the
+    urls not encoded. Entries are dropped as soon as they are read, so the
+    tree never grows.
+
+    Returns plain data that can leave the process.'''
+    reader = SitemapReader(text)
+
+    result = {
+        'sitemaps': [],
+        'urls': [],
+        'urls_count': 0,
+        'not_encoded_count': 0,
+        'not_encoded_sample': [],
+    }
+
+    events = lxml.etree.iterparse(reader, events=('end',), encoding='utf-8', recover=True)
+
+    try:
+        for event, element in events:
+            tag = element.tag
+
+            if tag in SITEMAP_TAGS:
+                loc = get_child_text(element, LOC_TAGS)
+                if loc:
+                    result['sitemaps'].append(loc)
+
+            elif tag in URL_TAGS:
+                loc = get_child_text(element, LOC_TAGS)
+                if loc:
+                    add_sitemap_url(result, loc, parse_priority(get_child_text(element, PRIORITY_TAGS)))
+
+            else:
+                continue
+
+            # done with this entry: drop it and the ones read before it
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+    except lxml.etree.XMLSyntaxError:
+        # even recovering parsers give up on documents without a root element
+        pass
+    except READ_ERRORS:
+        # keep what was read before the body broke off
+        logging.warning('Sitemap body is corrupt, keeping the entries read before it broke off.')
+
+    # the parser may stop before the end of the body
+    reader.drain()
+
+    result['size'] = reader.size
+    result['gzipped_size'] = reader.gzipped_size
+    result['empty'] = reader.empty
+
+    return result
+
+
+def get_child_text(element, tags):
+    for child in element:
+        if child.tag in tags:
+            return (child.text or '').strip()
+
+    return None
+
+
+def add_sitemap_url(result, url, priority):
+    result['urls_count'] += 1
+
+    match = URL_RE.match(url)
+
+    if not match:
+        return
+
+    result['urls'].append((url, priority))
+
+    if not is_url_encoded(match.group('relative')):
+        result['not_encoded_count'] += 1
+
+        if len(result['not_encoded_sample']) < MAX_NOT_ENCODED_URLS_SAMPLE:
+            result['not_encoded_sample'].append(url)
+
+
+def safe_parse(parse_func, text):
+    '''Runs `parse_func(text)`, returning None if it fails, so whoever waits
+    for the result is always called back.'''
+    try:
+        return parse_func(text)
+    except Exception:
+        logging.exception('Could not parse document with %s.' % parse_func.__name__)
+        return None
+
+
+class ParseExecutor(object):
+    '''Parses big documents away from the IOLoop, so a worker keeps serving
+    the responses of its other requests meanwhile.
+
+    Functions returning plain data run in a process pool. The ones returning
+    lxml trees (which cannot be pickled) run in a thread pool instead: lxml
+    releases the GIL while parsing, so these do not block the IOLoop either.
+    Documents smaller than `min_size` are parsed right away.
+    '''
+
+    def __init__(self, io_loop, workers, min_size=0):
+        self.io_loop = io_loop
+        self.min_size = min_size
+        self.pending = 0
+        self._waiting = False
+
+        self.processes = ProcessPoolExecutor(workers)
+        self.threads = ThreadPoolExecutor(workers)
+
+    @classmethod
+    def from_config(cls, config, io_loop):
+        if not config.PARSE_EXECUTOR_WORKERS:
+            return None
+
+        return cls(
+            io_loop,
+            workers=config.PARSE_EXECUTOR_WORKERS,
+            min_size=config.PARSE_EXECUTOR_MIN_SIZE_IN_BYTES
+        )
+
+    def submit(self, parse_func, text, callback, in_process=True):
+        if len(text) < self.min_size:
+            callback(safe_parse(parse_func, text))
+            return
+
+        executor = self.processes if in_process else self.threads
+
+        try:
+            future = executor.submit(parse_func, text)
+        except Exception:
+            logging.exception('Could not submit document to %s.' % parse_func.__name__)
+            callback(None)
+            return
+
+        self.pending += 1
+        self.io_loop.add_future(future, self.handle_parsed(parse_func, callback))
+
+    def handle_parsed(self, parse_func, callback):
+        def handle(future):
+            self.pending -= 1
+
+            try:
+                result = future.result()
+            except Exception:
+                # the parser raised, its process died or its result could not be pickled
+                logging.exception('Could not parse document with %s.' % parse_func.__name__)
+                result = None
+
+            try:
+                callback(result)
+            finally:
+                if self._waiting and not self.pending:
+                    self.io_loop.stop()
+
+        return handle
+
+    def wait(self):
+        '''Runs the IOLoop until every submitted document is parsed.'''
+        if not self.pending:
+            return
+
+        self._waiting = True
+        try:
+            self.io_loop.start()
+        finally:
+            self._waiting = False
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys
+from uuid import uuid4
+
+from colorama import Fore, Style
+
+from holmes.cli import BaseCLI
+from holmes.models import Key, Review
+from holmes.reviewer import Reviewer, load_review_data
+from holmes.utils import load_classes
+
+
+class BulkIndexer(object):
+    '''Collects the reviews saved in a batch so they are indexed with a
+    single bulk request after the batch is committed.'''
+
+    def __init__(self):
+        self.pages = []
+
+    def index_review(self, review):
+        self.pages.append(review.page)
+
+
+class ReviewPersister(BaseCLI):
+    def initialize(self):
+        self.uuid = uuid4().hex
+
+        authnz_wrapper_class = self.load_authnz_wrapper()
+        if authnz_wrapper_class:
+            self.authnz_wrapper = authnz_wrapper_class(self.config)
+        else:
+            self.authnz_wrapper = None
+
+        self.error_handlers = [handler(self.config) for handler in self.load_error_handlers()]
+
+        self.connect_sqlalchemy()
+        self.connect_to_redis()
+
+        self.search_provider = self.load_search_provider()(
+            config=self.config,
+            db=self.db,
+            authnz_wrapper=self.authnz_wrapper
+        )
+
+        self.fact_definitions = Reviewer.get_fact_definitions()
+        self.violation_definitions = {}
+
+        for facter in load_classes(default=self.config.FACTERS):
+            self.fact_definitions.update(facter.get_fact_definitions())
+
+        Key.insert_keys(self.db, self.fact_definitions)
+
+        for validator in load_classes(default=self.config.VALIDATORS):
+            self.violation_definitions.update(validator.get_violation_definitions())
+
+        Key.insert_keys(self.db, self.violation_definitions)
+
+    def get_description(self):
+        uuid = str(getattr(self, 'uuid', ''))
+
+        return "%s%sholmes-persister-%s%s" % (
+            Fore.BLUE,
+            Style.BRIGHT,
+            uuid,
+            Style.RESET_ALL,
+        )
+
+    def do_work(self):
+        recovered = self.cache.recover_reviews_to_persist()
+        if recovered:
+            self.warn('Recovered %d reviews claimed by persisters that are gone.' % recovered)
+
+        payloads = self.cache.claim_reviews_to_persist(
+            self.uuid, self.config.REVIEW_PERSISTENCE_BATCH_SIZE, self.config.ZOMBIE_WORKER_TIME
+        )
+
+        if not payloads:
+            return
+
+        self.debug('Saving %d reviews...' % len(payloads))
+
+        indexer = BulkIndexer()
+
+        try:
+            self.save_reviews(payloads, indexer)
+        except Exception:
+            err = sys.exc_info()[1]
+            self.db.rollback()
+            self.warn('Could not save %d reviews in one batch (%s), saving them one by one...' % (len(payloads), err))
+            indexer, payloads = self.save_reviews_one_by_one(payloads)
+        else:
+            self.cache.complete_reviews_to_persist(self.uuid, payloads)
+
+        if indexer.pages:
+            self.search_provider.index_reviews(
+                indexer.pages, len(indexer.pages), len(indexer.pages)
+            )
+
+        self.info('Saved %d reviews.' % len(payloads))
+
+    def save_reviews(self, payloads, indexer):
+        for payload in payloads:
+            data = load_review_data(payload)
+
+            Review.save_review(
+                data['page_uuid'], data, self.db, indexer,
+                self.fact_definitions, self.violation_definitions,
+                self.cache, self.publish, self.config
+            )
+
+        self.db.commit()
+
+    def save_reviews_one_by_one(self, payloads):
+        '''Saves each review in its own transaction, so the ones that keep
+        failing do not hold back the others. Returns the indexer and the
+        reviews that were saved.'''
+        indexer = BulkIndexer()
+        saved = []
+
+        for payload in payloads:
+            review_indexer = BulkIndexer()
+
+            try:
+                self.save_reviews([payload], review_indexer)
+            except Exception:
+                err = sys.exc_info()[1]
+                self.db.rollback()
+
+                if self.cache.fail_review_to_persist(self.uuid, payload, self.config.REVIEW_PERSISTENCE_MAX_ATTEMPTS):
+                    self.error('Moved review to the dead-letter list after %d attempts: %s' % (
+                        self.config.REVIEW_PERSISTENCE_MAX_ATTEMPTS, err
+                    ))
+                else:
+                    self.warn('Could not save review, it goes back to the queue: %s' % err)
+            else:
+                self.cache.complete_reviews_to_persist(self.uuid, [payload])
+                indexer.pages.extend(review_indexer.pages)
+                saved.append(payload)
+
+        return indexer, saved
+
+    def publish(self, data):
+        self.redis_pub_sub.publish('events', data)
+
+
+def main():
+    persister = ReviewPersister(sys.argv[1:])
+    persister.run()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys
+import time
+from uuid import uuid4
+from datetime import datetime
+
+from ujson import dumps
+from colorama import Fore, Style
+
+from holmes.cli import BaseCLI
+from holmes.models import Review, Request
+
+
+class RetentionWorker(BaseCLI):
+    def initialize(self):
+        self.uuid = uuid4().hex
+
+        self.error_handlers = [handler(self.config) for handler in self.load_error_handlers()]
+
+        self.connect_sqlalchemy()
+        self.connect_to_redis()
+
+    def get_description(self):
+        uuid = str(getattr(self, 'uuid', ''))
+
+        return "%s%sholmes-retention-%s%s" % (
+            Fore.BLUE,
+            Style.BRIGHT,
+            uuid,
+            Style.RESET_ALL,
+        )
+
+    def do_work(self):
+        reviews = self.prune_reviews()
+        requests = self.prune_requests()
+
+        self.publish(dumps({
+            'type': 'retention-status',
+            'workerId': str(self.uuid),
+            'dt': datetime.utcnow(),
+            'reviews': reviews['reviews'],
+            'facts': reviews['facts'],
+            'violations': reviews['violations'],
+            'requests': requests['requests'],
+        }))
+
+    def publish(self, data):
+        self.redis_pub_sub.publish('events', data)
+
+    def prune_reviews(self):
+        start_time = time.time()
+        batch_size = self.config.REVIEW_RETENTION_BATCH_SIZE
+
+        min_id, max_id = Review.get_id_range(self.db)
+
+        totals = {'batches': 0, 'reviews': 0, 'facts': 0, 'violations': 0}
+
+        if min_id is None:
+            return totals
+
+        # each run resumes where the last one stopped, starting over once
+        # it gets past the newest review
+        start_id = self.cache.get_review_retention_cursor()
+        if start_id is None or not min_id <= start_id <= max_id:
+            start_id = min_id
+
+        while start_id <= max_id and totals['batches'] < self.config.REVIEW_RETENTION_BATCHES_PER_RUN:
+            reviews, facts, violations = Review.delete_old_reviews(
+                self.db,
+                self.config.NUMBER_OF_REVIEWS_TO_KEEP,
+                start_id,
+                start_id + batch_size,
+                self.cache
+            )
+            self.db.commit()
+
+            start_id += batch_size
+            self.cache.set_review_retention_cursor(start_id if start_id <= max_id else None)
+
+            totals['batches'] += 1
+            totals['reviews'] += reviews
+            totals['facts'] += facts
+            totals['violations'] += violations
+
+        self.info(
+            'Pruned %(reviews)d reviews, %(facts)d facts and %(violations)d '
+            'violations in %(batches)d batches' % totals +
+            ' (%.2fs).' % (time.time() - start_time)
+        )
+
+        return totals
+
+    def prune_requests(self):
+        start_time = time.time()
+        batch_size = self.config.REQUEST_RETENTION_BATCH_SIZE
+
+        min_id, max_id = Request.get_old_requests_id_range(self.db, self.config)
+
+        totals = {'batches': 0, 'requests': 0}
+
+        if min_id is None:
+            return totals
+
+        for start_id in xrange(min_id, max_id, batch_size):
+            totals['requests'] += Request.delete_old_requests(
+                self.db,
+                self.config,
+                start_id,
+                min(start_id + batch_size, max_id)
+            )
+            self.db.commit()
+
+            totals['batches'] += 1
+
+        self.info(
+            'Pruned %(requests)d requests in %(batches)d batches' % totals +
+            ' (%.2fs).' % (time.time() - start_time)
+        )
+
+        return totals
+
+
+def main():
+    worker = RetentionWorker(sys.argv[1:])
+    worker.run()
+
+if __name__ == '__main__':
+    main()
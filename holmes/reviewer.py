@@ -9,9 +9,16 @@ try:
 except ImportError:
     from urlparse import urlparse
 
+import sys
+import time
 import inspect
+import heapq
+import hashlib
+import calendar
+import itertools
 import email.utils as eut
 from datetime import datetime
+from collections import defaultdict
 
 import codecs
 from box.util.rotunicode import RotUnicode
@@ -19,12 +26,18 @@ codecs.register(RotUnicode.search_function)
 
 import lxml.html
 import logging
+from ujson import dumps, loads
 
 from holmes.config import Config
 from holmes.facters import Facter
 from holmes.validators.base import Validator
-from holmes.models import Page
-from holmes.utils import get_domain_from_url
+from holmes.models import Page, Domain
+from holmes.cache import ResourceSummary
+from holmes.document import Document
+from holmes.parsing import parse_html, safe_parse
+from holmes.utils import get_domain_from_url, _
+
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%S'
 
 
 class InvalidReviewError(RuntimeError):
@@ -32,11 +45,13 @@ class InvalidReviewError(RuntimeError):
 
 
 class ReviewDAO(object):
-    def __init__(self, page_uuid, page_url, last_modified=None, expires=None):
+    def __init__(self, page_uuid, page_url, last_modified=None, expires=None, etag=None):
         self.page_uuid = page_uuid
         self.page_url = page_url
         self.last_modified = last_modified
         self.expires = expires
+        self.etag = etag
+        self.content_hash = None
         self.facts = {}
         self.violations = []
         self.data = {}
@@ -64,20 +79,76 @@ class ReviewDAO(object):
             'violations': self.violations,
             'lastModified': self.last_modified,
             'expires': self.expires,
+            'etag': self.etag,
+            'contentHash': self.content_hash,
             'requests': self.requests
         }
 
 
+def to_json_value(value):
+    if isinstance(value, (set, frozenset, list, tuple)):
+        return [to_json_value(item) for item in value]
+
+    if isinstance(value, dict):
+        return dict((key, to_json_value(item)) for key, item in value.items())
+
+    return value
+
+
+def dump_review_data(data):
+    '''Serializes ReviewDAO.to_dict() so it can wait in the persistence queue.'''
+    def dump_date(date):
+        return date and date.strftime(DATE_FORMAT) or None
+
+    return dumps({
+        'page_uuid': str(data['page_uuid']),
+        'page_url': data['page_url'],
+        'facts': to_json_value(data['facts']),
+        'violations': to_json_value(data['violations']),
+        'lastModified': dump_date(data['lastModified']),
+        'expires': dump_date(data['expires']),
+        'etag': data.get('etag', None),
+        'contentHash': data.get('contentHash', None),
+        'requests': [
+            {
+                'url': url,
+                'status_code': response.status_code,
+                'effective_url': response.effective_url,
+                'request_time': response.request_time
+            }
+            for url, response in data['requests']
+        ]
+    })
+
+
+def load_review_data(payload):
+    def load_date(date):
+        return date and datetime.strptime(date, DATE_FORMAT) or None
+
+    data = loads(payload)
+
+    data['lastModified'] = load_date(data['lastModified'])
+    data['expires'] = load_date(data['expires'])
+    data['requests'] = [
+        (request['url'], ResourceSummary(**request))
+        for request in data['requests']
+    ]
+
+    return data
+
+
 class Reviewer(object):
     def __init__(
             self, api_url, page_uuid, page_url, page_score,
             config=None, validators=[], facters=[], search_provider=None, async_get=None,
             wait=None, wait_timeout=None, db=None, cache=None, publish=None,
-            fact_definitions=None, violation_definitions=None, girl=None):
+            fact_definitions=None, violation_definitions=None, girl=None,
+            parse_executor=None):
 
         self.db = db
         self.cache = cache
         self.girl = girl
+        self.parse_executor = parse_executor
         self.publish = publish
 
         self.api_url = api_url
@@ -92,6 +163,15 @@ class Reviewer(object):
 
         self.review_dao = ReviewDAO(self.page_uuid, self.page_url)
 
+        self.started_at = time.time()
+        self.sub_requests = 0
+        self.sub_request_bytes = 0
+        self.skipped_requests = 0
+        self._buffered_requests = None
+        self._queued_requests = []
+        self._queued_order = itertools.count()
+        self.requests_in_flight = 0
+
         assert isinstance(config, Config), 'config argument must be an instance of holmes.config.Config'
         self.config = config
 
@@ -118,6 +198,19 @@ class Reviewer(object):
         self._wait_for_async_requests = wait
         self._wait_timeout = wait_timeout
 
+        self.pipelined = False
+        self.pending_requests = 0
+        self._busy = 0
+        self._continuations = []
+        self._review_callback = None
+        self._error_callback = None
+        self.failed = False
+
+        self._producer = None
+        self._pending_by_producer = defaultdict(int)
+        self._validators_to_run = None
+        self._running_validators = False
+
         self.fact_definitions = fact_definitions
         self.violation_definitions = violation_definitions
 
@@ -134,29 +227,218 @@ class Reviewer(object):
         if key is not None:
             default_value = key.get('default_value')
 
-        domains_prefs = self.cache.get_domain_violations_prefs(self.domain_name)
-
-        if domains_prefs:
-            item = next((item for item in domains_prefs if item['key'] == key_name), None)
-            if item:
-                return item['value']
+        domains_prefs = self.cache.get_local_domain_violations_prefs(self.domain_name)
 
-        return default_value
+        return domains_prefs.get(key_name, default_value)
 
     def ping(self):
         if self.ping_method is not None:
             self.ping_method()
 
+    @classmethod
+    def get_fact_definitions(cls):
+        return {
+            'review.truncated': {
+                'title': _('Truncated review'),
+                'description': lambda value: _('%d requests were skipped because the review ran out of budget') % value,
+                'category': _('HTTP'),
+                'unit': 'number'
+            }
+        }
+
     def _async_get(self, url, handler, method='GET', **kw):
-        if self.async_get_func:
-            self.async_get_func(url, self.handle_async_get(handler), method, **kw)
+        if not self.async_get_func:
+            return
+
+        handler = self.track_producer(handler)
+
+        if self._buffered_requests is not None:
+            self._buffered_requests.append((url, handler, method, kw))
+            return
+
+        self.queue_requests([(url, handler, method, kw)])
+
+    def _dispatch_async_get(self, url, handler, method='GET', **kw):
+        if url != self.page_url:
+            if not self.has_request_budget():
+                self.skip_request(url)
+
+                if hasattr(handler, 'release'):
+                    handler.release()
+                return
+
+            self.sub_requests += 1
+
+            # streamed bodies are counted against the budget as they arrive
+            if kw.get('streaming_callback', None) is not None:
+                kw['streaming_callback'] = self.count_streamed_bytes(kw['streaming_callback'])
+
+        self.requests_in_flight += 1
+        self.async_get_func(
+            url, self.track(self.handle_async_get(handler, 'streaming_callback' in kw)), method, **kw
+        )
+
+    def count_streamed_bytes(self, streaming_callback):
+        def count(chunk):
+            self.sub_request_bytes += len(chunk)
+            streaming_callback(chunk)
+
+        return count
+
+    def buffer_requests(self):
+        self._buffered_requests = []
+
+    def flush_requests(self):
+        requests, self._buffered_requests = self._buffered_requests or [], None
+
+        self.queue_requests(requests)
+
+    def queue_requests(self, requests):
+        '''Queues requests by priority and dispatches up to
+        MAX_REQUESTS_IN_FLIGHT_PER_REVIEW of them. The others go out as
+        responses arrive, so each one is checked against the bytes and time
+        the review has spent by then.'''
+        for request in requests:
+            # the order breaks ties, so requests of the same priority keep it
+            heapq.heappush(
+                self._queued_requests,
+                (self.get_request_priority(request[0]), next(self._queued_order), request)
+            )
+
+        self.dispatch_queued_requests()
+
+    def dispatch_queued_requests(self):
+        max_in_flight = self.config.MAX_REQUESTS_IN_FLIGHT_PER_REVIEW
+
+        while self._queued_requests and (not max_in_flight or self.requests_in_flight < max_in_flight):
+            priority, order, (url, handler, method, kw) = heapq.heappop(self._queued_requests)
+            self._dispatch_async_get(url, handler, method, **kw)
+
+    def get_request_priority(self, url):
+        path = urlparse(url).path.lower()
+
+        # stylesheets and scripts block rendering, so they come first
+        if path.endswith('.css') or path.endswith('.js'):
+            return 0
+
+        domain, domain_url = get_domain_from_url(url)
+
+        if domain == self.domain_name:
+            return 1
+
+        return 2
 
-    def handle_async_get(self, handler):
+    def has_request_budget(self):
+        max_requests = self.config.MAX_REQUESTS_PER_REVIEW
+        if max_requests and self.sub_requests >= max_requests:
+            return False
+
+        max_bytes = self.config.MAX_BYTES_PER_REVIEW
+        if max_bytes and self.sub_request_bytes >= max_bytes:
+            return False
+
+        max_duration = self.config.MAX_REVIEW_DURATION_IN_SECONDS
+        if max_duration and time.time() - self.started_at >= max_duration:
+            return False
+
+        return True
+
+    def skip_request(self, url):
+        if not self.skipped_requests:
+            logging.warning('Review of %s ran out of budget, skipping further requests.' % self.page_url)
+
+        self.skipped_requests += 1
+        self.add_fact('review.truncated', self.skipped_requests)
+
+    def _tracked_async_get(self, url, handler, method='GET', **kw):
+        self.async_get_func(url, self.track(handler), method, **kw)
+
+    def track(self, handler):
+        self.pending_requests += 1
+
+        def handle(*args, **kw):
+            self.pending_requests -= 1
+
+            # a failed review drops the responses it was still waiting for
+            if self.failed:
+                return
+
+            self.run_step(handler, *args, **kw)
+            self.resume()
+
+        return handle
+
+    def run_step(self, step, *args, **kw):
+        '''Runs a step of the review. Octopus only logs what its callbacks
+        raise, so pipelined reviews hand their failures to the error
+        callback instead.'''
+        self._busy += 1
+        try:
+            step(*args, **kw)
+        except Exception:
+            if not self.pipelined:
+                raise
+            self.fail(sys.exc_info())
+        finally:
+            self._busy -= 1
+
+    def fail(self, exc_info):
+        self.failed = True
+        self._continuations = []
+        self._review_callback = None
+
+        if self._error_callback is not None:
+            callback, self._error_callback = self._error_callback, None
+            callback(self, exc_info)
+
+    def track_producer(self, handler):
+        '''Counts the requests a facter still waits for (including the ones
+        made by its handlers), so validators that depend only on facters
+        that are done can run before the other requests finish.'''
+        producer = self._producer
+
+        if producer is None:
+            return handler
+
+        self._pending_by_producer[producer] += 1
+
+        def release():
+            self._pending_by_producer[producer] -= 1
+            self.run_ready_validators()
+
+        def handle(*args, **kw):
+            previous, self._producer = self._producer, producer
+            try:
+                handler(*args, **kw)
+            finally:
+                self._producer = previous
+
+            release()
+
+        # skipped requests never call back, but are done all the same
+        handle.release = release
+
+        return handle
+
+    def handle_async_get(self, handler, streamed=False):
         def handle(url, response):
             if not hasattr(response, 'from_cache') or not response.from_cache:
                 response.from_cache = False
                 self.review_dao.requests.append((url, response))
 
+            if url != self.page_url:
+                if response.text:
+                    self.sub_request_bytes += len(response.text)
+                elif not streamed:
+                    # HEAD responses only tell the size of the body, streamed
+                    # ones were counted as their chunks arrived
+                    self.sub_request_bytes += ResourceSummary.get_content_length(response)
+
+            # refills the requests in flight, or skips the queued ones once
+            # this response used up the budget
+            self.requests_in_flight -= 1
+            self.dispatch_queued_requests()
+
             handler(url, response)
 
         return handle
@@ -165,25 +447,61 @@ class Reviewer(object):
         self.load_content(self.content_loaded)
         self.wait_for_async_requests()
 
-    def load_content(self, callback):
-        self._async_get(self.page_url, callback)
+    def start_review(self, callback, error_callback=None):
+        '''Starts the review without blocking on the Octopus IOLoop.
 
-    def content_loaded(self, url, response):
-        if response.status_code > 499 or response.text is None:
-            if response.text:
-                headers = None
-            else:
-                headers = response.headers
+        The review moves on to its next phase as soon as its own requests
+        are done and calls `callback` with this reviewer when it finishes,
+        so several reviews can share the same Octopus instance. If a phase
+        raises, the review stops and `error_callback` is called with this
+        reviewer and the exception info instead.
+        '''
+        self.pipelined = True
+        self._review_callback = callback
+        self._error_callback = error_callback
 
-            msg = "Could not load '%s' (%s)" % (url, response.status_code)
-            logging.debug(msg)
-            if headers is not None:
-                logging.warning('Response is from cache: %s' % response.from_cache)
-                logging.warning('Headers for "%s": %s' % (url, headers))
+        self.run_step(self.load_content, self.content_loaded)
+        self.resume()
+
+    def resume(self):
+        if not self.pipelined or self._busy or self.failed:
             return
 
-        logging.debug('Content for url %s loaded.' % url)
+        while self.pending_requests == 0 and self._continuations and not self.failed:
+            self.run_step(self._continuations.pop(0))
+
+        if self.pending_requests == 0 and self._review_callback is not None:
+            callback, self._review_callback = self._review_callback, None
+            callback(self)
 
+    def load_content(self, callback):
+        self._async_get(self.page_url, callback, **self.get_conditional_request_params())
+
+    def get_conditional_request_params(self):
+        if self.db is None or not self.config.USE_CONDITIONAL_REQUESTS:
+            return {}
+
+        page = Page.by_uuid(self.page_uuid, self.db)
+
+        # without a previous review there is nothing to keep if the page did not change
+        if page is None or page.last_review_id is None:
+            return {}
+
+        headers = {}
+
+        if page.last_modified is not None:
+            timestamp = calendar.timegm(page.last_modified.timetuple())
+            headers['If-Modified-Since'] = eut.formatdate(timestamp, usegmt=True)
+
+        if page.etag:
+            headers['If-None-Match'] = page.etag
+
+        if not headers:
+            return {}
+
+        return {'headers': headers}
+
+    def parse_response_headers(self, response):
         last_modified = None
 
         modified = response.headers.get('Last-Modified', None)
@@ -204,20 +522,104 @@ class Reviewer(object):
 
         self.review_dao.expires = expires
 
+        self.review_dao.etag = response.headers.get('Etag', None)
+
+    def content_loaded(self, url, response):
+        if response.status_code == 304:
+            logging.debug('Content for url %s was not modified since the last review.' % url)
+            self.parse_response_headers(response)
+            self.save_unchanged_review()
+            return
+
+        if response.status_code > 499 or response.text is None:
+            if response.text:
+                headers = None
+            else:
+                headers = response.headers
+
+            msg = "Could not load '%s' (%s)" % (url, response.status_code)
+            logging.debug(msg)
+            if headers is not None:
+                logging.warning('Response is from cache: %s' % response.from_cache)
+                logging.warning('Headers for "%s": %s' % (url, headers))
+            return
+
+        logging.debug('Content for url %s loaded.' % url)
+
+        self.parse_response_headers(response)
+
+        self.review_dao.content_hash = self.get_content_hash(response.text)
+
+        if self.is_content_unchanged():
+            logging.debug('Content for url %s is identical to the last review.' % url)
+            self.save_unchanged_review()
+            return
+
         self._current = response
 
-        try:
-            self._current.html = lxml.html.fromstring(response.text)
-        except (lxml.etree.XMLSyntaxError, lxml.etree.ParserError):
-            self._current.html = None
+        # lxml trees cannot leave the process, so pages parse in a thread
+        self.parse(parse_html, response.text, self.html_parsed, in_process=False)
+
+    def html_parsed(self, html):
+        self._current.html = html
+        self._current.document = Document(self._current.html)
 
         self.run_facters()
-        self.wait_for_async_requests()
+        self.wait_for_async_requests(self.facts_loaded)
 
-        self.run_validators()
-        self.wait_for_async_requests()
+    def parse(self, parse_func, text, callback, in_process=True):
+        '''Calls back with `parse_func(text)`, computed by the parse executor
+        when there is one, or with None if parsing fails. The review waits for
+        it just like for a request.'''
+        callback = self.track(self.track_producer(callback))
+
+        if self.parse_executor is None:
+            callback(safe_parse(parse_func, text))
+            return
+
+        self.parse_executor.submit(parse_func, text, callback, in_process)
 
-        self.save_review()
+    def get_resource_summary(self, url):
+        if self.cache is None:
+            return None
+
+        return self.cache.get_resource_summary(url)
+
+    def summarize_resource(self, url, response, counter=None):
+        if isinstance(response, ResourceSummary):
+            return response
+
+        summary = ResourceSummary.from_response(url, response, counter)
+
+        if self.cache is not None:
+            self.cache.set_resource_summary(
+                url, summary, self.config.RESOURCE_SUMMARY_EXPIRATION_IN_SECONDS
+            )
+
+        return summary
+
+    def get_content_hash(self, text):
+        if isinstance(text, unicode):
+            text = text.encode('utf-8')
+
+        return hashlib.sha512(text).hexdigest()
+
+    def is_content_unchanged(self):
+        if self.db is None:
+            return False
+
+        page = Page.by_uuid(self.page_uuid, self.db)
+
+        if page is None or page.last_review is None:
+            return False
+
+        last_hash = page.last_review.content_hash
+
+        return last_hash is not None and last_hash == self.review_dao.content_hash
+
+    def facts_loaded(self):
+        self.run_validators()
+        self.wait_for_async_requests(self.save_review)
 
     @property
     def current(self):
@@ -230,19 +632,97 @@ class Reviewer(object):
         else:
             return self.current.html
 
+    @property
+    def current_document(self):
+        document = getattr(self.current, 'document', None)
+
+        if document is None:
+            document = Document(getattr(self.current, 'html', None))
+
+        return document
+
     def run_facters(self):
+        self.buffer_requests()
+
+        try:
+            for facter in self.facters:
+                self.ping()
+                logging.debug('---------- Started running facter %s ---------' % facter.__name__)
+                facter_instance = facter(self)
+
+                self._producer = facter
+                try:
+                    facter_instance.get_facts()
+                finally:
+                    self._producer = None
+        finally:
+            self.flush_requests()
+
+        self._validators_to_run = list(self.validators)
+        self.run_ready_validators()
+
+    def is_validator_ready(self, validator):
+        if validator.consumes is None:
+            return False
+
+        consumes = set(validator.consumes)
+
         for facter in self.facters:
-            self.ping()
-            logging.debug('---------- Started running facter %s ---------' % facter.__name__)
-            facter_instance = facter(self)
-            facter_instance.get_facts()
+            if facter.produces is not None and not consumes.intersection(facter.produces):
+                continue
+
+            if self._pending_by_producer[facter] > 0:
+                return False
+
+        return True
+
+    def run_ready_validators(self):
+        '''Runs the validators whose facts are complete, while the requests
+        of other facters are still in flight.'''
+        if self._validators_to_run is None or self._running_validators:
+            return
+
+        self._running_validators = True
+        try:
+            ready = [item for item in self._validators_to_run if self.is_validator_ready(item)]
+
+            while ready:
+                for validator in ready:
+                    self._validators_to_run.remove(validator)
+
+                    is_buffering = self._buffered_requests is not None
+                    if not is_buffering:
+                        self.buffer_requests()
+
+                    try:
+                        self.run_validator(validator)
+                    finally:
+                        if not is_buffering:
+                            self.flush_requests()
+
+                ready = [item for item in self._validators_to_run if self.is_validator_ready(item)]
+        finally:
+            self._running_validators = False
 
     def run_validators(self):
-        for validator in self.validators:
-            self.ping()
-            logging.debug('---------- Started running validator %s ---------' % validator.__name__)
-            validator_instance = validator(self)
-            validator_instance.validate()
+        if self._validators_to_run is None:
+            validators = list(self.validators)
+        else:
+            validators, self._validators_to_run = self._validators_to_run, []
+
+        self.buffer_requests()
+
+        try:
+            for validator in validators:
+                self.run_validator(validator)
+        finally:
+            self.flush_requests()
+
+    def run_validator(self, validator):
+        self.ping()
+        logging.debug('---------- Started running validator %s ---------' % validator.__name__)
+        validator_instance = validator(self)
+        validator_instance.validate()
 
     def get_url(self, url):
         return join(self.api_url.rstrip('/'), url.lstrip('/'))
@@ -251,13 +731,17 @@ class Reviewer(object):
         if not urls:
             return
 
+        fetch_method = self.async_get_func
+        if self.pipelined:
+            fetch_method = self._tracked_async_get
+
         for url, score in urls:
             Page.add_page(
                 self.db,
                 self.cache,
                 url,
                 score,
-                self.async_get_func,
+                fetch_method,
                 self.publish,
                 self.config,
                 self.girl,
@@ -267,6 +751,31 @@ class Reviewer(object):
 
         self.wait_for_async_requests()
 
+    def discover_pages(self, pages):
+        '''Adds the (url, score) pairs listed in the sitemaps of the domain
+        straight to its pages, in batches, instead of enqueuing them one by
+        one. Urls of other domains are left for the link crawlers.'''
+        if self.db is None or not pages:
+            return
+
+        domain = Domain.get_domain_by_name(self.domain_name, self.db)
+
+        if domain is None:
+            return
+
+        pages = [
+            (url, score) for url, score in pages
+            if get_domain_from_url(url)[0] == self.domain_name
+        ]
+
+        batch_size = self.config.SITEMAP_DISCOVERY_BATCH_SIZE
+        added = 0
+
+        for start in xrange(0, len(pages), batch_size):
+            added += Page.add_pages(self.db, domain, pages[start:start + batch_size], self.publish)
+
+        logging.debug('Discovered %d new pages of %s in its sitemaps.' % (added, self.domain_name))
+
     def handle_page_added(self, (url, result, page)):
         if not result:
             error_message = "Could not enqueue page '" + url + "'! Error: %s"
@@ -285,15 +794,36 @@ class Reviewer(object):
 
         data = self.review_dao.to_dict()
 
+        if self.config.USE_REVIEW_PERSISTENCE_QUEUE and self.cache is not None:
+            self.cache.push_review_to_persist(dump_review_data(data))
+            return
+
         Review.save_review(
             self.page_uuid, data, self.db, self.search_provider,
             self.fact_definitions, self.violation_definitions,
             self.cache, self.publish, self.config
         )
 
-    def wait_for_async_requests(self):
+    def save_unchanged_review(self):
+        from holmes.models import Review
+
+        Review.save_unchanged_review(
+            self.page_uuid, self.review_dao.to_dict(), self.db, self.publish,
+            self.cache
+        )
+
+    def wait_for_async_requests(self, callback=None):
+        if self.pipelined:
+            if callback is not None:
+                self._continuations.append(callback)
+            self.resume()
+            return
+
         self._wait_for_async_requests(self._wait_timeout)
 
+        if callback is not None:
+            callback()
+
     def is_root(self):
         result = urlparse(self.page_url)
         return '{0}://{1}'.format(result.scheme, result.netloc) == self.page_url.rstrip('/')
@@ -11,6 +11,9 @@ class SearchProvider(object):
     def index_review(self, review):
         raise NotImplementedError()
 
+    def index_reviews(self, reviewed_pages, reviews_count, batch_size):
+        raise NotImplementedError()
+
     @return_future
     def get_by_violation_key_name(self, key_id, current_page=1, page_size=10, domain=None, page_filter=None, callback=None):
         raise NotImplementedError()
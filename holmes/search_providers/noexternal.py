@@ -14,6 +14,9 @@ class NoExternalSearchProvider(SearchProvider):
     def index_review(self, review):
         pass
 
+    def index_reviews(self, reviewed_pages, reviews_count, batch_size):
+        pass
+
     @return_future
     def get_by_violation_key_name(self, key_id, current_page=1, page_size=10, domain=None, page_filter=None, callback=None):
         reviews = Review.get_by_violation_key_name(
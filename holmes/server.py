@@ -42,8 +42,10 @@ from holmes.handlers.users import UserLocaleHandler
 from holmes.handlers.bus import EventBusHandler
 from holmes.event_bus import EventBus
 from holmes.utils import load_classes, load_languages, locale_path
-from holmes.models import Key, DomainsViolationsPrefs
+from holmes.models import Key, DomainsViolationsPrefs, JsonTypeCompressed
 from holmes.cache import Cache
+from holmes.codec import ColumnCodec
+from holmes.reviewer import Reviewer
 from holmes import __version__
 from holmes.handlers import BaseHandler
 
@@ -134,6 +136,8 @@ class HolmesApiServer(Server):
         else:
             self.application.db = self.application.get_sqlalchemy_session()
 
+        JsonTypeCompressed.set_codec(ColumnCodec.from_config(self.application.config))
+
         if self.debug:
             from sqltap import sqltap
             self.sqltap = sqltap.start()
@@ -155,7 +159,7 @@ class HolmesApiServer(Server):
             io_loop=io_loop
         )
 
-        self.application.fact_definitions = {}
+        self.application.fact_definitions = Reviewer.get_fact_definitions()
         self.application.violation_definitions = {}
 
         self.application.default_violations_values = {}
@@ -0,0 +1,145 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import math
+from collections import defaultdict
+
+
+class LatencySketch(object):
+    '''Histogram of response times with logarithmic bins.
+
+    Each bin spans values within `relative_accuracy` of its midpoint, so any
+    percentile is off by at most that fraction. Sketches merge by adding
+    their bin counts, which is what makes them fit redis hashes.
+    '''
+
+    def __init__(self, relative_accuracy=0.05, bins=None):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.bins = defaultdict(int)
+
+        if bins:
+            for index, count in bins.items():
+                self.bins[int(index)] += int(count)
+
+    @property
+    def count(self):
+        return sum(self.bins.values())
+
+    def get_bin(self, value):
+        # response times are in seconds, bins are kept in milliseconds so
+        # that anything under a millisecond falls in bin 0
+        milliseconds = value * 1000.0
+
+        if milliseconds <= 1:
+            return 0
+
+        return int(math.ceil(math.log(milliseconds) / self.log_gamma))
+
+    def get_value(self, index):
+        if index <= 0:
+            return 0.0
+
+        return 2 * self.gamma ** index / (self.gamma + 1) / 1000.0
+
+    def add(self, value, count=1):
+        self.bins[self.get_bin(value)] += count
+
+    def merge(self, other):
+        for index, count in other.bins.items():
+            self.bins[index] += count
+
+    def percentile(self, percentile):
+        total = self.count
+
+        if not total:
+            return None
+
+        rank = percentile / 100.0 * (total - 1)
+        seen = 0
+
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                return round(self.get_value(index), 3)
+
+        return round(self.get_value(max(self.bins)), 3)
+
+
+class RequestStats(object):
+    '''Request count, error count, response times and latency sketch for a
+    domain in a time window. Successful requests (below 400) feed the
+    response times, just like the averages computed from the requests table.
+    '''
+
+    def __init__(self, count=0, error_count=0, response_time_sum=0.0, sketch=None):
+        self.count = count
+        self.error_count = error_count
+        self.response_time_sum = response_time_sum
+        self.sketch = sketch or LatencySketch()
+
+    def add(self, status_code, response_time):
+        self.count += 1
+
+        if int(status_code) > 399:
+            self.error_count += 1
+            return
+
+        self.response_time_sum += response_time or 0.0
+        self.sketch.add(response_time or 0.0)
+
+    def merge(self, other):
+        self.count += other.count
+        self.error_count += other.error_count
+        self.response_time_sum += other.response_time_sum
+        self.sketch.merge(other.sketch)
+
+    def to_fields(self):
+        fields = {
+            'count': self.count,
+            'error_count': self.error_count,
+            'response_time_sum': self.response_time_sum,
+        }
+
+        for index, count in self.sketch.bins.items():
+            fields['bin:%d' % index] = count
+
+        return fields
+
+    @classmethod
+    def from_fields(cls, fields):
+        bins = {}
+        for name, value in fields.items():
+            if name.startswith('bin:'):
+                bins[name[4:]] = value
+
+        return cls(
+            count=int(fields.get('count', 0)),
+            error_count=int(fields.get('error_count', 0)),
+            response_time_sum=float(fields.get('response_time_sum', 0.0)),
+            sketch=LatencySketch(bins=bins)
+        )
+
+    def to_dict(self):
+        success_count = self.count - self.error_count
+
+        if self.count > 0:
+            error_percentage = round(float(self.error_count) / self.count * 100, 2)
+        else:
+            error_percentage = 0
+
+        if success_count > 0:
+            response_time_avg = round(self.response_time_sum / success_count, 3)
+        else:
+            response_time_avg = 0
+
+        return {
+            'requestCount': self.count,
+            'errorCount': self.error_count,
+            'errorPercentage': error_percentage,
+            'averageResponseTime': response_time_avg,
+            'responseTimeP50': self.sketch.percentile(50),
+            'responseTimeP95': self.sketch.percentile(95),
+            'responseTimeP99': self.sketch.percentile(99),
+        }
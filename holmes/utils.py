@@ -30,6 +30,12 @@ def load_languages():
         )
 
 
+def get_language(language="en_US"):
+    global languages
+
+    return language in languages and language or "en_US"
+
+
 def install_i18n(language="en_US"):
     global languages
 
@@ -6,6 +6,10 @@ from holmes.facters import Baser
 
 class Validator(Baser):
 
+    # review.data keys this validator reads; it runs as soon as the facters
+    # producing them are done. None means it runs after every facter.
+    consumes = None
+
     def __init__(self, reviewer):
         self.reviewer = reviewer
         self.url_buffer = set()
@@ -6,6 +6,8 @@ from holmes.utils import _
 
 
 class BodyValidator(Validator):
+    consumes = ('page.body',)
+
     @classmethod
     def get_violation_definitions(cls):
         return {
@@ -6,6 +6,8 @@ from holmes.utils import _
 
 
 class CSSRequestsValidator(Validator):
+    consumes = ('page.css', 'total.requests.css', 'total.size.css.gzipped')
+
     @classmethod
     def get_violation_definitions(cls):
         return {
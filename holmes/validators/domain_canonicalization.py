@@ -8,6 +8,8 @@ from holmes.utils import _
 
 class DomainCanonicalizationValidator(Validator):
 
+    consumes = ()
+
     @classmethod
     def get_no_301_parsed_value(cls, value):
         return {
@@ -7,6 +7,8 @@ from holmes.utils import _
 
 class GoogleAnalyticsValidator(Validator):
 
+    consumes = ('page.google_analytics',)
+
     @classmethod
     def get_violation_definitions(cls):
         return {
@@ -7,6 +7,8 @@ from holmes.utils import _
 
 class ImageRequestsValidator(Validator):
 
+    consumes = ('page.images', 'total.size.img')
+
     @classmethod
     def get_broken_images_parsed_values(cls, value):
         return {'images': ', '.join([
@@ -127,11 +129,10 @@ class ImageRequestsValidator(Validator):
             if response.status_code > 399:
                 broken_imgs.add(url)
 
-            if response.text is not None:
-                size_img = len(response.text) / 1024.0
+            size_img = response.size / 1024.0
 
-                if size_img > max_single_size_img:
-                    over_max_size.add((url, size_img))
+            if size_img > max_single_size_img:
+                over_max_size.add((url, size_img))
 
         if broken_imgs:
             self.add_violation(
@@ -7,6 +7,8 @@ from holmes.utils import _
 
 class JSRequestsValidator(Validator):
 
+    consumes = ('page.js', 'total.requests.js', 'total.size.js', 'total.size.js.gzipped')
+
     @classmethod
     def get_violation_definitions(cls):
         return {
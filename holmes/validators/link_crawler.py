@@ -10,6 +10,8 @@ REMOVE_HASH = re.compile('([#].*)$')
 
 
 class LinkCrawlerValidator(Validator):
+    consumes = ('page.links',)
+
     def __init__(self, *args, **kw):
         super(LinkCrawlerValidator, self).__init__(*args, **kw)
         self.broken_links = set()
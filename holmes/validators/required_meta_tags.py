@@ -7,6 +7,8 @@ from holmes.utils import _
 
 class RequiredMetaTagsValidator(Validator):
 
+    consumes = ('meta.tags',)
+
     @classmethod
     def get_violation_definitions(cls):
         return {
@@ -8,6 +8,8 @@ from holmes.utils import _
 
 class RobotsValidator(Validator):
 
+    consumes = ('robots.response',)
+
     SITEMAP_NOT_FOUND = _('You must specify the location of the Sitemap '
                           'using a robots.txt file')
 
@@ -1,24 +1,19 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
-import re
-
 from holmes.validators.base import Validator
 from holmes.utils import _
 
-URL_RE = re.compile(
-    r'^(?:http|ftp)s?://'  # http:// or https://
-    r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+(?:[A-Z]{2,6}\.?|[A-Z0-9-]{2,}\.?)|'  # domain...
-    r'localhost|'  # localhost...
-    r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'  # ...or ip
-    r'(?::\d+)?'  # optional port
-    r'(?P<relative>(?:/?|[/?]\S+))$', re.IGNORECASE)
-
-HTML_ENTITIES = re.compile(r'(&amp;|&apos;|&quot;|&gt;|&lt;)')
-INVALID_CHARS = re.compile(r'(&|\'|"|>|<)')
-
 
 class SitemapValidator(Validator):
+    consumes = (
+        'sitemap.data',
+        'sitemap.files.empty',
+        'sitemap.files.size',
+        'sitemap.files.urls',
+        'sitemap.urls.not_encoded',
+    )
+
     MAX_SITEMAP_SIZE = 10  # 10 MB
     MAX_LINKS_SITEMAP = 50000
 
@@ -89,7 +84,7 @@ class SitemapValidator(Validator):
                 )
                 return
 
-            if not response.text.strip():
+            if sitemap in self.review.data['sitemap.files.empty']:
                 self.add_violation(
                     key='sitemap.empty',
                     value=sitemap,
@@ -99,7 +94,7 @@ class SitemapValidator(Validator):
 
             size_mb = (size / 1024.0)
             urls_count = self.review.data['sitemap.files.urls'][sitemap]
-            not_encoded_links = 0
+            not_encoded = self.review.data['sitemap.urls.not_encoded'][sitemap]
 
             if size_mb > self.MAX_SITEMAP_SIZE:
                 self.add_violation(
@@ -121,37 +116,13 @@ class SitemapValidator(Validator):
                     points=10
                 )
 
-            for url in self.review.data['sitemap.urls'][sitemap]:
-                match = URL_RE.match(url)
-
-                if not match:
-                    continue
-
-                parse = match.groupdict()
-                relative = parse['relative']
-                encoded = True
-
-                try:
-                    str(relative).encode('utf-8')
-                except (UnicodeEncodeError, UnicodeDecodeError):
-                    encoded = False
-
-                relative = HTML_ENTITIES.sub('', relative)
-                encoded = encoded and not INVALID_CHARS.findall(relative)
-
-                if not encoded:
-                    not_encoded_links += 1
-
-                self.send_url(url, self.reviewer.page_score / float(urls_count), response)
-
-            if not_encoded_links > 0:
+            if not_encoded['count'] > 0:
                 self.add_violation(
                     key='sitemap.links.not_encoded',
                     value={
                         'url': sitemap,
-                        'links': not_encoded_links
+                        'links': not_encoded['count'],
+                        'sample': not_encoded['sample']
                     },
                     points=10
                 )
-
-        self.flush()
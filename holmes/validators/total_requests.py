@@ -7,6 +7,8 @@ from holmes.utils import _
 
 
 class TotalRequestsValidator(Validator):
+    consumes = ()
+
     def validate(self):
         css_files = self.get_css_requests()
         js_files = self.get_js_requests()
@@ -19,10 +21,10 @@ class TotalRequestsValidator(Validator):
         )
 
     def get_css_requests(self):
-        return self.reviewer.current_html.cssselect('link[href]')
+        return self.reviewer.current_document.stylesheets
 
     def get_js_requests(self):
-        return self.reviewer.current_html.cssselect('script[src]')
+        return self.reviewer.current_document.js_scripts
 
     def get_img_requests(self):
-        return self.reviewer.current_html.cssselect('img[src]')
+        return self.reviewer.current_document.all_images
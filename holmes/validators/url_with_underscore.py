@@ -7,6 +7,8 @@ from holmes.validators.base import Validator
 
 class UrlWithUnderscoreValidator(Validator):
 
+    consumes = ()
+
     @classmethod
     def get_url_with_underscore_message(cls):
         return _('Google treats a hyphen as a word separator, but does '
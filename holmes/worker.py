@@ -6,17 +6,20 @@ import logging
 from uuid import uuid4
 from datetime import datetime, timedelta
 
-from ujson import dumps
+from ujson import dumps, loads
 from colorama import Fore, Style
 from octopus import TornadoOctopus
 from octopus.limiter.redis.per_domain import Limiter
 from retools.lock import Lock, LockTimeout
 from sqlalchemy.orm import scoped_session
+from tornado.ioloop import PeriodicCallback
 
 from holmes import __version__
 from holmes.reviewer import Reviewer
+from holmes.parsing import ParseExecutor
+from holmes.event_bus import DOMAINS_VIOLATIONS_PREFS_CHANNEL
 from holmes.utils import load_classes, count_url_levels, get_domain_from_url
-from holmes.models import Request, Key, DomainsViolationsPrefs
+from holmes.models import Key, DomainsViolationsPrefs
 from holmes.cli import BaseCLI
 
 
@@ -58,6 +61,17 @@ class BaseWorker(BaseCLI):
         )
         self.otto.start()
 
+        self.parse_executor = ParseExecutor.from_config(self.config, self.otto.ioloop)
+
+    def wait(self, timeout=0):
+        self.otto.wait(timeout)
+
+        # Octopus stops its IOLoop once its requests are done, even if some
+        # of them are still being parsed (and may request something else)
+        while self.parse_executor is not None and self.parse_executor.pending:
+            self.parse_executor.wait()
+            self.otto.wait(timeout)
+
     def handle_error(self, exc_type, exc_value, tb):
         try:
             if not self.db.connection().invalidated:
@@ -80,7 +94,11 @@ class BaseWorker(BaseCLI):
             )
 
     def async_get(self, url, handler, method='GET', **kw):
-        url, response = self.cache.get_request(url)
+        # only full GET responses carry the body other reviews may need
+        if method == 'GET':
+            url, response = self.cache.get_request(url)
+        else:
+            response = None
 
         kw['user_agent'] = self.config.HOLMES_USER_AGENT
 
@@ -88,8 +106,14 @@ class BaseWorker(BaseCLI):
             kw['proxy_host'] = self.config.HTTP_PROXY_HOST
             kw['proxy_port'] = self.config.HTTP_PROXY_PORT
 
+            # streamed bodies are never buffered, so there is nothing to cache
+            if method != 'GET' or 'streaming_callback' in kw:
+                handle = handler
+            else:
+                handle = self.handle_response(url, handler)
+
             self.debug('Enqueueing %s for %s...' % (method, url))
-            self.otto.enqueue(url, self.handle_response(url, handler), method, **kw)
+            self.otto.enqueue(url, handle, method, **kw)
         else:
             handler(url, response)
 
@@ -117,6 +141,10 @@ class HolmesWorker(BaseWorker):
         self.domain_name = None
         self.last_ping = None
 
+        self.reviews_in_flight = {}
+        self._filling_pipeline = False
+        self.leased_jobs = []
+
         authnz_wrapper_class = self.load_authnz_wrapper()
         if authnz_wrapper_class:
             self.authnz_wrapper = authnz_wrapper_class(self.config)
@@ -138,7 +166,17 @@ class HolmesWorker(BaseWorker):
         self.connect_to_redis()
         self.start_otto()
 
-        self.fact_definitions = {}
+        # drained by the IOLoop while reviews run, and between jobs
+        self.events = self.redis_pub_sub.pubsub(ignore_subscribe_messages=True)
+        self.events.subscribe(DOMAINS_VIOLATIONS_PREFS_CHANNEL)
+        self.events_callback = PeriodicCallback(
+            self.handle_events,
+            self.config.DOMAINS_VIOLATIONS_PREFS_EVENTS_INTERVAL_IN_SECONDS * 1000,
+            io_loop=self.otto.ioloop
+        )
+        self.events_callback.start()
+
+        self.fact_definitions = Reviewer.get_fact_definitions()
         self.violation_definitions = {}
 
         self.default_violations_values = {}
@@ -190,6 +228,13 @@ class HolmesWorker(BaseWorker):
             help='Whether http requests should be cached by Octopus.'
         )
 
+        parser.add_argument(
+            '--pipeline',
+            type=int,
+            default=1,
+            help='Number of reviews to keep in flight at the same time on the Octopus instance (1 reviews one page at a time)'
+        )
+
     def get_description(self):
         uuid = str(getattr(self, 'uuid', ''))
 
@@ -204,6 +249,12 @@ class HolmesWorker(BaseWorker):
         self.debug('Started doing work...')
 
         self.update_otto_limiter()
+        self.handle_events()
+
+        if self.options.pipeline > 1:
+            self._do_pipelined_work()
+            return
+
         job = self._load_next_job()
 
         if job is None:
@@ -224,36 +275,159 @@ class HolmesWorker(BaseWorker):
         self._complete_job(lock)
         self.db.commit()
 
-    def _start_reviewer(self, job):
-        if job:
-
-            if count_url_levels(job['url']) > self.config.MAX_URL_LEVELS:
-                self.info('Max URL levels! Details: %s' % job['url'])
-                return
-
-            self.debug('Starting Review for [%s]' % job['url'])
-            reviewer = Reviewer(
-                api_url=self.config.HOLMES_API_URL,
-                page_uuid=job['page'],
-                page_url=job['url'],
-                page_score=0,
-                config=self.config,
-                validators=self.validators,
-                facters=self.facters,
-                search_provider=self.search_provider,
-                async_get=self.async_get,
-                wait=self.otto.wait,
-                wait_timeout=0,  # max time to wait for all requests to finish
-                db=self.db,
-                cache=self.cache,
-                publish=self.publish,
-                girl=self.girl,
-                fact_definitions=self.fact_definitions,
-                violation_definitions=self.violation_definitions
+    def _do_pipelined_work(self):
+        self._fill_pipeline()
+
+        if not self.reviews_in_flight:
+            self.info('No jobs could be found! Returning...')
+            self._ping_api()
+            return
+
+        self.wait(0)
+
+        # reviews that never called back (i.e.: a handler raised) must not keep their locks
+        for url, job in self.reviews_in_flight.items():
+            self.warn('Review for "%s" did not finish. Releasing its lock...' % url)
+            self._release_lock(job.get('lock', None))
+
+        self.reviews_in_flight = {}
+        self.db.commit()
+
+    def _fill_pipeline(self):
+        if self._filling_pipeline:
+            return
+
+        self._filling_pipeline = True
+
+        try:
+            while len(self.reviews_in_flight) < self.options.pipeline:
+                job = self._load_next_job()
+
+                if job is None:
+                    break
+
+                if job['url'] in self.reviews_in_flight or not self._start_job(job):
+                    self.info('Could not start job for url "%s". Maybe other worker doing it?' % job['url'])
+                    self._release_lock(job.get('lock', None))
+                    continue
+
+                reviewer = self._get_reviewer(job, pipelined=True)
+
+                if reviewer is None:
+                    self._complete_job(job.get('lock', None))
+                    continue
+
+                self.info('Starting new pipelined job for %s (%d in flight)...' % (
+                    job['url'], len(self.reviews_in_flight) + 1
+                ))
+                self.reviews_in_flight[job['url']] = job
+                reviewer.start_review(
+                    self._handle_pipelined_review_finished(job),
+                    self._handle_pipelined_review_failed(job)
+                )
+        finally:
+            self._filling_pipeline = False
+
+    def _handle_pipelined_review_finished(self, job):
+        def handle(reviewer):
+            try:
+                self.reviews_in_flight.pop(job['url'], None)
+                self._complete_job(job.get('lock', None))
+                self.db.commit()
+
+                self.update_otto_limiter()
+            except Exception:
+                self._handle_pipelined_review_error(job, sys.exc_info())
+
+            self._fill_pipeline()
+
+        return handle
+
+    def _handle_pipelined_review_failed(self, job):
+        def handle(reviewer, exc_info):
+            self._handle_pipelined_review_error(job, exc_info)
+            self._fill_pipeline()
+
+        return handle
+
+    def _handle_pipelined_review_error(self, job, exc_info):
+        # Octopus swallows what its callbacks raise, so handle_error is never
+        # called for pipelined reviews and the shared session must be fixed here
+        self.error('Review for "%s" failed. Rolling it back...' % job['url'])
+        self.reviews_in_flight.pop(job['url'], None)
+
+        try:
+            self.db.rollback()
+        except Exception:
+            err = sys.exc_info()[1]
+            logging.error("Cannot rollback: %s" % str(err))
+
+        try:
+            self._release_lock(job.get('lock', None))
+        except Exception:
+            err = sys.exc_info()[1]
+            logging.error("Cannot release lock for %s: %s" % (job['url'], str(err)))
+
+        for handler in self.error_handlers:
+            handler.handle_exception(
+                *exc_info, extra={
+                    'worker-uuid': self.uuid,
+                    'holmes-version': __version__,
+                    'url': job['url']
+                }
             )
 
+    def _start_reviewer(self, job):
+        reviewer = self._get_reviewer(job)
+
+        if reviewer is not None:
             reviewer.review()
 
+    def _get_reviewer(self, job, pipelined=False):
+        if not job:
+            return None
+
+        if count_url_levels(job['url']) > self.config.MAX_URL_LEVELS:
+            self.info('Max URL levels! Details: %s' % job['url'])
+            return None
+
+        self.debug('Starting Review for [%s]' % job['url'])
+        return Reviewer(
+            api_url=self.config.HOLMES_API_URL,
+            page_uuid=job['page'],
+            page_url=job['url'],
+            page_score=0,
+            config=self.config,
+            validators=self.validators,
+            facters=self.facters,
+            search_provider=self.search_provider,
+            async_get=self.async_get,
+            # pipelined reviews are driven by the single wait in _do_pipelined_work
+            wait=None if pipelined else self.wait,
+            wait_timeout=0,  # max time to wait for all requests to finish
+            db=self.db,
+            cache=self.cache,
+            publish=self.publish,
+            girl=self.girl,
+            fact_definitions=self.fact_definitions,
+            violation_definitions=self.violation_definitions,
+            parse_executor=self.parse_executor
+        )
+
+    def handle_events(self):
+        # get_message reconnects (and subscribes again) when redis goes away
+        message = self.events.get_message()
+
+        while message is not None:
+            self.handle_event(message['data'])
+            message = self.events.get_message()
+
+    def handle_event(self, data):
+        event = loads(data)
+
+        if event.get('type') == 'domain-violations-prefs-changed':
+            self.cache.expire_local_domain_violations_prefs(event['domain'])
+
     def _ping_api(self):
         self.debug('Pinging that this worker is still alive...')
 
@@ -274,12 +448,32 @@ class HolmesWorker(BaseWorker):
             self._ping_api()
 
     def _load_next_job(self):
-        return self.cache.get_next_job(self.config.REVIEW_EXPIRATION_IN_SECONDS, self.config.WORKERS_LOOK_AHEAD_PAGES)
+        if not self.leased_jobs:
+            self.leased_jobs = self.cache.get_next_jobs(
+                self.config.WORKERS_LEASE_BATCH_SIZE,
+                self.config.REVIEW_EXPIRATION_IN_SECONDS,
+                self.config.NEXT_JOB_LEASE_EXPIRATION_IN_SECONDS,
+                self.config.WORKERS_LOOK_AHEAD_PAGES
+            )
+
+        if not self.leased_jobs:
+            return None
+
+        return self.leased_jobs.pop(0)
 
     def _start_job(self, job):
         try:
-            lock = Lock(job['url'], redis=self.redis, timeout=1)
-            lock.acquire()
+            # leased jobs already come with their lock
+            lock = job.get('lock', None)
+
+            if lock is not None:
+                # jobs wait in the lease batch, so their leases may be gone by now
+                if not lock.renew(self.config.NEXT_JOB_LEASE_EXPIRATION_IN_SECONDS):
+                    job['lock'] = None
+                    return False
+            else:
+                lock = Lock(job['url'], redis=self.redis, timeout=1)
+                lock.acquire()
 
             self.working_url = job['url']
 
@@ -299,7 +493,6 @@ class HolmesWorker(BaseWorker):
         self.domain_name = None
         self._ping_api()
         self._release_lock(lock)
-        Request.delete_old_requests(self.db, self.config)
 
     def _release_lock(self, lock):
         if lock is not None:
@@ -59,7 +59,7 @@ Holmes is a service to investigate your website health.
         'mysql-python>=1.2.5,<1.3.0',
         'six>=1.6.1,<1.7.0',
         'octopus-http>=0.6.3,<0.7.0',
-        'redis>=2.9.1,<2.11.0',
+        'redis>=2.10.0,<2.11.0',
         'toredis>=0.1.2,<0.2.0',
         'raven>=4.1.1,<4.2.0',
         'rotunicode>=1.0.1,<1.1.0',
@@ -70,6 +70,8 @@ Holmes is a service to investigate your website health.
         'holmesalf>=0.1.2,<0.2.0',
         'PyJWT>=0.2.1,<0.3.0',
         'SQLAlchemy>=0.9.0,<1.0.0',
+        'futures>=2.1.6,<2.2.0',
+        'msgpack-python>=0.4.2,<0.5.0',
     ],
     extras_require={
         'tests': tests_require,
@@ -80,6 +82,9 @@ Holmes is a service to investigate your website health.
             'holmes-worker=holmes.worker:main',
             'holmes-material=holmes.material:main',
             'holmes-search=holmes.search:main',
+            'holmes-persister=holmes.persister:main',
+            'holmes-retention=holmes.retention:main',
+            'holmes-backfill-values=holmes.backfill:main',
         ],
     },
 )
@@ -66,6 +66,7 @@ class PageFactory(BaseFactory):
 
     last_modified = None
     expires = None
+    etag = None
 
     domain = factory.SubFactory(DomainFactory)
     last_review = None
@@ -7,6 +7,7 @@ from preggy import expect
 
 from holmes.config import Config
 from holmes.reviewer import Reviewer
+from holmes.cache import ResourceSummary
 from holmes.facters.css import CSSFacter
 from tests.unit.base import FacterTestCase
 from tests.fixtures import PageFactory
@@ -78,10 +79,10 @@ class TestCSSFacter(FacterTestCase):
             'page.css': set([])
         })
 
-        facter.async_get.assert_called_once_with(
-            'http://my-site.com/a.css',
-            facter.handle_url_loaded
-        )
+        expect(facter.async_get.call_count).to_equal(1)
+        args, kw = facter.async_get.call_args
+        expect(args[0]).to_equal('http://my-site.com/a.css')
+        expect(kw).to_include('streaming_callback')
 
     def test_handle_url_loaded(self):
         page = PageFactory.create()
@@ -122,8 +123,48 @@ class TestCSSFacter(FacterTestCase):
         expect(facter.review.data['total.size.css.gzipped']).to_equal(0.0380859375)
 
         expect(facter.review.data).to_include('page.css')
-        data = set([(page.url, response)])
-        expect(facter.review.data['page.css']).to_equal(data)
+        expect(facter.review.data['page.css']).to_length(1)
+        url, summary = list(facter.review.data['page.css'])[0]
+        expect(url).to_equal(page.url)
+        expect(summary.status_code).to_equal(200)
+
+    def test_uses_cached_resource_summary(self):
+        page = PageFactory.create(url='http://my-site.com')
+
+        reviewer = Reviewer(
+            api_url='http://localhost:2368',
+            page_uuid=page.uuid,
+            page_url=page.url,
+            page_score=0.0,
+            config=Config(),
+            facters=[]
+        )
+
+        content = '<html><link href="a.css" /></html>'
+
+        reviewer._wait_for_async_requests = Mock()
+        reviewer.save_review = Mock()
+        response = Mock(status_code=200, text=content, headers={})
+        reviewer.content_loaded(page.url, response)
+
+        summary = ResourceSummary(
+            url='http://my-site.com/a.css',
+            status_code=200,
+            size=2048,
+            gzipped_size=1024
+        )
+        reviewer.get_resource_summary = Mock(return_value=summary)
+
+        facter = CSSFacter(reviewer)
+        facter.async_get = Mock()
+        facter.get_facts()
+
+        expect(facter.async_get.called).to_be_false()
+        expect(facter.review.data['page.css']).to_equal(
+            set([('http://my-site.com/a.css', summary)])
+        )
+        expect(facter.review.data['total.size.css']).to_equal(2.0)
+        expect(facter.review.data['total.size.css.gzipped']).to_equal(1.0)
 
     def test_handle_url_loaded_with_empty_content(self):
         page = PageFactory.create()
@@ -5,6 +5,7 @@ import lxml.html
 from mock import Mock, call
 from preggy import expect
 
+from holmes.cache import BodySizeCounter
 from holmes.config import Config
 from holmes.reviewer import Reviewer
 from holmes.facters.images import ImageFacter
@@ -78,10 +79,34 @@ class TestImageFacter(FacterTestCase):
                 value=1,
             ))
 
-        facter.async_get.assert_called_once_with(
-            'http://my-site.com/test.png',
-            facter.handle_url_loaded
-        )
+        expect(facter.async_get.call_count).to_equal(1)
+        url, handler, method = facter.async_get.call_args[0]
+        expect(url).to_equal('http://my-site.com/test.png')
+        expect(method).to_equal('HEAD')
+
+    def test_falls_back_to_get_when_head_has_no_content_length(self):
+        reviewer = Mock(config=Config())
+        reviewer.get_resource_summary.return_value = None
+
+        facter = ImageFacter(reviewer)
+        facter.async_get = Mock()
+        handler = Mock()
+
+        facter.async_get_summary('http://my-site.com/test.png', handler, probe=True, require_length=True)
+
+        url, handle_probe, method = facter.async_get.call_args[0]
+        expect(method).to_equal('HEAD')
+
+        response = Mock(status_code=200, text='', headers={'Content-Length': '2048'})
+        handle_probe(url, response)
+        handler.assert_called_once_with(url, response)
+
+        handle_probe(url, Mock(status_code=200, text='', headers={}))
+        expect(facter.async_get.call_args[0][0]).to_equal(url)
+        expect(facter.async_get.call_args[1]['streaming_callback']).to_be_instance_of(BodySizeCounter)
+
+        handle_probe(url, Mock(status_code=405, text='', headers={}))
+        expect(facter.async_get.call_count).to_equal(3)
 
     def test_handle_url_loaded(self):
         page = PageFactory.create()
@@ -122,8 +147,10 @@ class TestImageFacter(FacterTestCase):
         expect(img_src).to_equal('test.png')
 
         expect(facter.review.data).to_include('page.images')
-        data = set([(page.url, response)])
-        expect(facter.review.data['page.images']).to_equal(data)
+        expect(facter.review.data['page.images']).to_length(1)
+        url, summary = list(facter.review.data['page.images'])[0]
+        expect(url).to_equal(page.url)
+        expect(summary.status_code).to_equal(200)
 
         expect(facter.review.data).to_include('total.size.img')
         expect(facter.review.data['total.size.img']).to_equal(0.0517578125)
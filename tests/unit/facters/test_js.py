@@ -78,10 +78,10 @@ class TestJSFacter(FacterTestCase):
             'total.size.js': 0
         })
 
-        facter.async_get.assert_called_once_with(
-            'http://my-site.com/teste.js',
-            facter.handle_url_loaded
-        )
+        expect(facter.async_get.call_count).to_equal(1)
+        args, kw = facter.async_get.call_args
+        expect(args[0]).to_equal('http://my-site.com/teste.js')
+        expect(kw).to_include('streaming_callback')
 
     def test_handle_url_loaded(self):
         page = PageFactory.create()
@@ -122,8 +122,10 @@ class TestJSFacter(FacterTestCase):
         expect(facter.review.data['total.size.js.gzipped']).to_equal(0.05078125)
 
         expect(facter.review.data).to_include('page.js')
-        data = set([(page.url, response)])
-        expect(facter.review.data['page.js']).to_equal(data)
+        expect(facter.review.data['page.js']).to_length(1)
+        url, summary = list(facter.review.data['page.js'])[0]
+        expect(url).to_equal(page.url)
+        expect(summary.status_code).to_equal(200)
 
     def test_handle_url_loaded_with_empty_content(self):
         page = PageFactory.create()
@@ -116,8 +116,10 @@ class TestLinksFacter(FacterTestCase):
         facter.handle_url_loaded(page.url, response)
 
         expect(facter.review.data).to_include('page.links')
-        data = set([(page.url, response)])
-        expect(facter.review.data['page.links']).to_equal(data)
+        expect(facter.review.data['page.links']).to_length(1)
+        url, summary = list(facter.review.data['page.links'])[0]
+        expect(url).to_equal(page.url)
+        expect(summary.status_code).to_equal(200)
 
     def test_can_get_fact_definitions(self):
         reviewer = Mock()
@@ -51,17 +51,20 @@ class TestSitemapFacter(FacterTestCase):
 
         facter.get_facts()
 
-        expect(facter.review.data).to_length(7)
+        expect(facter.review.data).to_length(8)
 
         expect(facter.review.data).to_include('sitemap.data')
         expect(facter.review.data['sitemap.data']).to_equal({})
 
-        expect(facter.review.data).to_include('sitemap.urls')
-        expect(facter.review.data['sitemap.urls']).to_equal({})
+        expect(facter.review.data).to_include('sitemap.urls.not_encoded')
+        expect(facter.review.data['sitemap.urls.not_encoded']).to_equal({})
 
         expect(facter.review.data).to_include('sitemap.files')
         expect(facter.review.data['sitemap.files']).to_equal(set())
 
+        expect(facter.review.data).to_include('sitemap.files.empty')
+        expect(facter.review.data['sitemap.files.empty']).to_equal(set())
+
         expect(facter.review.data).to_include('sitemap.files.size')
         expect(facter.review.data['sitemap.files.size']).to_equal({})
 
@@ -180,7 +183,7 @@ class TestSitemapFacter(FacterTestCase):
         facter.handle_sitemap_loaded("http://g1.globo.com/sitemap.xml", response)
 
         expect(facter.review.data['sitemap.files.size']["http://g1.globo.com/sitemap.xml"]).to_equal(0.2607421875)
-        expect(facter.review.data['sitemap.urls']["http://g1.globo.com/sitemap.xml"]).to_equal(set())
+        expect(facter.review.data['sitemap.urls.not_encoded']["http://g1.globo.com/sitemap.xml"]).to_equal({'count': 0, 'sample': []})
         expect(facter.review.facts['total.size.sitemap']['value']).to_equal(0.2607421875)
         expect(facter.review.facts['total.size.sitemap.gzipped']['value']).to_equal(0.146484375)
         expect(facter.review.data['total.size.sitemap']).to_equal(0.2607421875)
@@ -204,7 +207,7 @@ class TestSitemapFacter(FacterTestCase):
             config=Config(),
             validators=[]
         )
-        reviewer.enqueue = Mock()
+        reviewer.discover_pages = Mock()
 
         content = self.get_file('url_sitemap.xml')
         response = Mock(status_code=200, text=content)
@@ -217,13 +220,17 @@ class TestSitemapFacter(FacterTestCase):
         facter.handle_sitemap_loaded("http://g1.globo.com/sitemap.xml", response)
 
         expect(facter.review.data['sitemap.files.size']["http://g1.globo.com/sitemap.xml"]).to_equal(0.296875)
-        expect(facter.review.data['sitemap.urls']["http://g1.globo.com/sitemap.xml"]).to_equal(set(['http://domain.com/1.html', 'http://domain.com/2.html']))
+        expect(facter.review.data['sitemap.urls.not_encoded']["http://g1.globo.com/sitemap.xml"]).to_equal({'count': 0, 'sample': []})
         expect(facter.review.facts['total.size.sitemap']['value']).to_equal(0.296875)
         expect(facter.review.facts['total.size.sitemap.gzipped']['value']).to_equal(0.1494140625)
         expect(facter.review.data['total.size.sitemap']).to_equal(0.296875)
         expect(facter.review.data['total.size.sitemap.gzipped']).to_equal(0.1494140625)
         expect(facter.review.data['sitemap.files.urls']["http://g1.globo.com/sitemap.xml"]).to_equal(2)
         expect(facter.review.facts['total.sitemap.urls']['value']).to_equal(2)
+        reviewer.discover_pages.assert_called_once_with([
+            ('http://domain.com/1.html', 0.5),
+            ('http://domain.com/2.html', 0.5),
+        ])
 
     def test_handle_robots_loaded(self):
         page = PageFactory.create(url="http://g1.globo.com/")
@@ -247,6 +254,27 @@ class TestSitemapFacter(FacterTestCase):
             facter.handle_sitemap_loaded
         )
 
+    def test_handle_sitemap_not_parsed(self):
+        page = PageFactory.create(url="http://g1.globo.com/")
+
+        reviewer = Reviewer(
+            api_url='http://localhost:2368',
+            page_uuid=page.uuid,
+            page_url=page.url,
+            page_score=0.0,
+            config=Config(),
+            validators=[]
+        )
+
+        facter = SitemapFacter(reviewer)
+        facter.async_get = Mock()
+        facter.get_facts()
+
+        facter.handle_sitemap_parsed("http://g1.globo.com/sitemap.xml")(None)
+
+        expect(facter.review.data['sitemap.files.size']).to_equal({})
+        expect(facter.review.facts['total.sitemap.urls']['value']).to_equal(0)
+
     def test_gzipeed_sitemap(self):
         page = PageFactory.create(url="http://g1.globo.com/")
 
@@ -271,7 +299,7 @@ class TestSitemapFacter(FacterTestCase):
         facter.handle_sitemap_loaded("http://g1.globo.com/sitemap.xml.gz", response)
 
         expect(facter.review.data['sitemap.files.size']["http://g1.globo.com/sitemap.xml.gz"]).to_equal(0.2607421875)
-        expect(facter.review.data['sitemap.urls']["http://g1.globo.com/sitemap.xml.gz"]).to_equal(set())
+        expect(facter.review.data['sitemap.urls.not_encoded']["http://g1.globo.com/sitemap.xml.gz"]).to_equal({'count': 0, 'sample': []})
         expect(facter.review.facts['total.size.sitemap']['value']).to_equal(0.2607421875)
         expect(facter.review.facts['total.size.sitemap.gzipped']['value']).to_equal(0.146484375)
         expect(facter.review.data['total.size.sitemap']).to_equal(0.2607421875)
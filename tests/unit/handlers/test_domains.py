@@ -10,7 +10,7 @@ from tornado.testing import gen_test
 from tornado.httpclient import HTTPError
 from mock import Mock
 
-from holmes.models import Domain, Key
+from holmes.models import Domain, DomainStats, Key
 from tests.unit.base import ApiTestCase
 from tests.fixtures import DomainFactory, PageFactory, ReviewFactory, RequestFactory
 
@@ -86,6 +86,8 @@ class TestDomainsFullDataHandler(ApiTestCase):
             } for i in range(9)
         }
 
+        DomainStats.rebuild(self.db)
+
         response = yield self.authenticated_fetch('/domains-details')
 
         expect(response.code).to_equal(200)
@@ -128,6 +130,8 @@ class TestDomainDetailsHandler(ApiTestCase):
         expect(domain_details['violationCount']).to_equal(50)
         expect(domain_details['reviewPercentage']).to_equal(100.00)
         expect(domain_details['errorPercentage']).to_equal(0)
+        expect(domain_details['recentRequests']['requestCount']).to_equal(0)
+        expect(domain_details['recentRequests']['responseTimeP95']).to_be_null()
         expect(domain_details['averageResponseTime']).to_equal(0)
         expect(domain_details['is_active']).to_be_true()
         expect(domain_details['homepageId']).to_equal(str(page.uuid))
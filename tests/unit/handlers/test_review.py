@@ -9,8 +9,9 @@ from mock import patch
 from preggy import expect
 from tornado.testing import gen_test
 from tornado.httpclient import HTTPError
-from ujson import loads
+from ujson import dumps, loads
 
+from holmes.models import Review
 from tests.unit.base import ApiTestCase
 from tests.fixtures import PageFactory, ReviewFactory, KeyFactory, DomainFactory
 
@@ -86,6 +87,52 @@ class TestReviewHandler(ApiTestCase):
 
         expect(loads(response.body)).to_be_like(expected)
 
+    @gen_test
+    def test_complete_review_is_rendered_once(self):
+        review = ReviewFactory.create(is_complete=True, number_of_facts=1)
+        self.db.flush()
+
+        url = '/page/%s/review/%s' % (review.page.uuid, review.uuid)
+
+        response = yield self.authenticated_fetch(url)
+        expect(response.code).to_equal(200)
+
+        sync_cache = self.sync_cache
+        data = loads(sync_cache.redis.hget('review-json-%s' % review.uuid, 'en_US'))
+        expect(data['page']).to_be_null()
+        expect(data['facts']).to_length(1)
+
+        data['facts'] = []
+        sync_cache.redis.hset('review-json-%s' % review.uuid, 'en_US', dumps(data))
+
+        response = yield self.authenticated_fetch(url)
+        result = loads(response.body)
+
+        expect(result['facts']).to_equal([])
+        expect(result['page']).to_be_like(review.page.to_dict())
+
+        sync_cache.delete_reviews_json([review.uuid])
+        expect(sync_cache.redis.exists('review-json-%s' % review.uuid)).to_be_false()
+
+    @gen_test
+    def test_rendered_review_is_served_without_loading_its_details(self):
+        review = ReviewFactory.create(is_complete=True, number_of_facts=1)
+        self.db.flush()
+
+        url = '/page/%s/review/%s' % (review.page.uuid, review.uuid)
+
+        response = yield self.authenticated_fetch(url)
+        expect(response.code).to_equal(200)
+
+        with patch.object(Review, 'load_details') as load_details_mock:
+            response = yield self.authenticated_fetch(url)
+
+        expect(response.code).to_equal(200)
+        expect(loads(response.body)['facts']).to_length(1)
+        load_details_mock.assert_called_once_with(self.db, [])
+
+        self.sync_cache.delete_reviews_json([review.uuid])
+
 
 class TestLastReviewsHandler(ApiTestCase):
 
@@ -6,7 +6,7 @@ from datetime import datetime
 from preggy import expect
 from tornado.testing import gen_test
 
-from holmes.models import Domain, Request
+from holmes.models import Domain, DomainStats
 from tests.unit.base import ApiTestCase
 from tests.fixtures import DomainFactory, PageFactory, ReviewFactory, RequestFactory
 
@@ -185,69 +185,6 @@ class TestDomain(ApiTestCase):
             'globoesporte.globo.com'
         ])
 
-    def test_can_get_good_request_count(self):
-        self.db.query(Request).delete()
-
-        domain = DomainFactory.create()
-
-        good = domain.get_good_request_count(self.db)
-        expect(good).to_equal(0)
-
-        RequestFactory.create(status_code=200, domain_name=domain.name)
-        RequestFactory.create(status_code=304, domain_name=domain.name)
-
-        good = domain.get_good_request_count(self.db)
-        expect(good).to_equal(2)
-
-        RequestFactory.create(status_code=400, domain_name=domain.name)
-        RequestFactory.create(status_code=403, domain_name=domain.name)
-        RequestFactory.create(status_code=404, domain_name=domain.name)
-
-        good = domain.get_good_request_count(self.db)
-        expect(good).to_equal(2)
-
-    def test_can_get_bad_request_count(self):
-        self.db.query(Request).delete()
-
-        domain = DomainFactory.create()
-
-        bad = domain.get_bad_request_count(self.db)
-        expect(bad).to_equal(0)
-
-        RequestFactory.create(status_code=200, domain_name=domain.name)
-        RequestFactory.create(status_code=304, domain_name=domain.name)
-
-        bad = domain.get_bad_request_count(self.db)
-        expect(bad).to_equal(0)
-
-        RequestFactory.create(status_code=400, domain_name=domain.name)
-        RequestFactory.create(status_code=403, domain_name=domain.name)
-        RequestFactory.create(status_code=404, domain_name=domain.name)
-
-        bad = domain.get_bad_request_count(self.db)
-        expect(bad).to_equal(3)
-
-    def test_can_get_response_time_avg(self):
-        self.db.query(Request).delete()
-
-        domain = DomainFactory.create()
-
-        avg = domain.get_response_time_avg(self.db)
-        expect(avg).to_be_like(0)
-
-        RequestFactory.create(status_code=200, domain_name=domain.name, response_time=0.25)
-        RequestFactory.create(status_code=304, domain_name=domain.name, response_time=0.35)
-
-        avg = domain.get_response_time_avg(self.db)
-        expect(avg).to_be_like(0.3)
-
-        RequestFactory.create(status_code=400, domain_name=domain.name, response_time=0.25)
-        RequestFactory.create(status_code=403, domain_name=domain.name, response_time=0.35)
-        RequestFactory.create(status_code=404, domain_name=domain.name, response_time=0.25)
-
-        avg = domain.get_response_time_avg(self.db)
-        expect(avg).to_be_like(0.3)
-
     def test_can_get_domains_details(self):
         self.db.query(Domain).delete()
 
@@ -273,6 +210,8 @@ class TestDomain(ApiTestCase):
         RequestFactory.create(status_code=403, domain_name=domain.name, response_time=0.35)
         RequestFactory.create(status_code=404, domain_name=domain.name, response_time=0.25)
 
+        DomainStats.rebuild(self.db)
+
         details = Domain.get_domains_details(self.db)
 
         expect(details).to_length(3)
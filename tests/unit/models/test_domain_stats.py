@@ -0,0 +1,111 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import hashlib
+from datetime import date, timedelta
+
+from mock import Mock, patch
+from preggy import expect
+
+from holmes.config import Config
+from holmes.models import DomainStats, Request, Page
+from tests.unit.base import ApiTestCase
+from tests.fixtures import DomainFactory, PageFactory, ReviewFactory, RequestFactory
+
+
+class TestDomainStats(ApiTestCase):
+    def get_stats(self, domain):
+        self.db.expire_all()
+        return self.db.query(DomainStats).filter(DomainStats.domain_id == domain.id).one()
+
+    def test_can_increment_counters(self):
+        domain = DomainFactory.create()
+
+        DomainStats.increment(self.db, domain.id, page_count=1)
+        DomainStats.increment(self.db, domain.id, page_count=2, violation_count=-1)
+
+        stats = self.get_stats(domain)
+        expect(stats.page_count).to_equal(3)
+        expect(stats.violation_count).to_equal(-1)
+        expect(stats.review_count).to_equal(0)
+
+    def test_increment_unknown_counter_raises(self):
+        try:
+            DomainStats.increment(self.db, 1, whatever=1)
+        except ValueError, err:
+            expect(str(err)).to_equal('Unknown domain counter: whatever')
+        else:
+            assert False, 'Should not have gotten this far'
+
+    def test_save_requests_updates_counters(self):
+        domain = DomainFactory.create(name='t.com')
+        page = PageFactory.create(domain=domain, url='http://t.com/a.html')
+
+        requests = [
+            ('http://t.com/a.css', Mock(status_code=200, request_time=0.25, effective_url=None)),
+            ('http://t.com/b.css', Mock(status_code=304, request_time=0.35, effective_url=None)),
+            ('http://t.com/c.css', Mock(status_code=404, request_time=0.5, effective_url=None)),
+        ]
+
+        Request.save_requests(self.db, Mock(), page, requests)
+
+        stats = self.get_stats(domain)
+        expect(stats.good_request_count).to_equal(2)
+        expect(stats.bad_request_count).to_equal(1)
+        expect(stats.response_time_sum).to_be_like(0.6)
+
+    def test_deleting_old_requests_updates_counters(self):
+        domain = DomainFactory.create(name='old.com')
+
+        config = Config()
+        config.DAYS_TO_KEEP_REQUESTS = 1
+
+        for index, status_code in enumerate([200, 404, 200]):
+            RequestFactory.create(
+                url='http://old.com/%d.css' % index,
+                domain_name='old.com',
+                status_code=status_code,
+                response_time=0.5,
+                completed_date=date.today() - timedelta(days=2 * index)
+            )
+
+        DomainStats.rebuild(self.db)
+
+        min_id, max_id = Request.get_old_requests_id_range(self.db, config)
+        Request.delete_old_requests(self.db, config, min_id, max_id)
+
+        stats = self.get_stats(domain)
+        expect(stats.good_request_count).to_equal(1)
+        expect(stats.bad_request_count).to_equal(0)
+        expect(stats.response_time_sum).to_be_like(0.5)
+
+    def test_adding_a_known_page_does_not_count_it_again(self):
+        domain = DomainFactory.create(name='known.com', url='http://known.com')
+        page = PageFactory.create(
+            domain=domain, url='http://known.com/a.html',
+            url_hash=hashlib.sha512('http://known.com/a.html').hexdigest()
+        )
+
+        DomainStats.rebuild(self.db)
+
+        # the page shows up between the lookup and the insert
+        with patch.object(Page, 'by_url_hash', side_effect=[None, page]):
+            page_uuid = Page.insert_or_update_page(
+                u'http://known.com/a.html', 1.0, domain, self.db, Mock(), Mock(), Config()
+            )
+
+        expect(page_uuid).to_equal(page.uuid)
+        expect(self.get_stats(domain).page_count).to_equal(1)
+
+    def test_can_rebuild_counters(self):
+        domain = DomainFactory.create()
+        page = PageFactory.create(domain=domain)
+        PageFactory.create(domain=domain)
+        ReviewFactory.create(page=page, is_active=True, number_of_violations=3)
+
+        DomainStats.rebuild(self.db)
+
+        stats = self.get_stats(domain)
+        expect(stats.page_count).to_equal(2)
+        expect(stats.review_count).to_equal(1)
+        expect(stats.violation_count).to_equal(3)
@@ -1,15 +1,18 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
+import hashlib
 from uuid import uuid4
 from datetime import datetime
 
+from mock import Mock
 from preggy import expect
+from ujson import loads
 
 from holmes.config import Config
-from holmes.models import Page
+from holmes.models import Page, DomainStats
 from tests.unit.base import ApiTestCase
-from tests.fixtures import PageFactory, ReviewFactory
+from tests.fixtures import DomainFactory, PageFactory, ReviewFactory
 
 
 class TestPage(ApiTestCase):
@@ -85,3 +88,58 @@ class TestPage(ApiTestCase):
 
         invalid_page = Page.by_uuid('123', self.db)
         expect(invalid_page).to_be_null()
+
+    def test_can_add_pages(self):
+        domain = DomainFactory.create(name='globo.com')
+        page = PageFactory.create(
+            domain=domain, url='http://globo.com/known.html', score=3.0,
+            url_hash=hashlib.sha512('http://globo.com/known.html').hexdigest()
+        )
+
+        added = Page.add_pages(self.db, domain, [
+            ('http://globo.com/known.html', 0.1),
+            ('http://globo.com/1.html', 0.8),
+            ('http://globo.com/1.html', 0.2),
+            (u'http://globo.com/\xfcmlat.html', 0.5),
+        ])
+
+        expect(added).to_equal(2)
+
+        self.db.expire_all()
+
+        pages = self.db.query(Page).filter(Page.domain_id == domain.id).order_by(Page.id).all()
+        expect([(item.url, item.score) for item in pages]).to_equal([
+            ('http://globo.com/known.html', 3.0),
+            ('http://globo.com/1.html', 0.8),
+            (u'http://globo.com/\xfcmlat.html', 0.5),
+        ])
+        expect(pages[0].uuid).to_equal(page.uuid)
+
+        stats = self.db.query(DomainStats).filter(DomainStats.domain_id == domain.id).one()
+        expect(stats.page_count).to_equal(2)
+
+    def test_add_pages_publishes_a_single_event(self):
+        domain = DomainFactory.create(name='globo.com')
+        publish = Mock()
+
+        added = Page.add_pages(self.db, domain, [
+            ('http://globo.com/1.html', 0.5),
+            ('http://globo.com/2.html', 0.5),
+        ], publish)
+
+        expect(added).to_equal(2)
+        expect(publish.call_count).to_equal(1)
+        expect(loads(publish.call_args[0][0])['type']).to_equal('new-page')
+
+        expect(Page.add_pages(self.db, domain, [('http://globo.com/1.html', 0.5)], publish)).to_equal(0)
+        expect(publish.call_count).to_equal(1)
+
+    def test_add_pages_when_all_are_known(self):
+        domain = DomainFactory.create(name='globo.com')
+        PageFactory.create(
+            domain=domain, url='http://globo.com/known.html',
+            url_hash=hashlib.sha512('http://globo.com/known.html').hexdigest()
+        )
+
+        expect(Page.add_pages(self.db, domain, [('http://globo.com/known.html', 0.5)])).to_equal(0)
+        expect(Page.add_pages(self.db, domain, [])).to_equal(0)
@@ -156,7 +156,8 @@ class TestRequest(ApiTestCase):
                 completed_date=date.today() - timedelta(days=i)
             )
 
-        Request.delete_old_requests(self.db, config)
+        min_id, max_id = Request.get_old_requests_id_range(self.db, config)
+        Request.delete_old_requests(self.db, config, min_id, max_id)
 
         requests = self.db.query(Request).all()
         expect(requests).to_length(1)
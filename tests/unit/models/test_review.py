@@ -6,14 +6,16 @@ from uuid import uuid4
 from datetime import datetime
 
 from preggy import expect
+from sqlalchemy import event
+from mock import Mock
 #from tornado.testing import gen_test
 
 from holmes.config import Config
-from holmes.models import Review, Violation, Key, Page, Fact
+from holmes.models import Review, Violation, Key, Page, Fact, DomainStats
 from holmes.utils import _
 from tests.unit.base import ApiTestCase
 from tests.fixtures import (
-    ReviewFactory, PageFactory, KeyFactory, DomainFactory
+    ReviewFactory, PageFactory, KeyFactory, DomainFactory, engine
 )
 
 
@@ -199,6 +201,73 @@ class TestReview(ApiTestCase):
             'isComplete': False
         })
 
+    def test_to_dict_with_details_uses_fixed_number_of_queries(self):
+        review = ReviewFactory.create(
+            is_active=True, is_complete=True, number_of_facts=5, number_of_violations=5
+        )
+        self.db.flush()
+
+        fact_definitions = {}
+        violation_definitions = {}
+        for i in range(3):
+            key = Key.get_by_name(self.db, 'key.%d' % i)
+            fact_definitions[key.name] = {'key': key, 'key_id': key.id}
+            violation_definitions[key.name] = {'key': key, 'key_id': key.id}
+
+        statements = []
+
+        def count_statement(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        self.db.expire_all()
+        event.listen(engine, 'before_cursor_execute', count_statement)
+
+        try:
+            loaded = Review.by_uuid(review.uuid, self.db, load_details=True)
+            result = loaded.to_dict(fact_definitions, violation_definitions, _)
+        finally:
+            event.remove(engine, 'before_cursor_execute', count_statement)
+
+        expect(result['facts']).to_length(5)
+        expect(result['violations']).to_length(5)
+        expect(result['page']['uuid']).to_equal(str(review.page.uuid))
+        expect(result['domain']).to_equal(review.domain.name)
+        expect(sorted(fact['key'] for fact in result['facts'])).to_equal(
+            ['key.%d' % i for i in range(5)]
+        )
+
+        # review with page and domain, facts, violations and the two keys
+        # missing from the definitions
+        expect(statements).to_length(4)
+
+    def test_load_details_of_many_reviews_uses_fixed_number_of_queries(self):
+        reviews = [
+            ReviewFactory.create(is_active=True, is_complete=True, number_of_facts=2, number_of_violations=2)
+            for i in range(3)
+        ]
+        self.db.flush()
+        self.db.expire_all()
+
+        loaded = [Review.by_uuid(review.uuid, self.db, load_page=True) for review in reviews]
+
+        statements = []
+
+        def count_statement(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(engine, 'before_cursor_execute', count_statement)
+
+        try:
+            Review.load_details(self.db, loaded)
+            counts = [(len(review.facts), len(review.violations)) for review in loaded]
+        finally:
+            event.remove(engine, 'before_cursor_execute', count_statement)
+
+        expect(counts).to_equal([(2, 2)] * 3)
+
+        # reviews with page and domain, facts and violations
+        expect(statements).to_length(3)
+
     def test_count_by_violation_key_name(self):
         self.db.query(Review).delete()
         self.db.query(Violation).delete()
@@ -278,7 +347,11 @@ class TestReview(ApiTestCase):
         facts = self.db.query(Fact).all()
         expect(facts).to_length(7)
 
-        Review.delete_old_reviews(self.db, config, page1)
+        min_id, max_id = Review.get_id_range(self.db)
+        counts = Review.delete_old_reviews(
+            self.db, config.NUMBER_OF_REVIEWS_TO_KEEP, min_id, max_id + 1
+        )
+        expect(counts).to_equal((2, 2, 4))
 
         reviews = self.db.query(Review).all()
         expect(reviews).to_length(6)
@@ -286,3 +359,114 @@ class TestReview(ApiTestCase):
         expect(violations).to_length(9)
         facts = self.db.query(Fact).all()
         expect(facts).to_length(5)
+
+    def test_save_unchanged_review_keeps_last_review(self):
+        dt = datetime(2013, 12, 11, 10, 9, 8)
+
+        page = PageFactory.create(last_review_date=dt)
+        review = ReviewFactory.create(
+            page=page,
+            is_active=True,
+            is_complete=True,
+            completed_date=dt,
+            number_of_violations=2
+        )
+        page.last_review = review
+        self.db.flush()
+
+        expires = datetime(2014, 1, 1, 0, 0, 0)
+        review_data = {
+            'lastModified': None,
+            'expires': expires,
+            'etag': '"abc"',
+            'requests': []
+        }
+
+        Review.save_unchanged_review(page.uuid, review_data, self.db, Mock())
+
+        loaded_page = Page.by_uuid(page.uuid, self.db)
+        expect(loaded_page.last_review_uuid).to_equal(review.uuid)
+        expect(loaded_page.last_review_date).to_be_greater_than(dt)
+        expect(loaded_page.expires).to_equal(expires)
+        expect(loaded_page.etag).to_equal('"abc"')
+        expect(self.db.query(Review).filter(Review.page_id == page.id).count()).to_equal(1)
+
+    def test_save_unchanged_review_refreshes_validators(self):
+        page = PageFactory.create(last_modified=datetime(2013, 1, 1), etag='"old"')
+        review = ReviewFactory.create(page=page, is_active=True, is_complete=True)
+        page.last_review = review
+        self.db.flush()
+
+        last_modified = datetime(2014, 2, 3, 4, 5, 6)
+        review_data = {
+            'lastModified': last_modified,
+            'expires': None,
+            'etag': '"new"',
+            'requests': []
+        }
+
+        Review.save_unchanged_review(page.uuid, review_data, self.db, Mock())
+
+        loaded_page = Page.by_uuid(page.uuid, self.db)
+        expect(loaded_page.last_modified).to_equal(last_modified)
+        expect(loaded_page.etag).to_equal('"new"')
+
+        # validators the response left out are kept
+        review_data.update({'lastModified': None, 'etag': None})
+        Review.save_unchanged_review(page.uuid, review_data, self.db, Mock())
+
+        loaded_page = Page.by_uuid(page.uuid, self.db)
+        expect(loaded_page.last_modified).to_equal(last_modified)
+        expect(loaded_page.etag).to_equal('"new"')
+
+    def test_save_review_inserts_facts_and_violations(self):
+        page = PageFactory.create()
+        last_review = ReviewFactory.create(
+            page=page,
+            is_active=True,
+            is_complete=True,
+            number_of_violations=3
+        )
+        page.last_review = last_review
+        self.db.flush()
+
+        DomainStats.rebuild(self.db)
+
+        fact_key = KeyFactory.create(name='some.fact')
+        violation_key = KeyFactory.create(name='some.violation')
+
+        fact_definitions = {'some.fact': {'key': fact_key}}
+        violation_definitions = {'some.violation': {'key': violation_key}}
+
+        review_data = {
+            'facts': [{'key': 'some.fact', 'value': {'a': 1}}],
+            'violations': [
+                {'key': 'some.violation', 'value': 'v1', 'points': '10.5'},
+                {'key': 'some.violation', 'value': 'v2', 'points': 20},
+            ],
+            'expires': None,
+            'lastModified': None,
+            'requests': []
+        }
+
+        Review.save_review(
+            page.uuid, review_data, self.db, Mock(), fact_definitions,
+            violation_definitions, Mock(), Mock(), Config()
+        )
+
+        review = Page.by_uuid(page.uuid, self.db).last_review
+        expect(review.uuid).not_to_equal(last_review.uuid)
+        expect([fact.value for fact in review.facts]).to_equal([{'a': 1}])
+        expect(sorted(violation.points for violation in review.violations)).to_equal([10, 20])
+
+        old_violations = self.db.query(Violation) \
+            .filter(Violation.review_id == last_review.id) \
+            .filter(Violation.review_is_active == True) \
+            .count()
+        expect(old_violations).to_equal(0)
+        expect(last_review.is_active).to_be_false()
+
+        stats = self.db.query(DomainStats).filter(DomainStats.domain_id == page.domain.id).one()
+        self.db.refresh(stats)
+        expect(stats.review_count).to_equal(1)
+        expect(stats.violation_count).to_equal(2)
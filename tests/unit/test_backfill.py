@@ -0,0 +1,64 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from os.path import abspath, dirname, join
+from gzip import GzipFile
+from cStringIO import StringIO
+
+import sqlalchemy as sa
+from mock import Mock
+from preggy import expect
+from ujson import dumps
+
+from holmes.backfill import ValuesBackfill
+from holmes.codec import JSON
+from holmes.models import Fact, Violation
+from tests.unit.base import ApiTestCase
+from tests.fixtures import ReviewFactory
+
+
+class ValuesBackfillTestCase(ApiTestCase):
+    root_path = abspath(join(dirname(__file__), '..', '..'))
+
+    def test_backfill_reencodes_legacy_values(self):
+        self.db.query(Fact).delete()
+        ReviewFactory.create(number_of_facts=3)
+
+        out = StringIO()
+        with GzipFile(fileobj=out, mode="w", mtime=0) as f:
+            f.write(dumps('legacy'))
+
+        table = Fact.__table__
+        self.db.execute(
+            table.update().values(value=sa.bindparam('_value', type_=sa.LargeBinary)),
+            {'_value': out.getvalue()}
+        )
+
+        worker = ValuesBackfill(['-c', join(self.root_path, 'tests/unit/test_worker.conf')])
+        worker.initialize()
+        worker.db = self.db
+        worker.config.COLUMN_CODEC_BACKFILL_BATCH_SIZE = 2
+
+        totals = worker.backfill(Fact)
+
+        expect(totals['rows']).to_equal(3)
+
+        raw_values = self.db.execute(
+            sa.select([sa.type_coerce(table.c.value, sa.LargeBinary)])
+        ).fetchall()
+        expect([value for value, in raw_values]).to_equal([JSON + '"legacy"'] * 3)
+
+        self.db.expire_all()
+        expect([fact.value for fact in self.db.query(Fact)]).to_equal(['legacy'] * 3)
+
+        expect(worker.backfill(Fact)['rows']).to_equal(0)
+
+    def test_run_once_backfills_every_table_a_single_time(self):
+        worker = ValuesBackfill(['-c', join(self.root_path, 'tests/unit/test_worker.conf')])
+        worker.initialize = Mock()
+        worker.backfill = Mock()
+
+        worker.run_once()
+
+        expect(worker.initialize.call_count).to_equal(1)
+        expect([args[0] for args, kw in worker.backfill.call_args_list]).to_equal([Fact, Violation])
@@ -2,16 +2,23 @@
 # -*- coding: utf-8 -*-
 
 import time
+from datetime import datetime, timedelta
 from gzip import GzipFile
 from cStringIO import StringIO
 from ujson import dumps, loads
 
 import msgpack
+from mock import Mock
 from preggy import expect
 from tornado.testing import gen_test
 from tornado.gen import Task
 
-from holmes.cache import Cache
+from holmes.cache import (
+    Cache, ResourceSummary, BodySizeCounter, get_next_job_bucket_score,
+    get_request_stats_keys
+)
+from holmes.config import Config
+from holmes.stats import RequestStats
 from holmes.models import Domain, Limiter, Page
 from tests.unit.base import ApiTestCase
 from tests.fixtures import (
@@ -20,6 +27,15 @@ from tests.fixtures import (
 )
 
 
+def gzip(text):
+    data = StringIO()
+
+    with GzipFile(mode='w', fileobj=data, compresslevel=6) as gzipped:
+        gzipped.write(text)
+
+    return data.getvalue()
+
+
 class CacheTestCase(ApiTestCase):
     @property
     def cache(self):
@@ -234,6 +250,21 @@ class CacheTestCase(ApiTestCase):
         ])
 
 
+    @gen_test
+    def test_can_get_request_stats(self):
+        stats = RequestStats()
+        stats.add(200, 0.25)
+        stats.add(404, 0.5)
+
+        self.sync_cache.add_request_stats('globo.com', stats)
+
+        loaded = yield self.cache.get_request_stats('globo.com')
+
+        expect(loaded.count).to_equal(2)
+        expect(loaded.error_count).to_equal(1)
+        expect(loaded.response_time_sum).to_equal(0.25)
+
+
 class SyncCacheTestCase(ApiTestCase):
     def setUp(self):
         super(SyncCacheTestCase, self).setUp()
@@ -554,6 +585,62 @@ class SyncCacheTestCase(ApiTestCase):
         expect(url).to_equal('http://g.com/test.html')
         expect(response).to_be_null()
 
+    def test_can_set_and_get_resource_summary(self):
+        test_url = 'http://g.com/style.css'
+        self.sync_cache.redis.delete('resource-summary-%s' % test_url)
+
+        expect(self.sync_cache.get_resource_summary(test_url)).to_be_null()
+
+        summary = ResourceSummary(
+            url=test_url,
+            status_code=200,
+            size=2048,
+            gzipped_size=512,
+            effective_url='http://g.com/style.css?v=1',
+            request_time=0.1
+        )
+        self.sync_cache.set_resource_summary(test_url, summary, 5)
+
+        loaded = self.sync_cache.get_resource_summary(test_url)
+        expect(loaded.from_cache).to_be_true()
+        expect(loaded.to_dict()).to_be_like(summary.to_dict())
+
+    def test_body_size_counter_counts_streamed_chunks(self):
+        body = 'body { color: red; }\n' * 1000
+
+        counter = BodySizeCounter()
+        for index in range(0, len(body), 1024):
+            counter(body[index:index + 1024])
+
+        summary = ResourceSummary.from_response(
+            'http://g.com/style.css',
+            Mock(status_code=200, text='', headers={}, effective_url=None, request_time=0.1),
+            counter
+        )
+
+        expect(summary.size).to_equal(len(body))
+        expect(summary.gzipped_size).to_equal(len(gzip(body)))
+
+    def test_resource_summary_measures_buffered_bodies_gzipped(self):
+        body = 'body { color: red; }\n' * 1000
+
+        summary = ResourceSummary.from_response(
+            'http://g.com/style.css',
+            Mock(status_code=200, text=body, headers={}, effective_url=None, request_time=0.1)
+        )
+
+        expect(summary.size).to_equal(len(body))
+        expect(summary.gzipped_size).to_equal(len(gzip(body)))
+
+    def test_set_resource_summary_ignores_server_errors(self):
+        test_url = 'http://g.com/style.css'
+        self.sync_cache.redis.delete('resource-summary-%s' % test_url)
+
+        summary = ResourceSummary(url=test_url, status_code=599)
+        self.sync_cache.set_resource_summary(test_url, summary, 5)
+
+        expect(self.sync_cache.get_resource_summary(test_url)).to_be_null()
+
     def test_lock_next_job(self):
         test_url = 'http://g.com/test.html'
         key = '%s-next-job-lock' % test_url
@@ -656,6 +743,72 @@ class SyncCacheTestCase(ApiTestCase):
             {'value': u'v2', 'key': u'some.random.2'}
         ])
 
+    def test_can_get_local_domain_violations_prefs(self):
+        domain = DomainFactory.create(name='globo.com')
+
+        sync_cache = self.sync_cache
+        sync_cache.redis.delete('violations-prefs-%s' % domain.name)
+
+        DomainsViolationsPrefsFactory.create(
+            domain=domain,
+            key=KeyFactory.create(name='some.random'),
+            value='v0'
+        )
+
+        prefs = sync_cache.get_local_domain_violations_prefs('globo.com')
+        expect(prefs).to_equal({'some.random': 'v0'})
+
+        # should get from memory
+        sync_cache.get_domain_violations_prefs = Mock()
+
+        prefs = sync_cache.get_local_domain_violations_prefs('globo.com')
+        expect(prefs).to_equal({'some.random': 'v0'})
+        expect(sync_cache.get_domain_violations_prefs.called).to_be_false()
+
+    def test_can_expire_local_domain_violations_prefs(self):
+        sync_cache = self.sync_cache
+        sync_cache.local_violations_prefs['globo.com'] = (
+            time.time() + 60, {'some.random': 'v0'}
+        )
+
+        sync_cache.get_domain_violations_prefs = Mock(return_value=[
+            {'key': 'some.random', 'value': 'v1'}
+        ])
+
+        sync_cache.expire_local_domain_violations_prefs('globo.com')
+
+        prefs = sync_cache.get_local_domain_violations_prefs('globo.com')
+        expect(prefs).to_equal({'some.random': 'v1'})
+
+    def test_can_add_request_stats(self):
+        sync_cache = self.sync_cache
+
+        for status_code in (200, 200, 500):
+            stats = RequestStats()
+            stats.add(status_code, 0.5)
+            sync_cache.add_request_stats('globo.com', stats)
+
+        key = get_request_stats_keys(self.config, 'globo.com')[0]
+        expect(sync_cache.redis.ttl(key)).to_be_greater_than(0)
+
+        loaded = sync_cache.get_request_stats('globo.com')
+
+        expect(loaded.count).to_equal(3)
+        expect(loaded.error_count).to_equal(1)
+        expect(loaded.sketch.count).to_equal(2)
+
+    def test_request_stats_keys_cover_the_window(self):
+        config = Config(
+            REQUEST_STATS_BUCKET_SIZE_IN_SECONDS=300,
+            REQUEST_STATS_WINDOW_IN_SECONDS=3600
+        )
+
+        keys = get_request_stats_keys(config, 'globo.com', now=3601)
+
+        expect(keys).to_length(12)
+        expect(keys[0]).to_equal('request-stats-globo.com-3600')
+        expect(keys[-1]).to_equal('request-stats-globo.com-300')
+
     def test_add_next_job_bucket(self):
         key = 'next-job-bucket'
 
@@ -704,3 +857,258 @@ class SyncCacheTestCase(ApiTestCase):
 
         data = self.sync_cache.get_next_job_bucket()
         expect(data).to_be_null()
+
+    def test_lease_next_jobs(self):
+        self.sync_cache.redis.delete('next-job-bucket')
+        self.sync_cache.redis.delete('next-job-leases')
+
+        for x in range(3):
+            self.sync_cache.redis.delete('http://g%d.com' % x)
+            self.sync_cache.redis.zadd(
+                'next-job-bucket',
+                x,
+                dumps({'page': str(x), 'url': 'http://g%d.com' % x})
+            )
+
+        jobs, job_bucket_count = self.sync_cache.lease_next_jobs(2, 60)
+
+        expect(job_bucket_count).to_equal(1)
+        expect([job['url'] for job in jobs]).to_equal(['http://g0.com', 'http://g1.com'])
+        expect(self.sync_cache.redis.zcard('next-job-leases')).to_equal(2)
+        expect(self.sync_cache.redis.get('http://g0.com')).not_to_be_null()
+
+        jobs[0]['lock'].release()
+
+        expect(self.sync_cache.redis.zcard('next-job-leases')).to_equal(1)
+        expect(self.sync_cache.redis.get('http://g0.com')).to_be_null()
+
+    def test_lease_next_jobs_skips_locked_urls(self):
+        self.sync_cache.redis.delete('next-job-bucket')
+        self.sync_cache.redis.delete('next-job-leases')
+
+        self.sync_cache.redis.set('http://g0.com', time.time() + 60)
+        self.sync_cache.redis.delete('http://g1.com')
+
+        for x in range(2):
+            self.sync_cache.redis.zadd(
+                'next-job-bucket',
+                x,
+                dumps({'page': str(x), 'url': 'http://g%d.com' % x})
+            )
+
+        jobs, job_bucket_count = self.sync_cache.lease_next_jobs(2, 60)
+
+        expect(job_bucket_count).to_equal(0)
+        expect([job['url'] for job in jobs]).to_equal(['http://g1.com'])
+
+    def test_lease_next_jobs_requeues_expired_leases(self):
+        self.sync_cache.redis.delete('next-job-bucket')
+        self.sync_cache.redis.delete('next-job-leases')
+        self.sync_cache.redis.delete('http://g0.com')
+
+        item = dumps({'page': '0', 'url': 'http://g0.com'})
+        self.sync_cache.redis.zadd('next-job-leases', time.time() - 1, item)
+
+        jobs, job_bucket_count = self.sync_cache.lease_next_jobs(1, 60)
+
+        expect(jobs).to_length(1)
+        expect(jobs[0]['url']).to_equal('http://g0.com')
+        expect(self.sync_cache.redis.zscore('next-job-leases', item)).to_be_greater_than(time.time())
+
+    def test_lease_next_jobs_requeues_expired_leases_with_their_score(self):
+        self.sync_cache.redis.delete('next-job-bucket')
+        self.sync_cache.redis.delete('next-job-leases')
+        self.sync_cache.redis.delete('next-job-lease-scores')
+        self.sync_cache.redis.delete('http://g0.com')
+
+        item = dumps({'page': '0', 'url': 'http://g0.com'})
+        self.sync_cache.redis.zadd('next-job-bucket', 42, item)
+
+        jobs, job_bucket_count = self.sync_cache.lease_next_jobs(1, 60)
+        expect(jobs).to_length(1)
+
+        self.sync_cache.redis.zadd('next-job-leases', time.time() - 1, item)
+        self.sync_cache.redis.delete('http://g1.com')
+        self.sync_cache.redis.zadd('next-job-bucket', 0, dumps({'page': '1', 'url': 'http://g1.com'}))
+
+        jobs, job_bucket_count = self.sync_cache.lease_next_jobs(1, 60)
+
+        expect([job['url'] for job in jobs]).to_equal(['http://g1.com'])
+        expect(self.sync_cache.redis.zscore('next-job-leases', item)).to_be_null()
+        expect(self.sync_cache.redis.zscore('next-job-bucket', item)).to_equal(42)
+
+    def test_job_lease_is_only_renewed_and_released_while_it_holds_the_url(self):
+        self.sync_cache.redis.delete('next-job-bucket')
+        self.sync_cache.redis.delete('next-job-leases')
+        self.sync_cache.redis.delete('http://g0.com')
+
+        item = dumps({'page': '0', 'url': 'http://g0.com'})
+        self.sync_cache.redis.zadd('next-job-bucket', 0, item)
+
+        jobs, job_bucket_count = self.sync_cache.lease_next_jobs(1, 60)
+        lease = jobs[0]['lock']
+
+        expect(lease.renew(120)).to_be_true()
+        expect(self.sync_cache.redis.ttl('http://g0.com')).to_be_greater_than(60)
+
+        # the lease expired and another worker locked the url
+        self.sync_cache.redis.set('http://g0.com', 'other-lease')
+
+        expect(lease.renew(120)).to_be_false()
+
+        lease.release()
+
+        expect(self.sync_cache.redis.get('http://g0.com')).to_equal('other-lease')
+        expect(self.sync_cache.redis.zscore('next-job-leases', item)).not_to_be_null()
+
+    def test_fill_job_bucket_resumes_from_domain_cursors(self):
+        self.sync_cache.redis.delete('next-job-bucket')
+        self.sync_cache.redis.delete('next-job-bucket-cursors')
+        self.sync_cache.redis.delete('next-job-bucket-skipped')
+
+        domains = [
+            DomainFactory.create(name='g%d.com' % x, url='http://g%d.com' % x)
+            for x in range(2)
+        ]
+
+        pages = {}
+        for domain in domains:
+            pages[domain.id] = [
+                PageFactory.create(domain=domain, url='%s/%d' % (domain.url, x))
+                for x in range(3)
+            ]
+
+        self.sync_cache.fill_job_bucket(expiration=100, look_ahead_pages=4)
+
+        items = [loads(item) for item in self.sync_cache.redis.zrange('next-job-bucket', 0, -1)]
+        expect(items).to_length(4)
+        expect(set([item['url'] for item in items])).to_equal(set([
+            'http://g0.com/0', 'http://g1.com/0', 'http://g0.com/1', 'http://g1.com/1'
+        ]))
+
+        cursors = self.sync_cache.get_job_bucket_cursors()
+        for domain in domains:
+            expect(cursors[domain.id]).to_equal(pages[domain.id][1].id)
+
+        self.sync_cache.redis.delete('next-job-bucket')
+        self.sync_cache.fill_job_bucket(expiration=100, look_ahead_pages=4)
+
+        items = [loads(item) for item in self.sync_cache.redis.zrange('next-job-bucket', 0, -1)]
+        expect(set([item['url'] for item in items])).to_equal(set([
+            'http://g0.com/2', 'http://g1.com/2'
+        ]))
+
+        cursors = self.sync_cache.get_job_bucket_cursors()
+        for domain in domains:
+            expect(cursors[domain.id]).to_equal(0)
+
+    def test_fill_job_bucket_gives_the_share_of_exhausted_domains_to_the_others(self):
+        self.sync_cache.redis.delete('next-job-bucket')
+        self.sync_cache.redis.delete('next-job-bucket-cursors')
+        self.sync_cache.redis.delete('next-job-bucket-skipped')
+
+        small = DomainFactory.create(name='g0.com', url='http://g0.com')
+        big = DomainFactory.create(name='g1.com', url='http://g1.com')
+
+        PageFactory.create(domain=small, url='http://g0.com/0')
+        pages = [PageFactory.create(domain=big, url='http://g1.com/%d' % x) for x in range(5)]
+
+        self.sync_cache.fill_job_bucket(expiration=100, look_ahead_pages=4)
+
+        items = [loads(item) for item in self.sync_cache.redis.zrange('next-job-bucket', 0, -1)]
+        expect(set([item['url'] for item in items])).to_equal(set([
+            'http://g0.com/0', 'http://g1.com/0', 'http://g1.com/1', 'http://g1.com/2'
+        ]))
+
+        cursors = self.sync_cache.get_job_bucket_cursors()
+        expect(cursors[small.id]).to_equal(0)
+        expect(cursors[big.id]).to_equal(pages[2].id)
+
+    def test_fill_job_bucket_skips_limited_pages_and_remembers_them(self):
+        self.sync_cache.redis.delete('next-job-bucket')
+        self.sync_cache.redis.delete('next-job-bucket-cursors')
+        self.sync_cache.redis.delete('next-job-bucket-skipped')
+
+        domains = [
+            DomainFactory.create(name='g%d.com' % x, url='http://g%d.com' % x)
+            for x in range(2)
+        ]
+
+        pages = {}
+        for domain in domains:
+            pages[domain.id] = [
+                PageFactory.create(domain=domain, url='%s/%d' % (domain.url, x))
+                for x in range(3)
+            ]
+
+        LimiterFactory.create(url='http://g0.com', value=1)
+
+        self.sync_cache.fill_job_bucket(expiration=100, look_ahead_pages=4)
+
+        items = [loads(item) for item in self.sync_cache.redis.zrange('next-job-bucket', 0, -1)]
+        expect(set([item['url'] for item in items])).to_equal(set([
+            'http://g0.com/0', 'http://g1.com/0', 'http://g1.com/1'
+        ]))
+
+        cursors = self.sync_cache.get_job_bucket_cursors()
+        expect(cursors[domains[0].id]).to_equal(pages[domains[0].id][1].id)
+        expect(cursors[domains[1].id]).to_equal(pages[domains[1].id][1].id)
+
+        skipped = self.sync_cache.get_job_bucket_skipped_pages()
+        expect(skipped).to_equal({domains[0].id: [pages[domains[0].id][1].id]})
+
+    def test_fill_job_bucket_keeps_refilling_domains_with_a_limited_prefix(self):
+        self.sync_cache.redis.delete('next-job-bucket')
+        self.sync_cache.redis.delete('next-job-bucket-cursors')
+        self.sync_cache.redis.delete('next-job-bucket-skipped')
+
+        domain = DomainFactory.create(name='g0.com', url='http://g0.com')
+        pages = [PageFactory.create(domain=domain, url='http://g0.com/%d' % x) for x in range(3)]
+
+        limiter = LimiterFactory.create(url='http://g0.com/1', value=0)
+        self.sync_cache.redis.delete('limit-for-%s' % limiter.url)
+
+        self.sync_cache.fill_job_bucket(expiration=100, look_ahead_pages=3)
+
+        items = [loads(item) for item in self.sync_cache.redis.zrange('next-job-bucket', 0, -1)]
+        expect(set([item['url'] for item in items])).to_equal(set([
+            'http://g0.com/0', 'http://g0.com/2'
+        ]))
+        expect(self.sync_cache.get_job_bucket_skipped_pages()).to_equal({domain.id: [pages[1].id]})
+
+        # once the limiter has room, the page held back is queued
+        limiter.value = 1
+        self.db.flush()
+
+        self.sync_cache.redis.delete('next-job-bucket')
+        self.sync_cache.fill_job_bucket(expiration=100, look_ahead_pages=1)
+
+        items = [loads(item) for item in self.sync_cache.redis.zrange('next-job-bucket', 0, -1)]
+        expect([item['url'] for item in items]).to_equal(['http://g0.com/1'])
+        expect(self.sync_cache.get_job_bucket_skipped_pages()).to_be_empty()
+
+    def test_get_next_job_bucket_score(self):
+        now = datetime.utcnow()
+
+        fresh = get_next_job_bucket_score(self.config, 0.0, now, None, None, now)
+        high_score = get_next_job_bucket_score(self.config, 10.0, now, None, None, now)
+        stale = get_next_job_bucket_score(self.config, 0.0, now - timedelta(days=2), None, None, now)
+        expired = get_next_job_bucket_score(self.config, 0.0, now, now - timedelta(days=2), None, now)
+
+        expect(high_score).to_be_lesser_than(fresh)
+        expect(stale).to_be_lesser_than(fresh)
+        expect(expired).to_be_lesser_than(fresh)
+
+    def test_fill_job_bucket_ranks_pages_by_score(self):
+        self.sync_cache.redis.delete('next-job-bucket')
+        self.sync_cache.redis.delete('next-job-bucket-cursors')
+        self.sync_cache.redis.delete('next-job-bucket-skipped')
+
+        domain = DomainFactory.create(name='g.com', url='http://g.com')
+        PageFactory.create(domain=domain, url='http://g.com/low', score=0.0)
+        PageFactory.create(domain=domain, url='http://g.com/high', score=50.0)
+
+        self.sync_cache.fill_job_bucket(expiration=100, look_ahead_pages=2)
+
+        items = [loads(item) for item in self.sync_cache.redis.zrange('next-job-bucket', 0, -1)]
+        expect([item['url'] for item in items]).to_equal(['http://g.com/high', 'http://g.com/low'])
@@ -0,0 +1,107 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from datetime import datetime
+from gzip import GzipFile
+from cStringIO import StringIO
+from unittest import TestCase
+
+from preggy import expect
+from ujson import dumps
+
+from holmes.codec import ColumnCodec, JSON, JSON_DEFLATED, MSGPACK_DEFLATED
+from holmes.config import Config
+
+
+def gzipped(value):
+    out = StringIO()
+    with GzipFile(fileobj=out, mode="w", mtime=0) as f:
+        f.write(dumps(value))
+    return out.getvalue()
+
+
+class ColumnCodecTestCase(TestCase):
+    def test_small_values_are_not_compressed(self):
+        codec = ColumnCodec(threshold=128)
+
+        data = codec.encode(10)
+
+        expect(data).to_equal(JSON + '10')
+        expect(codec.decode(data)).to_equal(10)
+
+    def test_big_values_are_deflated(self):
+        codec = ColumnCodec(threshold=128)
+        value = ['http://globo.com/%d' % i for i in range(100)]
+
+        data = codec.encode(value)
+
+        expect(data[:1]).to_equal(JSON_DEFLATED)
+        expect(len(data)).to_be_lesser_than(len(dumps(value)))
+        expect(codec.decode(data)).to_equal(value)
+
+    def test_can_use_msgpack(self):
+        codec = ColumnCodec(serializer='msgpack', threshold=0)
+        value = {'url': u'http://globo.com/ação', 'size': 10}
+
+        data = codec.encode(value)
+
+        expect(data[:1]).to_equal(MSGPACK_DEFLATED)
+        expect(codec.decode(data)).to_equal(value)
+
+    def test_msgpack_encodes_dates_as_epoch_like_json(self):
+        value = {'page.last_modified': datetime(2014, 2, 3, 4, 5, 6), 'urls': set(['a'])}
+
+        msgpack_codec = ColumnCodec(serializer='msgpack', threshold=0)
+        json_codec = ColumnCodec(threshold=0)
+
+        decoded = msgpack_codec.decode(msgpack_codec.encode(value))
+
+        expect(decoded).to_equal({'page.last_modified': 1391400306, 'urls': ['a']})
+        expect(decoded).to_equal(json_codec.decode(json_codec.encode(value)))
+
+    def test_msgpack_raises_on_values_it_cannot_encode(self):
+        codec = ColumnCodec(serializer='msgpack')
+
+        try:
+            codec.encode({'value': object()})
+        except TypeError, err:
+            expect(str(err)).to_include('Cannot serialize')
+        else:
+            assert False, 'Should not have gotten this far'
+
+    def test_can_decode_legacy_gzipped_values(self):
+        codec = ColumnCodec()
+        data = gzipped({'some': 'value'})
+
+        expect(codec.is_legacy(data)).to_be_true()
+        expect(codec.is_current(data)).to_be_false()
+        expect(codec.decode(data)).to_equal({'some': 'value'})
+
+    def test_unknown_version_raises(self):
+        codec = ColumnCodec()
+
+        try:
+            codec.decode('\x09whatever')
+        except ValueError, err:
+            expect(str(err)).to_include('Unknown column codec version')
+        else:
+            assert False, 'Should not have gotten this far'
+
+    def test_unknown_serializer_raises(self):
+        try:
+            ColumnCodec(serializer='pickle')
+        except ValueError, err:
+            expect(str(err)).to_equal('Unknown column serializer: pickle')
+        else:
+            assert False, 'Should not have gotten this far'
+
+    def test_can_create_from_config(self):
+        codec = ColumnCodec.from_config(Config(
+            COLUMN_CODEC_SERIALIZER='msgpack',
+            COLUMN_CODEC_COMPRESSION_THRESHOLD=10,
+            COLUMN_CODEC_COMPRESSION_LEVEL=9
+        ))
+
+        expect(codec.serializer).to_equal('msgpack')
+        expect(codec.threshold).to_equal(10)
+        expect(codec.level).to_equal(9)
@@ -0,0 +1,45 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import lxml.html
+from preggy import expect
+
+from holmes.document import Document
+from tests.unit.base import FacterTestCase
+
+
+class DocumentTestCase(FacterTestCase):
+    def get_html(self):
+        return lxml.html.fromstring(self.get_file('globo.html'))
+
+    def test_matches_selectors(self):
+        html = self.get_html()
+        document = Document(html)
+
+        selectors = (
+            ('heads', 'head'),
+            ('bodies', 'body'),
+            ('titles', 'title'),
+            ('metas', 'meta'),
+            ('links', ':not(script) a[href]'),
+            ('images', ':not(script) img[src]'),
+            ('all_images', 'img[src]'),
+            ('stylesheets', 'link[href]'),
+            ('scripts', 'script'),
+            ('js_scripts', 'script[src]'),
+            ('headings', 'body h1,h2,h3,h4,h5,h6'),
+        )
+
+        for attribute, selector in selectors:
+            expect(getattr(document, attribute)).to_equal(html.cssselect(selector))
+
+    def test_h1_must_be_in_body(self):
+        html = lxml.html.fromstring('<div><h1>title</h1><h2>subtitle</h2></div>')
+        document = Document(html)
+
+        expect([element.text for element in document.headings]).to_equal(['subtitle'])
+
+    def test_empty_document(self):
+        document = Document(None)
+
+        expect(document.links).to_equal([])
@@ -71,6 +71,13 @@ class TestEventBus(ApiTestCase):
 
         expect(bus.publish_items).to_include(('events', 'message'))
 
+    def test_can_publish_to_other_channels(self):
+        redis, app, bus = self.get_bus()
+
+        bus.publish('message', 'channel')
+
+        expect(bus.publish_items).to_include(('channel', 'message'))
+
     def test_can_flush(self):
         redis, app, bus = self.get_bus()
 
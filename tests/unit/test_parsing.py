@@ -0,0 +1,187 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from gzip import GzipFile
+from cStringIO import StringIO
+
+from mock import Mock
+from preggy import expect
+from tornado.ioloop import IOLoop
+
+from holmes.config import Config
+from holmes.parsing import (
+    ParseExecutor, parse_html, parse_sitemap, safe_parse, is_url_encoded, MAX_NOT_ENCODED_URLS_SAMPLE
+)
+from tests.unit.base import FacterTestCase
+
+
+def gzip(text):
+    data = StringIO()
+
+    with GzipFile(mode='w', fileobj=data) as gzipped:
+        gzipped.write(text)
+
+    return data.getvalue()
+
+
+def fail_to_parse(text):
+    raise ValueError('Could not parse %s' % text)
+
+
+class ParsingTestCase(FacterTestCase):
+    def test_parse_html(self):
+        html = parse_html('<html><body><a href="/">home</a></body></html>')
+
+        expect(html.cssselect('a')[0].text).to_equal('home')
+
+    def test_parse_html_returns_none_for_empty_documents(self):
+        expect(parse_html('')).to_be_null()
+
+    def test_parse_sitemap_index(self):
+        sitemap = parse_sitemap(self.get_file('index_sitemap.xml'))
+
+        expect(sitemap['sitemaps']).to_equal(['http://domain.com/1.xml', 'http://domain.com/2.xml'])
+        expect(sitemap['urls']).to_be_empty()
+        expect(sitemap['urls_count']).to_equal(0)
+        expect(sitemap['size']).to_equal(267)
+        expect(sitemap['gzipped_size']).to_equal(150)
+        expect(sitemap['empty']).to_be_false()
+
+    def test_parse_sitemap_urls(self):
+        sitemap = parse_sitemap(self.get_file('url_sitemap.xml'))
+
+        expect(sitemap['sitemaps']).to_be_empty()
+        expect(sitemap['urls']).to_equal([('http://domain.com/1.html', 0.5), ('http://domain.com/2.html', 0.5)])
+        expect(sitemap['urls_count']).to_equal(2)
+        expect(sitemap['not_encoded_count']).to_equal(0)
+
+    def test_parse_sitemap_priorities(self):
+        sitemap = parse_sitemap(
+            '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            '<url><loc>http://g1.globo.com/1.html</loc><priority>0.8</priority></url>'
+            '<url><priority>1.0</priority><loc>http://g1.globo.com/2.html</loc></url>'
+            '<url><loc>http://g1.globo.com/3.html</loc><priority>high</priority></url>'
+            '<url><loc>http://g1.globo.com/4.html</loc><priority>10</priority></url>'
+            '</urlset>'
+        )
+
+        expect(sitemap['urls']).to_equal([
+            ('http://g1.globo.com/1.html', 0.8),
+            ('http://g1.globo.com/2.html', 1.0),
+            ('http://g1.globo.com/3.html', 0.5),
+            ('http://g1.globo.com/4.html', 1.0),
+        ])
+
+    def test_parse_gzipped_sitemap(self):
+        sitemap = parse_sitemap(self.get_file('index_sitemap.xml.gz'))
+
+        expect(sitemap['sitemaps']).to_equal(['http://domain.com/1.xml', 'http://domain.com/2.xml'])
+        expect(sitemap['size']).to_equal(267)
+        expect(sitemap['gzipped_size']).to_equal(150)
+
+    def test_parse_empty_sitemap(self):
+        sitemap = parse_sitemap(gzip('  \n'))
+
+        expect(sitemap['empty']).to_be_true()
+        expect(sitemap['urls_count']).to_equal(0)
+
+    def test_parse_truncated_gzipped_sitemap(self):
+        body = gzip(self.get_file('url_sitemap.xml'))
+
+        sitemap = parse_sitemap(body[:-12])
+
+        expect(sitemap['urls_count']).to_be_lesser_or_equal_to(2)
+        expect(sitemap['size']).to_be_greater_than(0)
+        expect(sitemap['gzipped_size']).to_be_greater_than(0)
+
+    def test_parse_corrupt_gzipped_sitemap(self):
+        sitemap = parse_sitemap('\x1f\x8b' + 'corrupt' * 10)
+
+        expect(sitemap['urls']).to_be_empty()
+        expect(sitemap['urls_count']).to_equal(0)
+        expect(sitemap['size']).to_equal(0)
+        expect(sitemap['empty']).to_be_true()
+
+    def test_parse_sitemap_counts_urls_not_encoded(self):
+        urls = [
+            'http://g1.globo.com/',
+            'http://g1.globo.com/1.html',
+            'http://g1.globo.com/%C3%BCmlat.php&amp;amp;q=name',
+            'http://g1.globo.com/%C3%BCmlat.php&amp;q=name',
+            'http://g1.globo.com/ümlat.php',
+        ] + ['http://g1.globo.com/%d.php?a=1&amp;b=2' % index for index in range(MAX_NOT_ENCODED_URLS_SAMPLE)]
+
+        sitemap = parse_sitemap(
+            '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">%s</urlset>' %
+            ''.join('<url><loc>%s</loc></url>' % url for url in urls)
+        )
+
+        expect(sitemap['urls_count']).to_equal(len(urls))
+        expect(sitemap['not_encoded_count']).to_equal(2 + MAX_NOT_ENCODED_URLS_SAMPLE)
+        expect(sitemap['not_encoded_sample']).to_length(MAX_NOT_ENCODED_URLS_SAMPLE)
+        expect(sitemap['not_encoded_sample'][0]).to_equal('http://g1.globo.com/%C3%BCmlat.php&q=name')
+
+    def test_is_url_encoded(self):
+        expect(is_url_encoded('/1.html')).to_be_true()
+        expect(is_url_encoded('/%C3%BCmlat.php&amp;q=name')).to_be_true()
+        expect(is_url_encoded('/%C3%BCmlat.php&q=name')).to_be_false()
+        expect(is_url_encoded(u'/ümlat.php')).to_be_false()
+
+
+class ParseExecutorTestCase(FacterTestCase):
+    def test_is_disabled_by_default(self):
+        expect(ParseExecutor.from_config(Config(), IOLoop())).to_be_null()
+
+    def test_parses_small_documents_right_away(self):
+        executor = ParseExecutor(IOLoop(), workers=1, min_size=1024)
+        callback = Mock()
+
+        executor.submit(parse_sitemap, self.get_file('url_sitemap.xml'), callback)
+
+        expect(executor.pending).to_equal(0)
+        expect(callback.call_args[0][0]['urls']).to_length(2)
+
+    def test_parses_big_documents_in_a_process(self):
+        executor = ParseExecutor(IOLoop(), workers=1)
+        callback = Mock()
+
+        executor.submit(parse_sitemap, self.get_file('url_sitemap.xml'), callback)
+
+        expect(executor.pending).to_equal(1)
+        expect(callback.called).to_be_false()
+
+        executor.wait()
+
+        expect(executor.pending).to_equal(0)
+        expect(callback.call_args[0][0]['urls']).to_length(2)
+
+    def test_parses_html_in_a_thread(self):
+        executor = ParseExecutor(IOLoop(), workers=1)
+        callback = Mock()
+
+        executor.submit(parse_html, '<html><title>holmes</title></html>', callback, in_process=False)
+        executor.wait()
+
+        expect(callback.call_args[0][0].cssselect('title')[0].text).to_equal('holmes')
+
+    def test_calls_back_with_none_when_parsing_fails(self):
+        executor = ParseExecutor(IOLoop(), workers=1)
+        callback = Mock()
+
+        executor.submit(fail_to_parse, 'document', callback)
+        executor.wait()
+
+        expect(executor.pending).to_equal(0)
+        callback.assert_called_once_with(None)
+
+    def test_calls_back_with_none_when_parsing_small_documents_fails(self):
+        executor = ParseExecutor(IOLoop(), workers=1, min_size=1024)
+        callback = Mock()
+
+        executor.submit(fail_to_parse, 'document', callback)
+
+        callback.assert_called_once_with(None)
+
+    def test_safe_parse(self):
+        expect(safe_parse(len, 'document')).to_equal(8)
+        expect(safe_parse(fail_to_parse, 'document')).to_be_null()
@@ -0,0 +1,119 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from os.path import abspath, dirname, join
+from datetime import datetime
+
+from preggy import expect
+from mock import Mock
+
+from holmes.persister import ReviewPersister
+from holmes.reviewer import ReviewDAO, dump_review_data, load_review_data
+from holmes.models import Page
+from tests.unit.base import ApiTestCase
+from tests.fixtures import PageFactory
+
+
+class PersisterTestCase(ApiTestCase):
+    root_path = abspath(join(dirname(__file__), '..', '..'))
+
+    def get_persister(self):
+        persister = ReviewPersister(['-c', join(self.root_path, 'tests/unit/test_worker.conf')])
+        persister.initialize()
+        persister.search_provider = Mock()
+        persister.redis.delete(
+            'review-persistence-queue', 'review-persistence-dead-letter',
+            'review-persistence-failures', 'review-persistence-processors',
+            'review-persistence-processing-%s' % persister.uuid
+        )
+        return persister
+
+    def test_review_data_survives_the_queue(self):
+        dao = ReviewDAO('some-uuid', 'http://www.globo.com', expires=datetime(2014, 2, 3, 4, 5, 6))
+        dao.add_fact('page.title', set(['a']))
+        dao.add_violation('page.title.size', {'urls': set(['b'])}, 10)
+        dao.requests.append(('http://www.globo.com', Mock(
+            status_code=200, effective_url='http://www.globo.com/', request_time=0.1
+        )))
+
+        data = load_review_data(dump_review_data(dao.to_dict()))
+
+        expect(data['page_uuid']).to_equal('some-uuid')
+        expect(data['expires']).to_equal(datetime(2014, 2, 3, 4, 5, 6))
+        expect(data['lastModified']).to_be_null()
+        expect(data['facts']).to_equal([{'key': 'page.title', 'value': ['a']}])
+        expect(data['violations'][0]['value']).to_equal({'urls': ['b']})
+
+        url, response = data['requests'][0]
+        expect(url).to_equal('http://www.globo.com')
+        expect(response.status_code).to_equal(200)
+        expect(response.effective_url).to_equal('http://www.globo.com/')
+
+    def test_do_work_saves_queued_reviews_in_one_batch(self):
+        persister = self.get_persister()
+
+        page = PageFactory.create()
+        self.db.commit()
+
+        dao = ReviewDAO(page.uuid, page.url)
+        dao.add_fact('page.title', 'some title')
+        persister.cache.push_review_to_persist(dump_review_data(dao.to_dict()))
+
+        persister.do_work()
+
+        self.db.expire_all()
+        page = Page.by_uuid(page.uuid, self.db)
+        expect(page.last_review).not_to_be_null()
+        expect(persister.redis.llen('review-persistence-queue')).to_equal(0)
+        expect(persister.search_provider.index_reviews.call_count).to_equal(1)
+
+    def test_do_work_requeues_reviews_when_saving_fails(self):
+        persister = self.get_persister()
+
+        page = PageFactory.create()
+        self.db.commit()
+
+        dao = ReviewDAO(page.uuid, page.url)
+        dao.add_fact('page.title', 'some title')
+        persister.cache.push_review_to_persist(dump_review_data(dao.to_dict()))
+
+        # lacks every other field of a review, so saving it fails
+        persister.cache.push_review_to_persist('{"page_uuid": "a"}')
+
+        persister.do_work()
+
+        self.db.expire_all()
+        page = Page.by_uuid(page.uuid, self.db)
+        expect(page.last_review).not_to_be_null()
+
+        expect(persister.redis.lrange('review-persistence-queue', 0, -1)).to_equal(['{"page_uuid": "a"}'])
+        expect(persister.redis.llen('review-persistence-processing-%s' % persister.uuid)).to_equal(0)
+        expect(persister.redis.hvals('review-persistence-failures')).to_equal(['1'])
+
+    def test_do_work_gives_up_on_reviews_that_keep_failing(self):
+        persister = self.get_persister()
+        persister.config.REVIEW_PERSISTENCE_MAX_ATTEMPTS = 2
+
+        persister.cache.push_review_to_persist('{"page_uuid": "a"}')
+
+        persister.do_work()
+        expect(persister.redis.llen('review-persistence-queue')).to_equal(1)
+
+        persister.do_work()
+        expect(persister.redis.llen('review-persistence-queue')).to_equal(0)
+        expect(persister.redis.lrange('review-persistence-dead-letter', 0, -1)).to_equal(['{"page_uuid": "a"}'])
+        expect(persister.redis.hlen('review-persistence-failures')).to_equal(0)
+
+    def test_do_work_recovers_reviews_claimed_by_persisters_that_are_gone(self):
+        persister = self.get_persister()
+        persister.redis.delete('review-persistence-processing-gone')
+
+        persister.cache.push_review_to_persist('{"page_uuid": "a"}')
+        expect(persister.cache.claim_reviews_to_persist('gone', 10, 60)).to_equal(['{"page_uuid": "a"}'])
+        expect(persister.redis.llen('review-persistence-queue')).to_equal(0)
+
+        persister.redis.delete('review-persister-gone')
+
+        expect(persister.cache.recover_reviews_to_persist()).to_equal(1)
+        expect(persister.redis.lrange('review-persistence-queue', 0, -1)).to_equal(['{"page_uuid": "a"}'])
+        expect(persister.redis.sismember('review-persistence-processors', 'gone')).to_be_false()
@@ -0,0 +1,130 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from os.path import abspath, dirname, join
+from datetime import datetime, date, timedelta
+
+from mock import Mock
+from preggy import expect
+from ujson import loads
+
+from holmes.retention import RetentionWorker
+from holmes.models import Review, Violation, Fact, Key, Page, Request
+from tests.unit.base import ApiTestCase
+from tests.fixtures import PageFactory, ReviewFactory, RequestFactory
+
+
+class RetentionWorkerTestCase(ApiTestCase):
+    root_path = abspath(join(dirname(__file__), '..', '..'))
+
+    def test_prune_reviews_walks_every_batch(self):
+        self.db.query(Violation).delete()
+        self.db.query(Fact).delete()
+        self.db.query(Key).delete()
+        self.db.query(Review).delete()
+        self.db.query(Page).delete()
+
+        page = PageFactory.create()
+        ReviewFactory.create(page=page, is_active=True, completed_date=datetime(2013, 12, 11))
+
+        for x in range(6):
+            ReviewFactory.create(
+                page=page,
+                is_active=False,
+                completed_date=datetime(2013, 12, 11, 10, 10, x),
+                number_of_facts=1
+            )
+
+        self.db.commit()
+
+        worker = RetentionWorker(['-c', join(self.root_path, 'tests/unit/test_worker.conf')])
+        worker.initialize()
+        worker.db = self.db
+        worker.cache.set_review_retention_cursor(None)
+        worker.config.NUMBER_OF_REVIEWS_TO_KEEP = 2
+        worker.config.REVIEW_RETENTION_BATCH_SIZE = 3
+
+        totals = worker.prune_reviews()
+
+        expect(totals['batches']).to_equal(3)
+        expect(totals['reviews']).to_equal(4)
+        expect(totals['facts']).to_equal(4)
+        expect(self.db.query(Review).count()).to_equal(3)
+        expect(worker.cache.get_review_retention_cursor()).to_be_null()
+
+    def test_prune_reviews_resumes_where_the_last_run_stopped(self):
+        self.db.query(Violation).delete()
+        self.db.query(Fact).delete()
+        self.db.query(Key).delete()
+        self.db.query(Review).delete()
+        self.db.query(Page).delete()
+
+        page = PageFactory.create()
+        reviews = [
+            ReviewFactory.create(page=page, is_active=False, completed_date=datetime(2013, 12, 11, 10, 10, x))
+            for x in range(7)
+        ]
+
+        self.db.commit()
+
+        worker = RetentionWorker(['-c', join(self.root_path, 'tests/unit/test_worker.conf')])
+        worker.initialize()
+        worker.db = self.db
+        worker.cache.set_review_retention_cursor(None)
+        worker.config.NUMBER_OF_REVIEWS_TO_KEEP = 2
+        worker.config.REVIEW_RETENTION_BATCH_SIZE = 3
+        worker.config.REVIEW_RETENTION_BATCHES_PER_RUN = 2
+
+        totals = worker.prune_reviews()
+
+        expect(totals['batches']).to_equal(2)
+        expect(worker.cache.get_review_retention_cursor()).to_equal(reviews[0].id + 6)
+
+        totals = worker.prune_reviews()
+
+        expect(totals['batches']).to_equal(1)
+        expect(worker.cache.get_review_retention_cursor()).to_be_null()
+        expect(self.db.query(Review).count()).to_equal(2)
+
+    def test_do_work_publishes_the_pruned_counts(self):
+        worker = RetentionWorker(['-c', join(self.root_path, 'tests/unit/test_worker.conf')])
+        worker.initialize()
+        worker.prune_reviews = Mock(return_value={'batches': 1, 'reviews': 4, 'facts': 3, 'violations': 2})
+        worker.prune_requests = Mock(return_value={'batches': 1, 'requests': 5})
+        worker.redis_pub_sub = Mock()
+
+        worker.do_work()
+
+        channel, data = worker.redis_pub_sub.publish.call_args[0]
+        event = loads(data)
+
+        expect(channel).to_equal('events')
+        expect(event['type']).to_equal('retention-status')
+        expect(event['reviews']).to_equal(4)
+        expect(event['facts']).to_equal(3)
+        expect(event['violations']).to_equal(2)
+        expect(event['requests']).to_equal(5)
+
+    def test_prune_requests_walks_every_batch(self):
+        self.db.query(Request).delete()
+
+        for i in range(5):
+            RequestFactory.create(
+                url='http://m.com/page-%d' % i,
+                domain_name='m.com',
+                completed_date=date.today() - timedelta(days=i * 10)
+            )
+
+        self.db.commit()
+
+        worker = RetentionWorker(['-c', join(self.root_path, 'tests/unit/test_worker.conf')])
+        worker.initialize()
+        worker.db = self.db
+        worker.config.DAYS_TO_KEEP_REQUESTS = 15
+        worker.config.REQUEST_RETENTION_BATCH_SIZE = 1
+
+        totals = worker.prune_requests()
+
+        expect(totals['requests']).to_equal(3)
+        expect(totals['batches']).to_equal(3)
+        expect(self.db.query(Request).count()).to_equal(2)
@@ -2,7 +2,9 @@
 # -*- coding: utf-8 -*-
 
 import sys
+import hashlib
 from uuid import uuid4
+from datetime import datetime
 
 import requests
 from preggy import expect
@@ -11,10 +13,11 @@ from mock import patch, Mock, call
 from holmes.reviewer import Reviewer, ReviewDAO
 from holmes.models import Page, Domain, Key, DomainsViolationsPrefs
 from holmes.config import Config
+from holmes.facters import Facter
 from holmes.validators.base import Validator
 from tests.unit.base import ApiTestCase
 from tests.fixtures import (
-    DomainFactory, PageFactory, DomainsViolationsPrefsFactory
+    DomainFactory, PageFactory, ReviewFactory, DomainsViolationsPrefsFactory
 )
 
 
@@ -163,6 +166,319 @@ class TestReview(ApiTestCase):
         reviewer.load_content(mock_callback)
         get_mock.assert_called_once_with(page_url, mock_callback)
 
+    @patch.object(Reviewer, '_async_get')
+    def test_load_content_sends_conditional_headers(self, get_mock):
+        domain = DomainFactory.create()
+        page = PageFactory.create(
+            domain=domain,
+            last_modified=datetime(2014, 2, 3, 4, 5, 6),
+            etag='"some-etag"'
+        )
+        review = ReviewFactory.create(page=page, is_active=True, is_complete=True)
+        page.last_review = review
+        self.db.flush()
+
+        reviewer = self.get_reviewer(page_uuid=page.uuid, page_url=page.url, db=self.db)
+
+        mock_callback = Mock()
+
+        reviewer.load_content(mock_callback)
+        get_mock.assert_called_once_with(page.url, mock_callback, headers={
+            'If-Modified-Since': 'Mon, 03 Feb 2014 04:05:06 GMT',
+            'If-None-Match': '"some-etag"'
+        })
+
+    def test_content_loaded_saves_unchanged_review_when_not_modified(self):
+        reviewer = self.get_reviewer(page_url='http://www.google.com')
+        reviewer.save_unchanged_review = Mock()
+        reviewer.run_facters = Mock()
+
+        response = Mock(
+            status_code=304,
+            text='',
+            headers={'Etag': '"other-etag"', 'Expires': 'Mon, 03 Feb 2014 04:05:06 GMT'}
+        )
+        reviewer.content_loaded('http://www.google.com', response)
+
+        expect(reviewer.run_facters.called).to_be_false()
+        expect(reviewer.save_unchanged_review.called).to_be_true()
+        expect(reviewer.review_dao.etag).to_equal('"other-etag"')
+        expect(reviewer.review_dao.expires).to_equal(datetime(2014, 2, 3, 4, 5, 6))
+
+    def test_content_loaded_skips_review_when_content_hash_matches(self):
+        content = '<html><head></head><body>same</body></html>'
+
+        page = PageFactory.create()
+        review = ReviewFactory.create(
+            page=page,
+            is_active=True,
+            is_complete=True,
+            content_hash=hashlib.sha512(content).hexdigest()
+        )
+        page.last_review = review
+        self.db.flush()
+
+        reviewer = self.get_reviewer(page_uuid=page.uuid, page_url=page.url, db=self.db)
+        reviewer.save_unchanged_review = Mock()
+        reviewer.run_facters = Mock()
+
+        response = Mock(status_code=200, text=content, headers={})
+        reviewer.content_loaded(page.url, response)
+
+        expect(reviewer.run_facters.called).to_be_false()
+        expect(reviewer.save_unchanged_review.called).to_be_true()
+
+        reviewer = self.get_reviewer(page_uuid=page.uuid, page_url=page.url, db=self.db)
+        reviewer.save_unchanged_review = Mock()
+        reviewer.run_facters = Mock()
+        reviewer._wait_for_async_requests = Mock()
+        reviewer.run_validators = Mock()
+        reviewer.save_review = Mock()
+
+        response = Mock(status_code=200, text='<html>changed</html>', headers={})
+        reviewer.content_loaded(page.url, response)
+
+        expect(reviewer.run_facters.called).to_be_true()
+        expect(reviewer.save_unchanged_review.called).to_be_false()
+        expect(reviewer.review_dao.content_hash).to_equal(
+            hashlib.sha512('<html>changed</html>').hexdigest()
+        )
+
+    def test_content_loaded_runs_facters_once_the_page_is_parsed(self):
+        reviewer = self.get_reviewer()
+        reviewer.parse_executor = Mock()
+        reviewer.run_facters = Mock()
+        reviewer.wait_for_async_requests = Mock()
+
+        response = Mock(status_code=200, text='<html><title>holmes</title></html>', headers={})
+        reviewer.content_loaded('http://page.url', response)
+
+        expect(reviewer.run_facters.called).to_be_false()
+        expect(reviewer.pending_requests).to_equal(1)
+
+        parse_func, text, callback, in_process = reviewer.parse_executor.submit.call_args[0]
+        expect(in_process).to_be_false()
+
+        callback(parse_func(text))
+
+        expect(reviewer.pending_requests).to_equal(0)
+        expect(reviewer.current.document.titles).to_length(1)
+        expect(reviewer.run_facters.called).to_be_true()
+
+    def test_parse_calls_back_with_none_when_parsing_fails(self):
+        reviewer = self.get_reviewer()
+        callback = Mock()
+
+        def parse_func(text):
+            raise ValueError(text)
+
+        reviewer.parse(parse_func, 'document', callback)
+
+        callback.assert_called_once_with(None)
+        expect(reviewer.pending_requests).to_equal(0)
+
+    def test_run_facters_requests_critical_and_same_domain_urls_first(self):
+        requested = []
+
+        class MockFacter(Facter):
+            def get_facts(self):
+                self.async_get('http://other.com/link.html', Mock())
+                self.async_get('http://www.google.com/link.html', Mock())
+                self.async_get('http://other.com/style.css', Mock())
+
+        reviewer = self.get_reviewer(page_url='http://www.google.com')
+        reviewer.facters = [MockFacter]
+        reviewer.async_get_func = lambda url, handler, method='GET', **kw: requested.append(url)
+
+        reviewer.run_facters()
+
+        expect(requested).to_equal([
+            'http://other.com/style.css',
+            'http://www.google.com/link.html',
+            'http://other.com/link.html',
+        ])
+
+    def test_requests_over_budget_are_skipped_and_review_is_truncated(self):
+        requested = []
+
+        config = Config()
+        config.MAX_REQUESTS_PER_REVIEW = 2
+
+        reviewer = self.get_reviewer(page_url='http://www.google.com', config=config)
+        reviewer.async_get_func = lambda url, handler, method='GET', **kw: requested.append(url)
+
+        reviewer._async_get('http://www.google.com', Mock())
+        for index in range(4):
+            reviewer._async_get('http://www.google.com/%d.html' % index, Mock())
+
+        expect(requested).to_length(3)
+        expect(reviewer.skipped_requests).to_equal(2)
+        expect(reviewer.review_dao.facts['review.truncated']['value']).to_equal(2)
+        expect(Reviewer.get_fact_definitions()).to_include('review.truncated')
+
+    def test_requests_in_flight_are_bounded_and_refilled_as_responses_arrive(self):
+        pending = []
+
+        config = Config()
+        config.MAX_REQUESTS_IN_FLIGHT_PER_REVIEW = 2
+
+        reviewer = self.get_reviewer(page_url='http://www.google.com', config=config)
+        reviewer.async_get_func = lambda url, handler, method='GET', **kw: pending.append((url, handler))
+
+        reviewer.buffer_requests()
+        for index in range(4):
+            reviewer._async_get('http://www.google.com/%d.html' % index, Mock())
+        reviewer.flush_requests()
+
+        expect([url for url, handler in pending]).to_equal([
+            'http://www.google.com/0.html',
+            'http://www.google.com/1.html',
+        ])
+
+        url, handler = pending[0]
+        handler(url, Mock(status_code=200, text='body', from_cache=True))
+
+        expect(pending).to_length(3)
+        expect(pending[2][0]).to_equal('http://www.google.com/2.html')
+        expect(reviewer.requests_in_flight).to_equal(2)
+
+    def test_queued_requests_are_skipped_once_a_response_exceeds_the_bytes_budget(self):
+        pending = []
+
+        config = Config()
+        config.MAX_REQUESTS_IN_FLIGHT_PER_REVIEW = 1
+        config.MAX_BYTES_PER_REVIEW = 10
+
+        reviewer = self.get_reviewer(page_url='http://www.google.com', config=config)
+        reviewer.async_get_func = lambda url, handler, method='GET', **kw: pending.append((url, handler))
+
+        for index in range(3):
+            reviewer._async_get('http://www.google.com/%d.html' % index, Mock())
+
+        expect(pending).to_length(1)
+
+        url, handler = pending[0]
+        handler(url, Mock(status_code=200, text='a' * 20, from_cache=True))
+
+        expect(pending).to_length(1)
+        expect(reviewer.skipped_requests).to_equal(2)
+        expect(reviewer.pending_requests).to_equal(0)
+
+    def test_streamed_bodies_are_counted_against_the_bytes_budget(self):
+        pending = []
+
+        config = Config()
+        config.MAX_REQUESTS_IN_FLIGHT_PER_REVIEW = 1
+        config.MAX_BYTES_PER_REVIEW = 10
+
+        reviewer = self.get_reviewer(page_url='http://www.google.com', config=config)
+        reviewer.async_get_func = lambda url, handler, method='GET', **kw: pending.append((url, handler, kw))
+
+        counter = Mock()
+        reviewer._async_get('http://www.google.com/0.js', Mock(), streaming_callback=counter)
+        reviewer._async_get('http://www.google.com/1.js', Mock())
+
+        url, handler, kw = pending[0]
+        kw['streaming_callback']('a' * 8)
+        kw['streaming_callback']('a' * 8)
+
+        counter.assert_called_with('a' * 8)
+
+        # chunked responses have neither a body nor a content length
+        handler(url, Mock(status_code=200, text='', headers={}, from_cache=False))
+
+        expect(reviewer.sub_request_bytes).to_equal(16)
+        expect(reviewer.skipped_requests).to_equal(1)
+        expect(pending).to_length(1)
+
+    def test_validators_run_when_the_facts_they_consume_are_ready(self):
+        pending = []
+        validated = []
+
+        class CSSFacter(Facter):
+            produces = ('page.css',)
+
+            def get_facts(self):
+                self.async_get('http://www.google.com/style.css', Mock())
+
+        class JSFacter(Facter):
+            produces = ('page.js',)
+
+            def get_facts(self):
+                self.async_get('http://www.google.com/script.js', Mock())
+
+        class CSSValidator(Validator):
+            consumes = ('page.css',)
+
+            def validate(self):
+                validated.append('css')
+
+        class JSValidator(Validator):
+            consumes = ('page.js',)
+
+            def validate(self):
+                validated.append('js')
+
+        class UndeclaredValidator(Validator):
+            def validate(self):
+                validated.append('undeclared')
+
+        reviewer = self.get_reviewer(
+            page_url='http://www.google.com',
+            validators=[CSSValidator, JSValidator, UndeclaredValidator]
+        )
+        reviewer.facters = [CSSFacter, JSFacter]
+        reviewer.async_get_func = lambda url, handler, method='GET', **kw: pending.append((url, handler))
+
+        reviewer.run_facters()
+
+        expect(validated).to_be_empty()
+
+        url, handler = [item for item in pending if item[0].endswith('.js')][0]
+        handler(url, Mock(status_code=200, text='', from_cache=True))
+
+        expect(validated).to_equal(['js'])
+
+        url, handler = [item for item in pending if item[0].endswith('.css')][0]
+        handler(url, Mock(status_code=200, text='', from_cache=True))
+
+        expect(validated).to_equal(['js', 'css'])
+
+        reviewer.run_validators()
+
+        expect(validated).to_equal(['js', 'css', 'undeclared'])
+
+    def test_validators_wait_for_facters_without_declared_facts(self):
+        pending = []
+        validated = []
+
+        class UndeclaredFacter(Facter):
+            def get_facts(self):
+                self.async_get('http://www.google.com/style.css', Mock())
+
+        class CSSValidator(Validator):
+            consumes = ('page.css',)
+
+            def validate(self):
+                validated.append('css')
+
+        reviewer = self.get_reviewer(page_url='http://www.google.com', validators=[CSSValidator])
+        reviewer.facters = [UndeclaredFacter]
+        reviewer.async_get_func = lambda url, handler, method='GET', **kw: pending.append((url, handler))
+
+        reviewer.run_facters()
+
+        expect(validated).to_be_empty()
+
+        url, handler = pending.pop(0)
+        handler(url, Mock(status_code=200, text='', from_cache=True))
+
+        expect(validated).to_equal(['css'])
+
+        reviewer.run_validators()
+
+        expect(validated).to_equal(['css'])
+
     def test_review_calls_validators(self):
         test_class = {}
 
@@ -192,6 +508,95 @@ class TestReview(ApiTestCase):
         reviewer._wait_for_async_requests.assert_called_once_with(1)
         expect(test_class['has_validated']).to_be_true()
 
+    def test_start_review_runs_phases_as_requests_finish(self):
+        pending = []
+
+        def async_get(url, handler, method='GET', **kw):
+            pending.append((url, handler))
+
+        reviewer = self.get_reviewer(page_url='http://www.google.com')
+        reviewer.async_get_func = async_get
+        reviewer._wait_for_async_requests = Mock()
+        reviewer.run_facters = Mock(side_effect=lambda: reviewer._async_get('http://www.google.com/a.css', Mock()))
+        reviewer.run_validators = Mock()
+        reviewer.save_review = Mock()
+
+        callback = Mock()
+        reviewer.start_review(callback)
+
+        expect(reviewer.pending_requests).to_equal(1)
+        expect(callback.called).to_be_false()
+
+        url, handler = pending.pop(0)
+        handler(url, Mock(status_code=200, text='<html></html>', headers={}, from_cache=True))
+
+        expect(reviewer.run_facters.called).to_be_true()
+        expect(reviewer.run_validators.called).to_be_false()
+        expect(reviewer.pending_requests).to_equal(1)
+
+        url, handler = pending.pop(0)
+        handler(url, Mock(status_code=200, text='', from_cache=True))
+
+        expect(reviewer.run_validators.called).to_be_true()
+        expect(reviewer.save_review.called).to_be_true()
+        callback.assert_called_once_with(reviewer)
+        expect(reviewer._wait_for_async_requests.called).to_be_false()
+
+    def test_start_review_calls_back_when_content_fails(self):
+        pending = []
+
+        def async_get(url, handler, method='GET', **kw):
+            pending.append((url, handler))
+
+        reviewer = self.get_reviewer(page_url='http://www.google.com')
+        reviewer.async_get_func = async_get
+        reviewer.save_review = Mock()
+
+        callback = Mock()
+        reviewer.start_review(callback)
+
+        url, handler = pending.pop(0)
+        handler(url, Mock(status_code=500, text=None, headers={}, from_cache=True))
+
+        callback.assert_called_once_with(reviewer)
+        expect(reviewer.save_review.called).to_be_false()
+
+    def test_start_review_hands_failures_to_the_error_callback(self):
+        pending = []
+
+        def async_get(url, handler, method='GET', **kw):
+            pending.append((url, handler))
+
+        reviewer = self.get_reviewer(page_url='http://www.google.com')
+        reviewer.async_get_func = async_get
+
+        def run_facters():
+            reviewer._async_get('http://www.google.com/a.css', Mock())
+            raise ValueError('facter failed')
+
+        reviewer.run_facters = Mock(side_effect=run_facters)
+        reviewer.run_validators = Mock()
+
+        callback = Mock()
+        error_callback = Mock()
+        reviewer.start_review(callback, error_callback)
+
+        url, handler = pending.pop(0)
+        handler(url, Mock(status_code=200, text='<html></html>', headers={}, from_cache=True))
+
+        expect(reviewer.failed).to_be_true()
+        expect(error_callback.call_count).to_equal(1)
+        expect(error_callback.call_args[0][0]).to_equal(reviewer)
+        expect(error_callback.call_args[0][1][0]).to_equal(ValueError)
+
+        # responses that arrive after the failure are dropped
+        url, handler = pending.pop(0)
+        handler(url, Mock(status_code=200, text='', from_cache=True))
+
+        expect(reviewer.run_validators.called).to_be_false()
+        expect(callback.called).to_be_false()
+        expect(error_callback.call_count).to_equal(1)
+
     @patch.object(ReviewDAO, 'add_fact')
     def test_reviewer_add_fact(self, fact_dao):
         with patch.object(requests, 'post') as post_mock:
@@ -258,6 +663,27 @@ class TestReview(ApiTestCase):
         enqueue = reviewer.enqueue([])
         expect(enqueue).to_be_null()
 
+    @patch.object(Page, 'add_pages')
+    def test_discover_pages_adds_pages_of_the_domain_in_batches(self, add_pages_mock):
+        add_pages_mock.return_value = 1
+        domain = DomainFactory.create(name='globo.com')
+
+        config = Config()
+        config.SITEMAP_DISCOVERY_BATCH_SIZE = 2
+
+        reviewer = self.get_reviewer(page_url='http://globo.com', config=config, db=self.db)
+        reviewer.discover_pages([
+            ('http://globo.com/1.html', 0.5),
+            ('http://other.com/1.html', 0.5),
+            ('http://www.globo.com/2.html', 0.8),
+            ('http://globo.com/3.html', 0.1),
+        ])
+
+        expect(add_pages_mock.call_args_list).to_equal([
+            call(self.db, domain, [('http://globo.com/1.html', 0.5), ('http://www.globo.com/2.html', 0.8)], None),
+            call(self.db, domain, [('http://globo.com/3.html', 0.1)], None),
+        ])
+
     def test_is_root(self):
         reviewer = self.get_reviewer(page_url="http://g1.globo.com")
         expect(reviewer.is_root()).to_equal(True)
@@ -316,5 +742,6 @@ class TestReview(ApiTestCase):
 
         data = [{'key': 'page.title.size', 'value': '10'}]
         DomainsViolationsPrefs.update_by_domain(self.db, self.sync_cache, domain, data)
+        reviewer.cache.expire_local_domain_violations_prefs(domain.name)
         prefs = reviewer.get_domains_violations_prefs_by_key('page.title.size')
         expect(prefs).to_equal('10')
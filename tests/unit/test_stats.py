@@ -0,0 +1,80 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from unittest import TestCase
+
+from preggy import expect
+
+from holmes.stats import LatencySketch, RequestStats
+
+
+class LatencySketchTestCase(TestCase):
+    def test_empty_sketch_has_no_percentiles(self):
+        sketch = LatencySketch()
+
+        expect(sketch.count).to_equal(0)
+        expect(sketch.percentile(50)).to_be_null()
+
+    def test_percentiles_are_within_relative_accuracy(self):
+        sketch = LatencySketch(relative_accuracy=0.05)
+
+        for value in range(1, 1001):
+            sketch.add(value / 1000.0)
+
+        for percentile, expected in ((50, 0.5), (95, 0.95), (99, 0.99)):
+            value = sketch.percentile(percentile)
+            expect(abs(value - expected) / expected).to_be_lesser_or_equal_to(0.06)
+
+    def test_sub_millisecond_values_share_a_bin(self):
+        sketch = LatencySketch()
+
+        sketch.add(0.0)
+        sketch.add(0.0005)
+
+        expect(sketch.bins).to_equal({0: 2})
+        expect(sketch.percentile(99)).to_equal(0.0)
+
+    def test_can_merge_sketches(self):
+        first = LatencySketch()
+        second = LatencySketch()
+
+        first.add(0.1)
+        second.add(0.1)
+        second.add(2.0)
+
+        first.merge(second)
+
+        expect(first.count).to_equal(3)
+        expect(abs(first.percentile(50) - 0.1) / 0.1).to_be_lesser_or_equal_to(0.05)
+
+
+class RequestStatsTestCase(TestCase):
+    def test_errors_do_not_feed_response_times(self):
+        stats = RequestStats()
+
+        stats.add(200, 0.25)
+        stats.add(304, 0.35)
+        stats.add(404, 5.0)
+
+        result = stats.to_dict()
+
+        expect(result['requestCount']).to_equal(3)
+        expect(result['errorCount']).to_equal(1)
+        expect(result['errorPercentage']).to_equal(33.33)
+        expect(result['averageResponseTime']).to_equal(0.3)
+        expect(result['responseTimeP99']).to_be_lesser_than(0.4)
+
+    def test_can_round_trip_fields(self):
+        stats = RequestStats()
+        stats.add(200, 0.25)
+        stats.add(500, 0.1)
+
+        fields = dict(
+            (name, str(value)) for name, value in stats.to_fields().items()
+        )
+        loaded = RequestStats.from_fields(fields)
+
+        expect(loaded.count).to_equal(2)
+        expect(loaded.error_count).to_equal(1)
+        expect(loaded.response_time_sum).to_equal(0.25)
+        expect(loaded.sketch.bins).to_equal(stats.sketch.bins)
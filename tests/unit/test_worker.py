@@ -1,15 +1,18 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
+import time
 from os.path import abspath, dirname, join
 
 from preggy import expect
+from ujson import dumps
 from mock import patch, Mock, call
 from octopus import TornadoOctopus
 from materialgirl import Materializer
 
 from colorama import Fore, Style
 from holmes.worker import HolmesWorker
+from holmes.event_bus import DOMAINS_VIOLATIONS_PREFS_CHANNEL
 from holmes.config import Config
 from tests.unit.base import ApiTestCase
 from tests.fixtures import (
@@ -66,6 +69,106 @@ class WorkerTestCase(ApiTestCase):
                 help='Whether http requests should be cached by Octopus.'
             ))
 
+        expect(parser_mock.add_argument.call_args_list).to_include(
+            call(
+                '--pipeline',
+                type=int,
+                default=1,
+                help='Number of reviews to keep in flight at the same time on '
+                     'the Octopus instance (1 reviews one page at a time)'
+            ))
+
+    def test_do_work_keeps_many_reviews_in_flight(self):
+        worker = HolmesWorker(['-c', join(self.root_path, 'tests/unit/test_worker.conf'), '--pipeline=2'])
+        worker.initialize()
+
+        jobs = [
+            {'page': '1', 'url': 'http://g1.com'},
+            {'page': '2', 'url': 'http://g2.com'},
+            {'page': '3', 'url': 'http://g3.com'},
+        ]
+        reviewers = [Mock(), Mock(), Mock()]
+
+        worker._load_next_job = Mock(side_effect=jobs + [None])
+        worker._start_job = Mock(return_value=True)
+        worker._get_reviewer = Mock(side_effect=reviewers)
+        worker._complete_job = Mock()
+        worker.otto = Mock()
+
+        def wait(timeout):
+            callback = reviewers[0].start_review.call_args[0][0]
+            callback(reviewers[0])
+
+        worker.otto.wait.side_effect = wait
+
+        worker.do_work()
+
+        expect(reviewers[0].start_review.called).to_be_true()
+        expect(reviewers[1].start_review.called).to_be_true()
+        expect(reviewers[2].start_review.called).to_be_true()
+
+        expect(worker._get_reviewer.call_args_list).to_include(call(jobs[0], pipelined=True))
+        expect(worker._complete_job.call_count).to_equal(1)
+        expect(worker.reviews_in_flight).to_be_empty()
+
+    def test_failed_pipelined_review_is_rolled_back_and_the_pipeline_goes_on(self):
+        worker = HolmesWorker(['-c', join(self.root_path, 'tests/unit/test_worker.conf'), '--pipeline=1'])
+        worker.initialize()
+
+        lock = Mock()
+        jobs = [
+            {'page': '1', 'url': 'http://g1.com', 'lock': lock},
+            {'page': '2', 'url': 'http://g2.com'},
+        ]
+        reviewers = [Mock(), Mock()]
+
+        worker._load_next_job = Mock(side_effect=jobs + [None])
+        worker._start_job = Mock(return_value=True)
+        worker._get_reviewer = Mock(side_effect=reviewers)
+        worker._complete_job = Mock()
+        worker.update_otto_limiter = Mock()
+        worker.error_handlers = [Mock()]
+        worker.db = Mock()
+        worker.otto = Mock()
+
+        exc_info = (ValueError, ValueError('save failed'), None)
+
+        def wait(timeout):
+            error_callback = reviewers[0].start_review.call_args[0][1]
+            error_callback(reviewers[0], exc_info)
+
+            callback = reviewers[1].start_review.call_args[0][0]
+            callback(reviewers[1])
+
+        worker.otto.wait.side_effect = wait
+
+        worker._do_pipelined_work()
+
+        expect(worker.db.rollback.called).to_be_true()
+        lock.release.assert_called_once_with()
+        expect(worker.error_handlers[0].handle_exception.call_args[0]).to_equal(exc_info)
+
+        expect(reviewers[1].start_review.called).to_be_true()
+        worker._complete_job.assert_called_once_with(None)
+        expect(worker.reviews_in_flight).to_be_empty()
+
+    def test_wait_runs_until_pending_parses_are_done(self):
+        worker = HolmesWorker(['-c', join(self.root_path, 'tests/unit/test_worker.conf')])
+        worker.initialize()
+
+        worker.otto = Mock()
+        worker.parse_executor = Mock(pending=1)
+
+        def parse():
+            worker.parse_executor.pending = 0
+
+        worker.parse_executor.wait.side_effect = parse
+
+        worker.wait(0)
+
+        expect(worker.parse_executor.wait.call_count).to_equal(1)
+        expect(worker.otto.wait.call_args_list).to_equal([call(0), call(0)])
+
     def test_description(self):
         worker = HolmesWorker(['-c', join(self.root_path, 'tests/unit/test_worker.conf')])
 
@@ -83,6 +186,37 @@ class WorkerTestCase(ApiTestCase):
 
         expect(worker.get_config_class()).to_equal(Config)
 
+    def test_handle_event_expires_local_domain_violations_prefs(self):
+        worker = HolmesWorker(['-c', join(self.root_path, 'tests/unit/test_worker.conf'), '--concurrency=10'])
+        worker.initialize()
+
+        worker.cache.local_violations_prefs['globo.com'] = (time.time() + 60, {})
+
+        worker.handle_event(dumps({
+            'type': 'domain-violations-prefs-changed',
+            'domain': 'globo.com'
+        }))
+
+        expect(worker.cache.local_violations_prefs).not_to_include('globo.com')
+
+    def test_ioloop_drains_domain_violations_prefs_events(self):
+        worker = HolmesWorker(['-c', join(self.root_path, 'tests/unit/test_worker.conf'), '--concurrency=10'])
+        worker.config.DOMAINS_VIOLATIONS_PREFS_EVENTS_INTERVAL_IN_SECONDS = 0.1
+        worker.initialize()
+
+        worker.cache.local_violations_prefs['globo.com'] = (time.time() + 60, {})
+
+        worker.redis.publish(DOMAINS_VIOLATIONS_PREFS_CHANNEL, dumps({
+            'type': 'domain-violations-prefs-changed',
+            'domain': 'globo.com'
+        }))
+
+        io_loop = worker.otto.ioloop
+        io_loop.add_timeout(time.time() + 0.5, io_loop.stop)
+        io_loop.start()
+
+        expect(worker.cache.local_violations_prefs).not_to_include('globo.com')
+
     def test_load_all_domains_violations_prefs(self):
         worker = HolmesWorker(['-c', join(self.root_path, 'tests/unit/test_worker.conf'), '--concurrency=10'])
 
@@ -50,7 +50,7 @@ class TestImageRequestsValidator(ValidatorTestCase):
             'page.images': [
                 (
                     'some_image.jpg',
-                    Mock(status_code=200, text=self.get_file('2x2.png'))
+                    Mock(status_code=200, size=len(self.get_file('2x2.png')))
                 ) for i in range(60)
             ],
             'total.size.img': 106,
@@ -100,7 +100,7 @@ class TestImageRequestsValidator(ValidatorTestCase):
         img_url = 'http://globo.com/some_image.jpg'
         validator.review.data = {
             'page.images': [
-                (img_url, Mock(status_code=404, text=None))
+                (img_url, Mock(status_code=404, size=0))
             ],
             'total.size.img': 60,
         }
@@ -148,7 +148,7 @@ class TestImageRequestsValidator(ValidatorTestCase):
         validator.add_violation = Mock()
         validator.review.data = {
             'page.images': [
-                ('http://globo.com/some_image.jpg', Mock(status_code=200, text='bla'))
+                ('http://globo.com/some_image.jpg', Mock(status_code=200, size=len('bla')))
             ],
             'total.size.img': 60,
         }